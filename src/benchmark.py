@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+
+"""
+Benchmark the stages that build the database (see pipeline.py)
+  on a data folder (e.g., with the synthetic data made by
+  make-synthetic-data.py) and check their results
+Each stage is run from scratch and its time, CPU time and peak memory
+  (and those of its main steps) are recorded into RESULTS_DIR/metrics.jsonl
+  and summarized into RESULTS_DIR/benchmark.md
+The tables produced are compared with the golden ones, saved into
+  RESULTS_DIR/golden by a previous run with the --update_golden option or
+  provided with the --golden option (e.g., the reference tables of
+  tests/reference, made by the original scripts of the project on the
+  synthetic data with 2000 patents and seed 1; see tests/reference/README.md).
+  The tables released (see RELEASE_TABLES in pipeline.py) are compared
+  strictly, in the order of their rows and columns and with the types
+  of their columns, allowing only for the rounding of the floating-point
+  numbers. The other tables are compared regardless of the order of their
+  rows and of the types of their columns, with a relative tolerance for the
+  floating-point numbers. The script fails if any table differs, or if a
+  table released has no golden version
+
+Usage:
+  python src/benchmark.py -i DATA_DIR -o RESULTS_DIR [-j JOBS]
+    [-I STAGE ...] [--backend BACKEND] [--golden GOLDEN_DIR | --update_golden]
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import json
+import os
+import shutil
+import sys
+import pandas as pd
+from parse_args import \
+    parse_io, add_chunk_options, add_jobs_options, add_sql_options, \
+    add_format_options
+from pipeline import \
+    RELEASE_FORMAT, RELEASE_TABLES, make_stages, select_stages, run_pipeline
+from table_io import \
+    COLUMNAR_FORMATS, TEXT_FORMATS, read_table, table_format, types_path
+
+
+# Nothing listens on port 1, so the queries fail at once
+OFFLINE_API_URL = 'http://127.0.0.1:1/'
+
+# Relative tolerance of the floating-point numbers of the tables released
+#  (e.g., of a share that the original scripts read back from a text table,
+#  or of an average computed in another order) and of the other tables
+RELEASE_RTOL = 1e-12
+RTOL = 1e-9
+
+
+def is_table(path:str) -> bool:
+    try:
+        return table_format(path) in COLUMNAR_FORMATS+TEXT_FORMATS
+    except ValueError:
+        return False
+
+
+def is_released(table:str) -> bool:
+    """Whether a table (i.e., its path within the data folder) is released"""
+    return table in [
+        os.path.join('processed', f'{name}.{RELEASE_FORMAT}') \
+            for name in RELEASE_TABLES]
+
+
+def sort_table(df:pd.DataFrame) -> pd.DataFrame:
+    df = df.astype({
+        col:object for col in df.columns \
+            if pd.api.types.is_categorical_dtype(df[col])})
+    return df \
+        .sort_values(by=list(df.columns)) \
+        .reset_index(drop=True)
+
+
+def compare_tables(path:str, golden_path:str, strict:bool=False) -> str:
+    """Differences between a table and its golden version (if any)
+    Unless the comparison is strict, the order of the rows and the types
+      of the columns are not compared
+    """
+    if not os.path.exists(golden_path):
+        return 'no golden table'
+    df = read_table(path)
+    df_golden = read_table(golden_path)
+    if strict:
+        try:
+            pd.testing.assert_frame_equal(
+                df, df_golden,
+                check_exact=False, rtol=RELEASE_RTOL, atol=0)
+        except AssertionError as e:
+            # E.g., the column that differs, and its attribute that differs
+            return ' '.join(str(e).split('\n')[:3]).strip()
+        return ''
+    if sorted(df.columns)!=sorted(df_golden.columns):
+        return 'different columns'
+    if len(df)!=len(df_golden):
+        return f'{len(df)} rows instead of {len(df_golden)}'
+    # Columns stored as numbers in a table and as strings in the other 
+    #  are compared as strings
+    df = df[df_golden.columns]
+    as_string = [
+        col for col in df.columns \
+            if (df[col].dtype==object) != (df_golden[col].dtype==object)]
+    df = df.astype({col:str for col in as_string})
+    df_golden = df_golden.astype({col:str for col in as_string})
+    try:
+        pd.testing.assert_frame_equal(
+            sort_table(df), sort_table(df_golden),
+            check_dtype=False, check_exact=False, rtol=RTOL)
+    except AssertionError as e:
+        return str(e).split('\n')[0]
+    return ''
+
+
+def summarize_metrics(metrics:str) -> pd.DataFrame:
+    with open(metrics) as f:
+        records = [json.loads(line) for line in f]
+    df = pd.DataFrame(records)
+    return df[df.step.isna()] \
+        [['stage','output','wall_time','cpu_time','peak_rss_mb',
+            'rows_in','rows_out']] \
+        .sort_values(by='wall_time', ascending=False)
+
+
+def add_golden_options(parser):
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        '--golden', 
+        help='folder with the golden tables (default: RESULTS_DIR/golden)', 
+        required=False)
+    group.add_argument(
+        '--update_golden', 
+        help='replace the golden results with the current ones', 
+        required=False, 
+        action='store_true')
+
+
+def main():
+    args = parse_io(
+        add_chunk_options,
+        add_jobs_options,
+        add_sql_options,
+        add_format_options,
+        add_golden_options)
+
+    stages = make_stages(
+        data_dir=args.input,
+        format=args.format or 'parquet',
+        chunksize=args.chunksize or 5000000,
+        backend=args.backend)
+    targets = args.input_list or [
+        stage.name for stage in stages if stage.name.startswith('export_')]
+    stages = select_stages(stages, targets)
+
+    # Run every stage from scratch (i.e., without the cached geocoding)
+    for stage in stages:
+        for output in stage.outputs:
+            # Some outputs are directories (e.g., the citation graph)
+            if os.path.isdir(output):
+                shutil.rmtree(output)
+            elif os.path.exists(output):
+                os.remove(output)
+        if '--cache' in stage.options:
+            cache = stage.options[stage.options.index('--cache')+1]
+            if os.path.exists(cache):
+                os.remove(cache)
+
+    if not os.path.exists(args.output):
+        os.makedirs(args.output)
+    metrics = os.path.join(args.output, 'metrics.jsonl')
+    if os.path.exists(metrics):
+        os.remove(metrics)
+    os.environ['MSA_METRICS'] = metrics
+    os.environ['PATENTSVIEW_API_URL'] = OFFLINE_API_URL
+
+    # By default, the stages are run one at a time,
+    #  so that they do not compete for the resources measured
+    run_pipeline(stages, args.jobs or 1, args.memory or float('inf'))
+
+    df_metrics = summarize_metrics(metrics)
+
+    golden_dir = args.golden or os.path.join(args.output, 'golden')
+    results = []
+    for stage in stages:
+        for output in stage.outputs:
+            if not is_table(output):
+                continue
+            table = os.path.relpath(output, args.input)
+            golden_path = os.path.join(golden_dir, table)
+            if args.update_golden:
+                if not os.path.exists(os.path.dirname(golden_path)):
+                    os.makedirs(os.path.dirname(golden_path))
+                shutil.copyfile(output, golden_path)
+                # The types of the columns of a text table are copied too
+                if os.path.exists(types_path(output)):
+                    shutil.copyfile(
+                        types_path(output), types_path(golden_path))
+            difference = compare_tables(
+                output, golden_path, strict=is_released(table))
+            results.append({
+                'table':table,
+                'released':is_released(table),
+                'result':difference or 'OK'})
+    df_results = pd.DataFrame(
+        results, columns=['table','released','result'])
+
+    with open(os.path.join(args.output, 'benchmark.md'), 'w') as f_out:
+        f_out.write('### Stages\n')
+        f_out.write(df_metrics.to_markdown(index=False, tablefmt='github'))
+        f_out.write('\n\n### Golden results\n')
+        f_out.write(df_results.to_markdown(index=False, tablefmt='github'))
+        f_out.write('\n')
+    with open(os.path.join(args.output, 'benchmark.md')) as f_in:
+        print(f_in.read())
+
+    # The tables that are not released may have no golden version
+    #  (e.g., in the reference tables)
+    is_missing = (df_results.result=='no golden table') & ~df_results.released
+    if (~is_missing & (df_results.result!='OK')).any():
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
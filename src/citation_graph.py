@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+"""
+Modules to build and use the forward-citation graph of the patents
+The citations of uspatentcitation are stored in compressed sparse row (CSR)
+  form, indexed by the id of the cited patent (utility patent ids are dense
+  unsigned integers, see patent_index.py): the patents citing the patent n
+  are targets[offsets[n]:offsets[n+1]], sorted. A citation repeated in the
+  raw data is repeated in the graph too
+Both arrays are uint32 and are saved as .npy files into a directory
+  (e.g., citation_graph.csr), that is read memory mapped. Therefore, the
+  forward citations of any patent are found in O(degree), without joining
+  the (large) citation table
+Citations with an end that is not a utility patent are not stored
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from patent_ids import PATENT_ID_SENTINEL
+
+
+GRAPH_EXTENSION = '.csr'
+
+# offsets  <- position in targets of the first citing patent of each patent
+#             (offsets[n+1]-offsets[n] is the number of its citations)
+# targets  <- citing patents, grouped by cited patent
+CitationGraph = namedtuple('CitationGraph', ['offsets', 'targets'])
+
+# Largest number of citations whose positions fit into the (uint32) offsets
+MAX_CITATIONS = np.iinfo(np.uint32).max
+
+
+def is_citation_graph(path:str) -> bool:
+    return path.endswith(GRAPH_EXTENSION)
+
+
+def build_citation_graph(cited, citing) -> CitationGraph:
+    """Citation graph of the edges provided (cited and citing patent ids)"""
+    cited = np.asarray(cited, dtype=np.uint64)
+    citing = np.asarray(citing, dtype=np.uint64)
+    is_kept = (cited!=PATENT_ID_SENTINEL) & (citing!=PATENT_ID_SENTINEL)
+    # The edges are sorted by cited and then by citing patent at once
+    edges = (cited[is_kept]<<32) | citing[is_kept]
+    del cited, citing, is_kept
+    edges.sort()
+    if len(edges)>MAX_CITATIONS:
+        raise ValueError(
+            f'Too many citations for uint32 offsets: {len(edges)}')
+
+    cited = (edges>>32).astype(np.int64)
+    size = int(cited[-1])+1 if len(edges)>0 else 0
+    offsets = np.zeros(size+1, dtype=np.uint32)
+    offsets[1:] = np.cumsum(np.bincount(cited, minlength=size))
+    del cited
+    targets = (edges & 0xFFFFFFFF).astype(np.uint32)
+    return CitationGraph(offsets, targets)
+
+
+def save_citation_graph(graph:CitationGraph, path:str):
+    # Write the graph atomically, to never leave a broken one behind
+    tmp_path = f'{path}.tmp.{os.getpid()}'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, 'offsets.npy'), graph.offsets)
+    np.save(os.path.join(tmp_path, 'targets.npy'), graph.targets)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def load_citation_graph(path:str) -> CitationGraph:
+    return CitationGraph(
+        np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r'),
+        np.load(os.path.join(path, 'targets.npy'), mmap_mode='r'))
+
+
+def citation_edges(graph:CitationGraph, patent_ids=None) -> tuple:
+    """Edges of the citation graph (cited and citing patent ids), in the order
+      of the cited patents provided (of all the patents, if none is provided)
+    """
+    offsets = np.asarray(graph.offsets, dtype=np.int64)
+    if patent_ids is None:
+        cited = np.repeat(
+            np.arange(len(offsets)-1, dtype=np.uint32), np.diff(offsets))
+        return cited, np.asarray(graph.targets)
+
+    patent_ids = np.asarray(patent_ids, dtype=np.int64)
+    patent_ids = patent_ids[(patent_ids>=0) & (patent_ids<len(offsets)-1)]
+    starts = offsets[patent_ids]
+    degrees = offsets[patent_ids+1] - starts
+    # Position in targets of each edge, i.e. the ranges of the patents
+    #  provided concatenated
+    ends = np.cumsum(degrees)
+    positions = np.arange(ends[-1] if len(ends)>0 else 0) + \
+        np.repeat(starts-ends+degrees, degrees)
+    return \
+        np.repeat(patent_ids.astype(np.uint32), degrees), \
+        np.asarray(graph.targets[positions])
+
+
+def edge_chunks(graph:CitationGraph, chunksize:int):
+    """Iterator over chunks of the edges of the citation graph, as DataFrames
+      (patent_id is the cited patent and forward_citation_id the citing one)
+    """
+    for start in range(0, len(graph.targets), chunksize):
+        positions = np.arange(
+            start, min(start+chunksize, len(graph.targets)))
+        cited = np.searchsorted(graph.offsets, positions, side='right') - 1
+        yield pd.DataFrame({
+            'patent_id':cited.astype(np.uint32),
+            'forward_citation_id':np.asarray(graph.targets[positions])})
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""
+Modules to count the forward citations received by the patents
+  within time windows that start at their grant date
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import numpy as np
+
+
+def dense_lookup(keys:np.ndarray, values:np.ndarray, missing) -> np.ndarray:
+    """Array such that lookup[key] is the value of the key
+      (or missing, for the keys not provided)
+    """
+    size = int(keys.max())+1 if len(keys)>0 else 0
+    lookup = np.full(size, missing, dtype=values.dtype)
+    lookup[keys] = values
+    return lookup
+
+
+def count_citations(
+        cited:np.ndarray, citing:np.ndarray,
+        patent_ids:np.ndarray, grant_dates:np.ndarray,
+        windows:list) -> np.ndarray:
+    """Count the forward citations received by each patent within each window
+    cited and citing are the (uint32) ends of the edges of the citation graph,
+      while grant_dates are the grant dates (datetime64) of the patent_ids.
+      Each window is a number of years (of 365 days) from the grant date
+      of the cited patent. Repeated edges are counted once, and edges with
+      an end that has no grant date are ignored
+    The counts are returned as an array with a row for each patent
+      (in the order of patent_ids) and a column for each window
+    All the windows are computed with a single pass over the edges: each edge
+      is assigned to the narrowest window that includes it and the counts
+      are cumulated from the narrowest to the widest window
+    """
+    patent_ids = np.asarray(patent_ids, dtype=np.uint32)
+    grant_days = np.asarray(grant_dates, dtype='datetime64[D]') \
+        .astype(np.int64)
+    n_patents, n_windows = len(patent_ids), len(windows)
+    if n_patents==0:
+        return np.zeros((0, n_windows), dtype=np.int64)
+
+    position_of = dense_lookup(
+        patent_ids, np.arange(n_patents, dtype=np.int64), -1)
+
+    # Keep the edges whose ends are both known, once each
+    cited = np.asarray(cited, dtype=np.uint64)
+    citing = np.asarray(citing, dtype=np.uint64)
+    is_known = (cited<len(position_of)) & (citing<len(position_of))
+    cited, citing = cited[is_known], citing[is_known]
+    is_known = (position_of[cited]>=0) & (position_of[citing]>=0)
+    edges = np.unique((cited[is_known]<<32) | citing[is_known])
+    del cited, citing, is_known
+    cited = position_of[edges>>32]
+    citing = position_of[edges & 0xFFFFFFFF]
+    del edges
+
+    lag = grant_days[citing] - grant_days[cited]
+    del citing
+
+    order = np.argsort(windows, kind='stable')
+    window_days = np.asarray(windows, dtype=np.int64)[order]*365
+    narrowest = np.searchsorted(window_days, lag, side='left')
+    del lag
+
+    counts = np.bincount(
+            cited*(n_windows+1) + narrowest,
+            minlength=n_patents*(n_windows+1)) \
+        .reshape(n_patents, n_windows+1)[:, :n_windows] \
+        .cumsum(axis=1)
+
+    return counts[:, np.argsort(order)]
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+"""
+Modules to retrieve the correct (grant and application) dates of
+  the patents whose dates on the PatentsView bulk files are wrong
+The patents are queried on the PatentsView API in batches, sent
+  concurrently (and retried, if they fail). The dates retrieved are
+  stored into a cache file, so that the following runs query only
+  the patents never seen before
+The API can be replaced by a local server setting the PATENTSVIEW_API_URL
+  environment variable. If the API cannot be reached, the patents not
+  in the cache are left as they are (and queried again on the next run),
+  as are those of a batch that fails even after its retries
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from download import make_session
+from table_io import read_table, write_table, table_extension, replace_table
+
+
+API_URL = os.environ.get(
+    'PATENTSVIEW_API_URL', 'https://api.patentsview.org/patents/query')
+BATCH_SIZE = 100
+JOBS = 4
+
+# Field of the API with each date and, if the field is nested,
+#  the group it belongs to
+DATE_FIELDS = {
+    'grant_date':('patent_date', None),
+    'appln_date':('app_date', 'applications')}
+
+
+def read_date_cache(path:str, dates_column:str) -> pd.Series:
+    """Dates in the cache (NaN for the patents that the API does not know),
+      indexed by patent id
+    """
+    if path is None or not os.path.exists(path):
+        return pd.Series(dtype=object, index=pd.Index([], dtype=np.uint32))
+    df_cache = read_table(path)
+    df_cache = df_cache[df_cache.dates_column==dates_column]
+    return pd.Series(
+        df_cache.date.values,
+        index=df_cache.patent_id.values.astype(np.uint32))
+
+
+def write_date_cache(dates:pd.Series, path:str, dates_column:str):
+    df_new = pd.DataFrame({
+        'patent_id':dates.index.values.astype(np.uint32),
+        'dates_column':dates_column,
+        'date':dates.values.astype(object)})
+    if os.path.exists(path):
+        df_new = pd.concat([read_table(path), df_new], ignore_index=True)
+    df_new = df_new \
+        .drop_duplicates(subset=['patent_id','dates_column'], keep='last')
+    # Write the cache atomically, to never leave a broken cache behind
+    tmp_path = f'{path}.tmp.{os.getpid()}.{table_extension(path)}'
+    write_table(df_new, tmp_path)
+    replace_table(tmp_path, path)
+
+
+def query_dates(
+        session:requests.Session, patent_ids:list, dates_column:str,
+        url:str=API_URL) -> dict:
+    """Dates of a batch of patents, according to the PatentsView API
+      (None for the patents that the API does not know)
+    """
+    field, group = DATE_FIELDS[dates_column]
+    response = session.get(
+        url,
+        params={
+            'q':json.dumps({
+                '_or':[
+                    {'patent_number':str(patent_id)} \
+                        for patent_id in patent_ids]}),
+            'f':json.dumps(['patent_number', field]),
+            'o':json.dumps({'per_page':len(patent_ids)})},
+        timeout=60)
+    response.raise_for_status()
+    dates = {patent_id:None for patent_id in patent_ids}
+    for patent in response.json().get('patents') or []:
+        # The records without the group (e.g., a patent without any
+        #  application) are skipped, as the patents the API does not know
+        record = (patent.get(group) or [{}])[0] \
+            if group is not None else patent
+        patent_number = str(patent.get('patent_number') or '')
+        if patent_number.isnumeric():
+            dates[int(patent_number)] = record.get(field)
+    return dates
+
+
+def fetch_dates(
+        patent_ids, dates_column:str, cache:str=None,
+        jobs:int=None, url:str=API_URL) -> pd.Series:
+    """Correct dates of the patents provided, indexed by patent id
+      (NaN for the patents that the API does not know or, if the API
+      cannot be reached, that are not in the cache)
+    """
+    patent_ids = pd.unique(np.asarray(patent_ids, dtype=np.uint32))
+    dates = read_date_cache(cache, dates_column)
+    to_query = patent_ids[~np.isin(patent_ids, dates.index.values)]
+    if len(to_query)==0:
+        return dates.reindex(patent_ids)
+
+    batches = [
+        to_query[start:start+BATCH_SIZE].tolist() \
+            for start in range(0, len(to_query), BATCH_SIZE)]
+    jobs = jobs or JOBS
+    # Do not insist if the API cannot be reached at all (e.g., offline),
+    #  while the other failures are retried
+    session = make_session(jobs, connect_attempts=1)
+    is_offline = False
+
+    def query_batch(batch):
+        nonlocal is_offline
+        # Once the API cannot be reached, the other batches are not sent
+        if is_offline:
+            return {}
+        try:
+            return query_dates(session, batch, dates_column, url)
+        except requests.exceptions.ConnectionError as e:
+            is_offline = True
+            print(
+                'The PatentsView API cannot be reached',
+                f'({type(e).__name__}).',
+                'The dates will be fixed heuristically', file=sys.stderr)
+            return {}
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # Only the patents of this batch are left as they are
+            print(
+                f'A batch of {len(batch)} patents failed',
+                f'({type(e).__name__}).',
+                'Their dates will be fixed heuristically', file=sys.stderr)
+            return {}
+
+    fetched = {}
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for batch_dates in executor.map(query_batch, batches):
+            fetched.update(batch_dates)
+    fetched = pd.Series(fetched, dtype=object)
+    fetched.index = fetched.index.astype(np.uint32)
+
+    if cache is not None and len(fetched)>0:
+        write_date_cache(fetched, cache, dates_column)
+    return pd.concat([dates, fetched]).reindex(patent_ids)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+"""
+Modules to parse the dates of the project
+The dates of the raw data are strings with a fixed layout (YYYY-MM-DD),
+  therefore they are parsed as arrays of bytes, slicing the year, the month
+  and the day of every date at once, rather than one string at a time
+Optionally, the mistakes commonly found on PatentsView are repaired
+* a "00" day is replaced with "01"
+* a year that does not start with "19" or "20" is moved into the 1900s
+  (e.g., "0199" becomes "1999")
+Dates that are not valid (e.g., missing, with a wrong layout or out of
+  the range of the pandas dates) become NaT
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import numpy as np
+import pandas as pd
+
+
+DATE_LENGTH = len('YYYY-MM-DD')
+DIGITS = [0, 1, 2, 3, 5, 6, 8, 9]
+SEPARATORS = [4, 7]
+
+# Range of the dates that pandas can represent (datetime64[ns])
+FIRST_DAY = np.datetime64(pd.Timestamp.min.ceil('D'), 'D')
+LAST_DAY = np.datetime64(pd.Timestamp.max.floor('D'), 'D')
+
+
+def parse_dates(dates, repair:bool=False) -> tuple:
+    """Parse the dates (YYYY-MM-DD, anything after the day is ignored)
+    Return the dates as datetime64[D] (NaT if invalid) and
+      the mask of the invalid dates
+    """
+    dates = pd.Series(dates)
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        days = dates.values.astype('datetime64[D]')
+        return days, np.isnat(days)
+
+    chars = np.asarray(
+            dates.where(dates.notna(), ''), dtype=f'S{DATE_LENGTH}') \
+        .view(np.uint8) \
+        .reshape(-1, DATE_LENGTH)
+    digits = chars[:, DIGITS].astype(np.int64) - ord('0')
+    is_valid = (
+        (digits>=0).all(axis=1) & (digits<=9).all(axis=1) &
+        (chars[:, SEPARATORS]==ord('-')).all(axis=1))
+
+    year = digits[:,0]*1000 + digits[:,1]*100 + digits[:,2]*10 + digits[:,3]
+    month = digits[:,4]*10 + digits[:,5]
+    day = digits[:,6]*10 + digits[:,7]
+    del chars, digits
+
+    if repair:
+        day[day==0] = 1
+        century = year//100
+        year = np.where(
+            (century==19) | (century==20), year, 1900 + year%100)
+
+    is_valid &= (month>=1) & (month<=12) & (day>=1)
+    months = np.where(
+            is_valid, (year-1970)*12 + month-1, 0) \
+        .astype('datetime64[M]')
+    first_day = months.astype('datetime64[D]')
+    month_length = (months+1).astype('datetime64[D]') - first_day
+    is_valid &= day <= month_length.astype(np.int64)
+
+    days = first_day + (day-1).astype('timedelta64[D]')
+    is_valid &= (days>=FIRST_DAY) & (days<=LAST_DAY)
+    days[~is_valid] = np.datetime64('NaT')
+    return days, ~is_valid
+
+
+def to_datetime(dates, repair:bool=False) -> pd.Series:
+    """Parse the dates into a datetime Series (NaT if invalid)
+      with the same index of the dates provided (if any)
+    """
+    days, _ = parse_dates(dates, repair=repair)
+    return pd.Series(
+        days.astype('datetime64[ns]'),
+        index=dates.index if isinstance(dates, pd.Series) else None,
+        name=dates.name if isinstance(dates, pd.Series) else None)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+"""
+Modules to build the database incrementally across PatentsView releases
+The rows of each raw table are hashed and the hashes are combined by key
+  (e.g., by patent id), to store a compact snapshot of the inputs of a build
+  in a state directory. When a new release is processed, the hashes of its
+  tables are compared with the snapshot, and only the keys whose rows changed
+  (or that are new, or gone) are marked as affected (see make-delta.py)
+The stages then recompute only the affected patents, and their rows replace
+  those of the previous build of the same table
+The snapshot of the new release is kept aside (pending) and replaces
+  the previous one only once all the stages have consumed the affected
+  patents. If a stage fails, the next build compares the raw tables with
+  the snapshot of the last build that succeeded, so that no change is lost
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from patent_index import make_patent_index, isin_patent_index
+from table_io import read_table, write_table
+
+
+DIGESTS_FILE = 'digests.json'
+
+# Subdirectory of the state directory with the pending snapshot
+PENDING_DIR = 'pending'
+
+
+def combine_hashes(keys:np.ndarray, hashes:np.ndarray) -> tuple:
+    """Combine the hashes of the rows of each key, whatever their order
+      (the hashes are summed, wrapping around 2^64)
+    """
+    order = np.argsort(keys, kind='stable')
+    keys, hashes = keys[order], hashes[order]
+    if len(keys)==0:
+        return keys, hashes
+    starts = np.flatnonzero(np.r_[True, keys[1:]!=keys[:-1]])
+    return keys[starts], np.add.reduceat(hashes, starts)
+
+
+class KeyHasher:
+    """Hashes of the rows of a table, combined by key,
+      updated chunk by chunk
+    """
+
+    def __init__(self):
+        self._keys = None
+        self._hashes = np.array([], dtype=np.uint64)
+
+    def update(self, keys, df:pd.DataFrame):
+        keys = np.asarray(keys)
+        hashes = pd.util.hash_pandas_object(df, index=False).values
+        if self._keys is not None:
+            keys = np.concatenate([self._keys, keys])
+            hashes = np.concatenate([self._hashes, hashes])
+        self._keys, self._hashes = combine_hashes(keys, hashes)
+
+    def hashes(self) -> pd.Series:
+        return pd.Series(self._hashes, index=self._keys)
+
+
+def changed_keys(old:pd.Series, new:pd.Series) -> np.ndarray:
+    """Keys whose hash is different in the two snapshots,
+      or that are only in one of them
+    """
+    if len(old)==0:
+        # The keys keep their type (the union with an empty index
+        #  would make them objects)
+        return new.index.values
+    keys = old.index.union(new.index)
+    old_position = old.index.get_indexer(keys)
+    new_position = new.index.get_indexer(keys)
+    is_same = (old_position>=0) & (new_position>=0)
+    is_same[is_same] = \
+        old.values[old_position[is_same]]==new.values[new_position[is_same]]
+    return keys[~is_same].values
+
+
+def snapshot_path(state_dir:str, name:str) -> str:
+    return os.path.join(state_dir, f'{name}.parquet')
+
+
+def read_snapshot(state_dir:str, name:str) -> pd.Series:
+    """Hashes of a table in the previous build (none, if never built)"""
+    path = snapshot_path(state_dir, name)
+    if not os.path.exists(path):
+        return pd.Series([], dtype=np.uint64)
+    df_snapshot = read_table(path)
+    return pd.Series(
+        df_snapshot.hash.values.astype(np.uint64),
+        index=df_snapshot.key.values)
+
+
+def write_snapshot(hashes:pd.Series, state_dir:str, name:str):
+    path = snapshot_path(state_dir, name)
+    # Write the snapshot atomically, to never leave a broken one behind
+    tmp_path = f'{path}.tmp.{os.getpid()}.parquet'
+    write_table(
+        pd.DataFrame({
+            'key':hashes.index.values,
+            'hash':hashes.values}),
+        tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read_digests(state_dir:str) -> dict:
+    """Digests of the raw files of the previous build"""
+    path = os.path.join(state_dir, DIGESTS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f_in:
+        return json.load(f_in)
+
+
+def write_digests(digests:dict, state_dir:str):
+    path = os.path.join(state_dir, DIGESTS_FILE)
+    tmp_path = f'{path}.tmp.{os.getpid()}'
+    with open(tmp_path, 'w') as f_out:
+        json.dump(digests, f_out, indent=2)
+    os.replace(tmp_path, path)
+
+
+def pending_dir(state_dir:str) -> str:
+    return os.path.join(state_dir, PENDING_DIR)
+
+
+def clear_pending(state_dir:str):
+    """Remove the pending snapshot (if any) and make its directory"""
+    shutil.rmtree(pending_dir(state_dir), ignore_errors=True)
+    os.makedirs(pending_dir(state_dir))
+
+
+def commit_snapshot(state_dir:str):
+    """Replace the snapshot with the pending one (if any)
+    The digests are replaced last, so that the tables whose snapshot was
+      not replaced are compared again on the next build
+    """
+    pending = pending_dir(state_dir)
+    if not os.path.exists(pending):
+        return
+    files = sorted(
+        os.listdir(pending), key=lambda file: file==DIGESTS_FILE)
+    for file in files:
+        os.replace(os.path.join(pending, file), os.path.join(state_dir, file))
+    os.rmdir(pending)
+
+
+def extend_index(index:np.ndarray, patent_ids) -> np.ndarray:
+    """Patent index with the patents provided added to it"""
+    other = make_patent_index(patent_ids)
+    extended = np.zeros(max(len(index), len(other)), dtype=np.uint8)
+    extended[:len(index)] |= index
+    extended[:len(other)] |= other
+    return extended
+
+
+def keep_affected(
+        df:pd.DataFrame, affected:np.ndarray,
+        key:str='patent_id') -> pd.DataFrame:
+    """Rows of the affected patents (all the rows, if none is provided)"""
+    if affected is None:
+        return df
+    return df[isin_patent_index(affected, df[key])]
+
+
+def merge_rows(
+        df_old:pd.DataFrame, df_new:pd.DataFrame, affected:np.ndarray,
+        key:str='patent_id') -> pd.DataFrame:
+    """Rows of the previous build of a table, with those of the affected
+      patents replaced by the rows recomputed
+    The categories of the categorical columns are merged
+    """
+    df_old = df_old[~isin_patent_index(affected, df_old[key])]
+    df = pd.concat([df_old, df_new], ignore_index=True)
+    for col in df.columns:
+        categories = [
+            df_part[col].cat.categories for df_part in [df_old, df_new] \
+                if pd.api.types.is_categorical_dtype(df_part[col])]
+        if categories:
+            df[col] = pd.Categorical(
+                df[col], categories=categories[0].union(categories[-1]))
+    return df
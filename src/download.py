@@ -2,6 +2,12 @@
 
 """
 Download needed raw data
+The files can be downloaded one at a time (-i URL -o FILE) or all together,
+  concurrently, from a manifest (-m MANIFEST -j JOBS). The manifest is a 
+  tab-separated file with a line for each file to download, containing the 
+  URL, the output file and (optionally) its SHA-256 digest
+Partial downloads are resumed (with HTTP Range requests) and each file is 
+  verified, against its digest or, if it is a zip file, checking its integrity
 
 Author: Carlo Bottai
 Copyright (c) 2021 - Carlo Bottai
@@ -14,43 +20,146 @@ Date: 2021-02-05
 import os
 import time
 import random
+import hashlib
 import requests
-import tempfile
 import sys
 import zipfile
 import shutil
 import tarfile
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from tqdm import tqdm
-from parse_args import parse_io
+from parse_args import parse_io, add_jobs_options, add_instrument_options
+from instrument import start_script
 
 
-def download_url(url, output_dir, file_name):
-    response = None
-    try:
-        response = requests.get(url, stream=True)
-    except:
-        print(f'Connection error occurred trying to get URL: {url}', 
+BLOCK_SIZE = 1<<20 # 1 MB
+MAX_ATTEMPTS = 5
+
+
+def make_session(
+        pool_size:int=1, connect_attempts:int=None) -> requests.Session:
+    retry = Retry(
+        total=MAX_ATTEMPTS, 
+        connect=connect_attempts, 
+        backoff_factor=1, 
+        status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, 
+        pool_maxsize=pool_size, 
+        max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch_url(
+        session:requests.Session, url:str, part_file:str, 
+        sha256:str=None, position:int=0) -> bool:
+    """Download the URL into part_file, resuming it if it already exists
+    Return True if the file is complete and valid
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        start = os.path.getsize(part_file) \
+            if os.path.exists(part_file) else 0
+        headers = {'Range':f'bytes={start}-'} if start>0 else {}
+        try:
+            response = session.get(
+                url, headers=headers, stream=True, timeout=60)
+        except requests.exceptions.RequestException as e:
+            print(f'Connection error occurred trying to get URL: {url} ({e})', 
+                file=sys.stderr)
+            time.sleep(2**attempt)
+            continue
+        if response.status_code==416:
+            # The partial file is already complete
+            response.close()
+            digest = None
+            break
+        if response.status_code not in [200, 206]:
+            print(f'Error {response.status_code}',
+                f'while downloading file from URL: {url}', 
+                file=sys.stderr)
+            response.close()
+            return False
+        # The download is resumed only if the server sent the rest of the 
+        #  file; otherwise (e.g., the server does not support, or ignored, 
+        #  the range request) the file is downloaded from scratch
+        is_resumed = start>0 and response.status_code==206
+        if not is_resumed:
+            start = 0
+        total_size_in_bytes = int(response.headers.get('content-length', 0))
+        mode = 'ab' if is_resumed else 'wb'
+        # The checksum is computed while the file is downloaded, after 
+        #  having read the part of the file already downloaded (if resumed). 
+        #  It is made anew at each attempt, once the attempt is known 
+        #  to resume the download or not
+        digest = hashlib.sha256() if sha256 is not None else None
+        if digest is not None and is_resumed:
+            update_digest(digest, part_file)
+        try:
+            with open(part_file, mode) as f_out, \
+                 tqdm(
+                    total=start+total_size_in_bytes or None, 
+                    initial=start, 
+                    unit='iB', unit_scale=True, 
+                    desc=os.path.basename(part_file), 
+                    position=position, 
+                    leave=False) as progress_bar:
+                for data in response.iter_content(BLOCK_SIZE):
+                    progress_bar.update(len(data))
+                    f_out.write(data)
+                    if digest is not None:
+                        digest.update(data)
+            if total_size_in_bytes==0 or \
+                    os.path.getsize(part_file)==start+total_size_in_bytes:
+                break
+        except requests.exceptions.RequestException as e:
+            print(f'Download of URL {url} interrupted ({e}), resuming', 
+                file=sys.stderr)
+        finally:
+            response.close()
+    else:
+        print(f'ERROR, something went wrong while downloading {url}', 
             file=sys.stderr)
-    if response is None or response.status_code != 200:
-        print(f'Error {response.status_code}',
-            f'while downloading file from URL: {url}')
-        return None
+        return False
 
-    tmp_fd, tmp_fn = tempfile.mkstemp()
-    total_size_in_bytes = int(response.headers.get('content-length', 0))
-    with os.fdopen(tmp_fd, 'wb') as f_out, \
-         tqdm(total=total_size_in_bytes, unit='iB', unit_scale=True) as progress_bar:
-        if total_size_in_bytes is None:
-            f_out.write(response.content)
-        else:
-            total_size_in_bytes = int(total_size_in_bytes)
-            block_size = 1024 # 1 KB
-            for data in response.iter_content(block_size):
-                progress_bar.update(len(data))
-                f_out.write(data)
-            if total_size_in_bytes != 0 and progress_bar.n != total_size_in_bytes:
-                print(f'ERROR, something went wrong while downloading {url}')
-    
+    if not verify_file(part_file, sha256, digest):
+        # Start from scratch the next time
+        os.remove(part_file)
+        return False
+    return True
+
+
+def update_digest(digest, path:str):
+    with open(path, 'rb') as f_in:
+        for block in iter(lambda: f_in.read(BLOCK_SIZE), b''):
+            digest.update(block)
+
+
+def verify_file(path:str, sha256:str=None, digest=None) -> bool:
+    """Verify the file against its SHA-256 digest (if provided) or, 
+      if it is a zip file, check its integrity
+    digest is the (running) digest already computed for the file, if any
+    """
+    if sha256 is not None:
+        if digest is None:
+            digest = hashlib.sha256()
+            update_digest(digest, path)
+        if digest.hexdigest()!=sha256.lower():
+            print(f'ERROR, wrong checksum of {path}', file=sys.stderr)
+            return False
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as f_zip:
+            if f_zip.testzip() is not None:
+                print(f'ERROR, corrupted zip file {path}', file=sys.stderr)
+                return False
+    return True
+
+
+def finalize_download(tmp_fn:str, url:str, output_dir:str, file_name:str):
     target = os.path.join(output_dir, file_name)
     if target.endswith('.zip') and not zipfile.is_zipfile(tmp_fn):
         with zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED) as f_zip:
@@ -66,15 +175,82 @@ def download_url(url, output_dir, file_name):
     return target
 
 
+def download_url(
+        url, output_dir, file_name, 
+        sha256=None, session=None, position=0):
+    session = session or make_session()
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    part_file = os.path.join(output_dir, f'{file_name}.part')
+    if not fetch_url(session, url, part_file, sha256, position):
+        return None
+    return finalize_download(part_file, url, output_dir, file_name)
+
+
+def read_manifest(path:str) -> list:
+    manifest = []
+    with open(path) as f_in:
+        for line in f_in:
+            line = line.strip()
+            if line=='' or line.startswith('#'):
+                continue
+            fields = line.split('\t')
+            url, output_file = fields[:2]
+            sha256 = fields[2] if len(fields)>2 and fields[2] else None
+            manifest.append((url, output_file, sha256))
+    return manifest
+
+
+def download_manifest(manifest:list, jobs:int=4) -> list:
+    """Download concurrently (with a bounded pool of connections) 
+      all the files of the manifest that are not already available
+    """
+    manifest = [
+        (url, output_file, sha256) \
+            for url, output_file, sha256 in manifest \
+                if not os.path.exists(output_file)]
+    session = make_session(jobs)
+
+    def download(position, url, output_file, sha256):
+        output_dir, file_name = os.path.split(output_file)
+        return download_url(
+            url, output_dir, file_name, 
+            sha256=sha256, session=session, position=position%jobs)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(download, position, *entry) \
+                for position, entry in enumerate(manifest)]
+        targets = [future.result() for future in futures]
+    return targets
+
+
+def add_manifest_options(parser):
+    parser.add_argument(
+        '-m', '--manifest', 
+        help='manifest of the files to process', 
+        required=False)
+
+
 def main():
-    args = parse_io()
+    args = parse_io(
+        add_manifest_options,
+        add_jobs_options,
+        add_instrument_options)
+    start_script(args.output, args.metrics, args.profile)
     
+    if args.manifest is not None:
+        manifest = read_manifest(args.manifest)
+        targets = download_manifest(manifest, args.jobs or 4)
+        if any([target is None for target in targets]):
+            sys.exit(1)
+        return
+
     source_url = args.input
     output_file = args.output
     output_dir, file_name = os.path.split(output_file)
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    download_url(source_url, output_dir, file_name)
+    if download_url(source_url, output_dir, file_name) is None:
+        sys.exit(1)
     time.sleep(random.random()*5)
 
 
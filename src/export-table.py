@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+
+"""
+Export a table of the database into the format used for its release
+  (e.g., from the columnar format used to build the database to a zipped TSV)
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+from parse_args import parse_io, add_table_options, add_instrument_options
+from instrument import start_script
+from table_io import read_table, write_table, set_options
+
+
+def main():
+    args = parse_io(add_table_options, add_instrument_options)
+    start_script(args.output, args.metrics, args.profile)
+    set_options(compression_level=args.compression_level)
+
+    df = read_table(args.input)
+
+    write_table(df, args.output)
+
+
+if __name__ == '__main__':
+    main()
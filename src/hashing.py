@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+
+"""
+Modules to compute the digest of (large) files.
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import hashlib
+
+
+def file_digest(path:str, algorithm:str='sha256') -> str:
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f_in:
+        for block in iter(lambda: f_in.read(1<<20), b''):
+            digest.update(block)
+    return digest.hexdigest()
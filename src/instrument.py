@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+
+"""
+Modules to measure the resources used by the stages of the project.
+A stage (i.e., a run of a script) and its major steps emit a JSON record
+  each, with
+* stage       <- name of the script
+* output      <- name of the output of the script
+* step        <- name of the step (null for the whole stage)
+* wall_time   <- elapsed time (seconds)
+* cpu_time    <- CPU time of the process (seconds)
+* peak_rss_mb <- peak resident memory of the process (MB)
+* rows_in     <- number of rows read (or received by the step)
+* rows_out    <- number of rows written (or produced by the step)
+The records are appended to a metrics file (JSON lines), if one is provided
+  (with the --metrics option or the MSA_METRICS environment variable),
+  and are not emitted otherwise
+A stage is started by the script (see start_script) and ended when it exits.
+  The rows read and written through table_io are counted automatically
+Optionally, a function-level profile of the stage is saved (see cProfile)
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import atexit
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+
+_stage = None
+
+
+def _read_peak_rss() -> float:
+    """Peak resident memory (MB) since the last reset"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])/1024
+    except OSError:
+        pass
+    # Peak of the whole life of the process (kB on Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+
+
+def _reset_peak_rss():
+    """Reset the peak resident memory, where possible (Linux 4.0+)
+    Otherwise, the peak of the whole life of the process is reported
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def _emit(record:dict):
+    if _stage['metrics'] is None:
+        return
+    with open(_stage['metrics'], 'a') as f:
+        f.write(json.dumps(record)+'\n')
+
+
+def start_stage(
+        name:str, output:str=None, metrics:str=None, profile:str=None):
+    """Start to measure a stage
+    metrics is the file the records are appended to, while profile is
+      the file the profile is saved to (no profile, if not provided)
+    Nothing is measured if neither of them is provided
+    """
+    global _stage
+    if metrics is None and profile is None:
+        _stage = None
+        return
+    _reset_peak_rss()
+    _stage = {
+        'name':name,
+        'output':os.path.basename(output) if output else None,
+        'metrics':metrics,
+        'profile':profile,
+        'profiler':None,
+        'peak_rss_mb':0,
+        'rows_in':0,
+        'rows_out':0,
+        'wall_start':time.perf_counter(),
+        'cpu_start':time.process_time()}
+    if profile is not None:
+        _stage['profiler'] = cProfile.Profile()
+        _stage['profiler'].enable()
+
+
+def start_script(output:str=None, metrics:str=None, profile:bool=False):
+    """Start to measure the script running, as a stage named after it
+      (with the instrumentation options of parse_args.py)
+    Its profile, if requested, is saved next to its output
+    """
+    name = stage_name(sys.argv)
+    start_stage(
+        name, 
+        output=output, 
+        metrics=metrics, 
+        profile=profile_path(output, name) if profile else None)
+
+
+def end_stage():
+    """Emit the record of the current stage (if any is running)"""
+    global _stage
+    if _stage is None:
+        return
+    if _stage['profiler'] is not None:
+        _stage['profiler'].disable()
+        _stage['profiler'].dump_stats(_stage['profile'])
+    _emit({
+        'stage':_stage['name'],
+        'output':_stage['output'],
+        'step':None,
+        'wall_time':round(time.perf_counter()-_stage['wall_start'], 3),
+        'cpu_time':round(time.process_time()-_stage['cpu_start'], 3),
+        'peak_rss_mb':round(max(_stage['peak_rss_mb'], _read_peak_rss()), 1),
+        'rows_in':_stage['rows_in'],
+        'rows_out':_stage['rows_out']})
+    _stage = None
+
+
+atexit.register(end_stage)
+
+
+def discard_stage():
+    """Stop to measure the current stage, without emitting its record
+      (e.g., a stage inherited by a forked process)
+    """
+    global _stage
+    if _stage is not None and _stage['profiler'] is not None:
+        _stage['profiler'].disable()
+    _stage = None
+
+
+class Step:
+    """Measures of a step, whose row counts can be set within the step"""
+
+    def __init__(self, rows_in:int=None, rows_out:int=None):
+        self.rows_in = rows_in
+        self.rows_out = rows_out
+
+
+@contextmanager
+def step(name:str, rows_in:int=None, rows_out:int=None):
+    """Measure a step of the current stage (nothing is done outside a stage)
+    E.g.,
+      with step('merge', rows_in=len(df)) as s:
+          df = pd.merge(df, df_other)
+          s.rows_out = len(df)
+    """
+    measures = Step(rows_in, rows_out)
+    if _stage is None:
+        yield measures
+        return
+    # The peak of the step is measured from its start,
+    #  while the peak of the stage keeps track of the previous steps
+    _stage['peak_rss_mb'] = max(_stage['peak_rss_mb'], _read_peak_rss())
+    _reset_peak_rss()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    yield measures
+    peak_rss_mb = _read_peak_rss()
+    _stage['peak_rss_mb'] = max(_stage['peak_rss_mb'], peak_rss_mb)
+    _emit({
+        'stage':_stage['name'],
+        'output':_stage['output'],
+        'step':name,
+        'wall_time':round(time.perf_counter()-wall_start, 3),
+        'cpu_time':round(time.process_time()-cpu_start, 3),
+        'peak_rss_mb':round(peak_rss_mb, 1),
+        'rows_in':measures.rows_in,
+        'rows_out':measures.rows_out})
+
+
+def count_rows(rows_in:int=0, rows_out:int=0):
+    """Add the rows read and written to the totals of the current stage"""
+    if _stage is not None:
+        _stage['rows_in'] += rows_in
+        _stage['rows_out'] += rows_out
+
+
+def profile_path(output:str, name:str) -> str:
+    """The profile of a stage is saved next to its output"""
+    if output is None:
+        return f'{name}.prof'
+    return f'{output}.prof'
+
+
+def stage_name(argv:list) -> str:
+    return os.path.splitext(os.path.basename(argv[0]))[0]
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+"""
+Modules to cache the assignment of the PatentsView locations to the CBSAs.
+Each location is stored with its coordinates and the digest of the 
+  shapefile of the CBSAs used to geocode it, so that a location is geocoded 
+  again only if it is new, if it has moved, or if the shapefile has changed.
+  Locations that are not within any CBSA are cached too (with no CBSA)
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import pandas as pd
+import os
+from table_io import read_table, write_table, table_extension, replace_table
+
+
+CACHE_KEY = ['location_id', 'latitude', 'longitude']
+
+
+def read_location_cache(path:str, shapefile_hash:str) -> pd.DataFrame:
+    if path is None or not os.path.exists(path):
+        return pd.DataFrame({
+            'location_id':pd.Series(dtype=str),
+            'latitude':pd.Series(dtype=float),
+            'longitude':pd.Series(dtype=float)})
+    df_cache = read_table(path)
+    return df_cache[df_cache.shapefile_hash==shapefile_hash] \
+        .drop(columns='shapefile_hash')
+
+
+def write_location_cache(
+        df_cache:pd.DataFrame, path:str, shapefile_hash:str):
+    df_cache = df_cache \
+        .drop_duplicates(subset='location_id', keep='last') \
+        .assign(shapefile_hash=shapefile_hash)
+    # Write the cache atomically, to never leave a broken cache behind
+    tmp_path = f'{path}.tmp.{os.getpid()}.{table_extension(path)}'
+    write_table(df_cache, tmp_path)
+    replace_table(tmp_path, path)
+
+
+def split_location_cache(
+        df_location:pd.DataFrame, df_cache:pd.DataFrame) -> tuple:
+    """Split the locations between those already in the cache 
+      (with the same coordinates), returned with their cached CBSA, 
+      and those that must be geocoded
+    """
+    df_hit = pd.merge(df_location[CACHE_KEY], df_cache, on=CACHE_KEY)
+    df_miss = df_location[
+        ~df_location.location_id.isin(df_hit.location_id)]
+    return df_hit, df_miss
@@ -11,52 +11,87 @@ Date: 2021-02-06
 """
 
 
+import numpy as np
 import pandas as pd
-import os
-from parse_args import parse_io
+from citation_graph import \
+    is_citation_graph, load_citation_graph, citation_edges
+from instrument import step, start_script
+from parse_args import \
+    parse_io, add_chunk_options, add_table_options, add_instrument_options
+from patent_ids import convert_patent_id
+from table_io import read_table, write_table, TableWriter, set_options
 
 
-def main():
-    args = parse_io()
-
-    msa_patents = pd.read_table(
-        args.input_list[0], # msa_patents.tsv.zip
-        usecols=[
-            'patent_id'],
-        dtype=str) \
-        .patent_id.unique()
-
-    df_patent_citation = pd.read_table(
-        args.input_list[1], # uspatentcitation.tsv.zip
-        usecols=[
-            'patent_id',
-            'citation_id'], 
-        dtype=str)
-    
+def filter_citations(df_patent_citation, msa_patents):
     # Build the dataframe, filtering only the citations going to utility patents 
     #  located into a MSA and coming from a utility patent
     # Rename to columns so that the dataframe can be merged with the other
     #  dataframes of the MSA-patents project:
     #   - patent_id is the cited patent
     #   - forward_citation_id is the citing patent
-    df_patent_citation = df_patent_citation[
-        (df_patent_citation.citation_id.isin(msa_patents)) &
-        (df_patent_citation.patent_id.str.isnumeric())] \
+    df_patent_citation = df_patent_citation \
         .rename(columns={
             'patent_id':'forward_citation_id',
             'citation_id':'patent_id'})
+    for col in ['forward_citation_id', 'patent_id']:
+        df_patent_citation[col] = convert_patent_id(df_patent_citation[col])
+    return df_patent_citation[
+        (df_patent_citation.patent_id.isin(msa_patents)) &
+        (df_patent_citation.forward_citation_id!=0)]
+
+
+def main():
+    args = parse_io(
+        add_chunk_options,
+        add_table_options,
+        add_instrument_options)
+    start_script(args.output, args.metrics, args.profile)
+    set_options(compression_level=args.compression_level)
+
+    msa_patents = read_table(
+        args.input_list[0], # msa_patents.parquet
+        columns=[
+            'patent_id'],
+        dtype=np.uint32) \
+        .patent_id.unique()
+
+    # The forward citations of the patents are looked up in the citation 
+    #  graph, if provided (see citation_graph.py), rather than filtered 
+    #  from the whole citation table
+    if is_citation_graph(args.input_list[1]):
+        with step('look up forward citations') as s:
+            cited, citing = citation_edges(
+                load_citation_graph(args.input_list[1]), # citation_graph.csr
+                np.sort(msa_patents))
+            s.rows_out = len(cited)
+        # The citations are sorted by cited and citing patent, the order of
+        #  the tables released (see msa_db.py)
+        write_table(
+            pd.DataFrame({
+                'forward_citation_id':citing,
+                'patent_id':cited}),
+            args.output)
+        return
+
+    # If a chunk size is provided, the citations are streamed from the 
+    #  (large) uspatentcitation table and the rows that survive the filter 
+    #  are appended to the output as soon as they are available, 
+    #  so that the memory needed does not depend on the size of the table
+    df_patent_citation = read_table(
+        args.input_list[1], # uspatentcitation.tsv.zip
+        columns=[
+            'patent_id',
+            'citation_id'], 
+        dtype=str,
+        chunksize=args.chunksize)
+    if args.chunksize is None:
+        df_patent_citation = [df_patent_citation]
     
-    dir, file = os.path.split(args.output)
-    if not os.path.exists(dir):
-        os.makedirs(dir)
-    
-    df_patent_citation.to_csv(
-        args.output, 
-        sep='\t', 
-        index=False, 
-        compression={
-            'method':'zip',
-            'archive_name':file.replace('.zip','')})
+    with TableWriter(args.output) as writer:
+        for df_chunk in df_patent_citation:
+            writer.write(
+                filter_citations(df_chunk, msa_patents) \
+                    [['forward_citation_id', 'patent_id']])
 
 
 if __name__ == '__main__':
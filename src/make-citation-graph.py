@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+"""
+Make the forward-citation graph of the patents (see citation_graph.py)
+  from the citations of uspatentcitation, once for each release of the
+  raw data
+
+Usage:
+  python src/make-citation-graph.py -i USPATENTCITATION -o citation_graph.csr
+    [-c CHUNKSIZE]
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import numpy as np
+from citation_graph import build_citation_graph, save_citation_graph
+from instrument import step, count_rows, start_script
+from parse_args import \
+    parse_io, add_chunk_options, add_raw_options, add_instrument_options
+from patent_ids import convert_patent_id
+from table_io import read_table, set_options
+
+
+def main():
+    args = parse_io(add_chunk_options, add_raw_options, add_instrument_options)
+    start_script(args.output, args.metrics, args.profile)
+    set_options(raw_cache=args.raw_cache)
+
+    # Only the (uint32) ids of the patents are kept in memory
+    #  while the citations are read
+    cited, citing = [], []
+    df_patent_citation = read_table(
+        args.input, # uspatentcitation.tsv.zip
+        columns=[
+            'patent_id',
+            'citation_id'],
+        dtype=str,
+        chunksize=args.chunksize)
+    if args.chunksize is None:
+        df_patent_citation = [df_patent_citation]
+    for df_chunk in df_patent_citation:
+        cited.append(convert_patent_id(df_chunk.citation_id).values)
+        citing.append(convert_patent_id(df_chunk.patent_id).values)
+    del df_patent_citation
+
+    with step('build citation graph', rows_in=sum(map(len, cited))) as s:
+        graph = build_citation_graph(
+            np.concatenate(cited), np.concatenate(citing))
+        s.rows_out = len(graph.targets)
+    del cited, citing
+
+    save_citation_graph(graph, args.output)
+    count_rows(rows_out=len(graph.targets))
+
+
+if __name__ == '__main__':
+    main()
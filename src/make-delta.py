@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+
+"""
+Find the patents affected by a new release of the raw data
+The raw tables are compared, by key, with the snapshot of the previous build
+  stored in the state directory (see delta.py). A patent is affected if
+* any of its rows of the patent, application, PatEx or patent_inventor
+  tables changed (or it is new, or gone)
+* any of its inventors is at a location whose coordinates changed
+* it is cited by a patent whose grant date changed, or any of its forward
+  citations is new (or gone), so that its citation windows changed
+If the shapefile of the CBSAs changed, every patent is affected
+The raw tables whose files did not change are not read, unless needed
+  (e.g., patent_inventor to find the inventors at the locations that changed)
+The affected patents are saved as a patent index, and the snapshot of
+  the new raw data is saved as pending (see delta.py). It replaces the
+  snapshot of the previous build only once all the stages have consumed
+  the affected patents (see pipeline.py)
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import os
+import numpy as np
+from delta import \
+    KeyHasher, changed_keys, read_snapshot, write_snapshot, \
+    read_digests, write_digests, pending_dir, clear_pending
+from hashing import file_digest
+from instrument import step, count_rows, start_script
+from parse_args import \
+    parse_io, add_cache_options, add_chunk_options, add_table_options, \
+    add_raw_options, add_instrument_options
+from patent_ids import convert_patent_id, PATENT_ID_SENTINEL
+from patent_index import make_patent_index, save_patent_index
+from table_io import read_table, set_options
+
+
+CHUNKSIZE = 5000000
+
+
+def table_name(path:str) -> str:
+    return os.path.basename(path).split('.')[0]
+
+
+def patent_key(column:str):
+    """Function that returns the patent ids (as integers) 
+      of the rows of a chunk
+    """
+    return lambda df: convert_patent_id(df[column]).values
+
+
+def diff_table(
+        path:str, state_dir:str, columns:list, key, chunksize:int,
+        on_chunk=None) -> tuple:
+    """Keys of a table whose rows changed since the previous build,
+      and the new snapshot of the table
+    key is a function that returns the key of each row of a chunk,
+      while on_chunk (if provided) is called on each chunk
+    """
+    hasher = KeyHasher()
+    with step(f'diff {os.path.basename(path)}') as s:
+        for df_chunk in read_table(
+                path, columns=columns, dtype=str, chunksize=chunksize):
+            hasher.update(key(df_chunk), df_chunk)
+            if on_chunk is not None:
+                on_chunk(df_chunk)
+        hashes = hasher.hashes()
+        changed = changed_keys(
+            read_snapshot(state_dir, table_name(path)), hashes)
+        s.rows_out = len(changed)
+    return changed, hashes
+
+
+def scan_table(path:str, columns:list, chunksize:int, on_chunk):
+    """Call on_chunk on each chunk of a table (that did not change)"""
+    with step(f'scan {os.path.basename(path)}'):
+        for df_chunk in read_table(
+                path, columns=columns, dtype=str, chunksize=chunksize):
+            on_chunk(df_chunk)
+
+
+def main():
+    args = parse_io(
+        add_cache_options,
+        add_chunk_options,
+        add_table_options,
+        add_raw_options,
+        add_instrument_options)
+    start_script(args.output, args.metrics, args.profile)
+    set_options(
+        compression_level=args.compression_level, raw_cache=args.raw_cache)
+    state_dir = args.cache
+    chunksize = args.chunksize or CHUNKSIZE
+    os.makedirs(state_dir, exist_ok=True)
+
+    patent_path, application_path, patex_path, patent_inventor_path, \
+        location_path, patent_citation_path, shapefile_path = args.input_list
+
+    digests = read_digests(state_dir)
+    new_digests = {
+        table_name(path):file_digest(path) for path in args.input_list}
+    snapshots = {}
+    affected = []
+
+    def is_changed(path):
+        return digests.get(table_name(path))!=new_digests[table_name(path)]
+
+    # Patents whose grant date (or any other field used) changed
+    changed_patents = np.array([], dtype=np.uint32)
+    if is_changed(patent_path) or is_changed(shapefile_path):
+        changed_patents, snapshots[patent_path] = diff_table(
+            patent_path, state_dir, ['id','date'],
+            patent_key('id'), chunksize)
+        affected.append(changed_patents)
+        # Every patent is recomputed with the new CBSAs
+        if is_changed(shapefile_path):
+            affected.append(snapshots[patent_path].index.values)
+
+    for path, columns, key in [
+            (application_path, ['patent_id','date','num_claims'],
+                patent_key('patent_id')),
+            (patex_path, ['uspc_class','patent_number'],
+                patent_key('patent_number'))]:
+        if is_changed(path):
+            changed, snapshots[path] = diff_table(
+                path, state_dir, columns, key, chunksize)
+            affected.append(changed)
+
+    changed_locations = np.array([], dtype=object)
+    if is_changed(location_path):
+        changed_locations, snapshots[location_path] = diff_table(
+            location_path, state_dir, ['id','latitude','longitude'],
+            lambda df: df.id.fillna('').values, chunksize)
+
+    # Patents with inventors at the locations that changed
+    def on_patent_inventor_chunk(df_chunk):
+        is_moved = df_chunk.location_id.isin(changed_locations).values
+        affected.append(
+            convert_patent_id(df_chunk.patent_id[is_moved]).values)
+
+    columns = ['patent_id','inventor_id','location_id']
+    if is_changed(patent_inventor_path):
+        changed, snapshots[patent_inventor_path] = diff_table(
+            patent_inventor_path, state_dir, columns,
+            patent_key('patent_id'), chunksize,
+            on_chunk=on_patent_inventor_chunk)
+        affected.append(changed)
+    elif len(changed_locations)>0:
+        scan_table(
+            patent_inventor_path, columns, chunksize,
+            on_patent_inventor_chunk)
+
+    # Patents cited by the patents whose grant date changed (the lags
+    #  of these citations changed) and patents whose forward citations
+    #  changed. The citations are hashed by cited patent
+    def on_patent_citation_chunk(df_chunk):
+        is_moved = np.isin(
+            convert_patent_id(df_chunk.patent_id).values, changed_patents)
+        affected.append(
+            convert_patent_id(df_chunk.citation_id[is_moved]).values)
+
+    columns = ['patent_id','citation_id']
+    if is_changed(patent_citation_path):
+        changed, snapshots[patent_citation_path] = diff_table(
+            patent_citation_path, state_dir, columns,
+            patent_key('citation_id'), chunksize,
+            on_chunk=on_patent_citation_chunk)
+        affected.append(changed)
+    elif len(changed_patents)>0:
+        scan_table(
+            patent_citation_path, columns, chunksize,
+            on_patent_citation_chunk)
+
+    affected = np.unique(np.concatenate(
+        [np.asarray(patent_ids, dtype=np.uint32) for patent_ids in affected] \
+            or [np.array([], dtype=np.uint32)]))
+    affected = affected[affected!=PATENT_ID_SENTINEL]
+    count_rows(rows_out=len(affected))
+    save_patent_index(make_patent_index(affected), args.output)
+
+    # The changes are always found against the snapshot of the last build
+    #  that succeeded, therefore a pending snapshot left by a build that
+    #  failed is replaced
+    clear_pending(state_dir)
+    for path, hashes in snapshots.items():
+        write_snapshot(hashes, pending_dir(state_dir), table_name(path))
+    write_digests(new_digests, pending_dir(state_dir))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+"""
+Make the tables of the MSA-patent database that derive from the interim tables
+  (msa_patent, msa_patent_inventor, msa_label, msa_patent_dates,
+  msa_patent_uspc, and msa_patent_quality; see msa_tables.py)
+Only the tables provided as outputs are written, and each table is
+  recognized by the name of its file. Each interim table is read only once,
+  with the columns needed by all the tables requested, and the tables are
+  made from the DataFrames in memory (e.g., msa_patent_quality is made from
+  the msa_patent_dates and msa_patent_uspc tables made in the same run,
+  whether they are written or not)
+The rows of each table are written sorted by its key (see msa_db.py), so
+  that they do not depend on the order of the interim tables
+The inputs are recognized by the name of their file, too, and only those
+  needed by the tables requested must be provided
+
+Usage:
+  python src/make-msa-tables.py -I INTERIM_TABLE ... -O TABLE ...
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import os
+from instrument import step, start_script
+from msa_db import sort_rows
+from msa_tables import TABLES, SOURCE_TYPES, needed_tables, needed_columns
+from parse_args import parse_io, add_table_options, add_instrument_options
+from patent_index import load_patent_index
+from table_io import read_table, write_table, set_options
+
+
+def table_name(path:str) -> str:
+    return os.path.basename(path).split('.')[0]
+
+
+def read_sources(paths:dict, columns:dict) -> dict:
+    """Read each source once, with all the columns needed"""
+    sources = {}
+    for source, source_columns in columns.items():
+        if source not in paths:
+            raise ValueError(f'Missing input: {source}')
+        if source_columns is None:
+            sources[source] = load_patent_index(paths[source])
+            continue
+        dtype = SOURCE_TYPES[source]
+        if dtype is not None:
+            dtype = {
+                col:col_type for col,col_type in dtype.items() \
+                    if col in source_columns}
+        sources[source] = read_table(
+            paths[source], columns=source_columns, dtype=dtype)
+    return sources
+
+
+def main():
+    args = parse_io(add_table_options, add_instrument_options)
+    start_script(
+        (args.output_list or [args.output])[0], args.metrics, args.profile)
+    set_options(compression_level=args.compression_level)
+
+    paths = {
+        table_name(path):path \
+            for path in args.input_list or [args.input]}
+    outputs = {
+        table_name(path):path \
+            for path in args.output_list or [args.output]}
+    unknown = [name for name in outputs if name not in TABLES]
+    if unknown:
+        raise ValueError(f'Unknown tables: {unknown}')
+
+    sources = read_sources(paths, needed_columns(list(outputs)))
+
+    tables = {}
+    order = needed_tables(list(outputs))
+    for position, name in enumerate(order):
+        table = TABLES[name]
+        with step(f'make {name}') as s:
+            tables[name] = table.make(
+                *[sources[source] for source in table.sources],
+                *[tables[other] for other in table.tables])
+            s.rows_out = len(tables[name])
+        if name in outputs:
+            write_table(sort_rows(tables[name], name), outputs[name])
+        # The tables are kept in memory only while other tables need them
+        for other in list(tables):
+            if not any([
+                    other in TABLES[later].tables \
+                        for later in order[position+1:]]):
+                del tables[other]
+
+
+if __name__ == '__main__':
+    main()
@@ -15,71 +15,101 @@ Date: 2021-03-02
 """
 
 
+import numpy as np
 import pandas as pd
-import os
-from parse_args import parse_io
+from instrument import step, start_script
+from parse_args import \
+    parse_io, add_chunk_options, add_seed_options, add_table_options, \
+    add_raw_options, add_instrument_options
+from patent_ids import convert_patent_id
+from patent_index import load_patent_index, isin_patent_index
+from table_io import read_table, write_table, set_options
+
+
+def filter_cpc(df_cpc:pd.DataFrame, patent_index:np.ndarray) -> pd.DataFrame:
+    """Main groups of the CPC subclasses of the patents in the index
+    The Y section and the 2000 series (main groups with 4 digits) are dropped
+    """
+    patent_id = convert_patent_id(df_cpc.patent_id)
+    df_cpc = df_cpc[isin_patent_index(patent_index, patent_id)] \
+        .assign(patent_id=patent_id)
+    # The main group is what comes before the "/" of the subgroup
+    df_cpc['main_group'] = df_cpc \
+        .subgroup_id \
+        .str.split('/', n=1) \
+        .str[0]
+    df_cpc = df_cpc[
+        (df_cpc.group_id.notna()) & \
+        (df_cpc.main_group.str.len()<8) & \
+        (~df_cpc.main_group.str.startswith('Y'))]
+    return df_cpc[['patent_id','group_id','main_group']].drop_duplicates()
+
+
+def count_main_groups(df_cpc:pd.DataFrame) -> pd.DataFrame:
+    """Number of distinct main groups of each CPC subclass of each patent
+    The CPC subclasses and the main groups are encoded as integer codes,
+      and the patent-subclass pairs are counted on a single integer key
+    """
+    class_codes, cpc_classes = pd.factorize(df_cpc.group_id, sort=True)
+    group_codes, _ = pd.factorize(df_cpc.main_group)
+    # The same main group can be found in different chunks
+    is_first = ~pd.DataFrame({
+            'patent_id':df_cpc.patent_id.values,
+            'main_group':group_codes}) \
+        .duplicated() \
+        .values
+    key = df_cpc.patent_id.values[is_first].astype(np.int64) * \
+        len(cpc_classes) + class_codes[is_first]
+    key, counts = np.unique(key, return_counts=True)
+    return pd.DataFrame({
+        'patent_id':(key // len(cpc_classes)).astype(np.uint32),
+        'cpc_class':cpc_classes.values[key % len(cpc_classes)],
+        'cpc_class_count':counts})
 
 
 def main():
-    args = parse_io()
-
-    patent_ids = set(
-            pd.read_table(
-                args.input_list[0], # msa_patent.tsv.zip
-                usecols=[
-                    'patent_id'],
-                dtype=int) \
-                .patent_id) \
-        .union(
-            pd.read_table(
-                args.input_list[1], # msa_citation.tsv.zip
-                usecols=[
-                    'forward_citation_id'],
-                dtype=int) \
-                .forward_citation_id)
-
-    df_cpc = pd.read_table(
-        args.input_list[2], # cpc_current.tsv.zip
-        usecols=[
+    args = parse_io(
+        add_chunk_options,
+        add_seed_options,
+        add_table_options,
+        add_raw_options,
+        add_instrument_options)
+    start_script(args.output, args.metrics, args.profile)
+    set_options(
+        compression_level=args.compression_level, raw_cache=args.raw_cache)
+
+    patent_index = load_patent_index(
+        args.input_list[0]) # msa_patent_index.npy
+
+    # If a chunk size is provided, the (large) cpc_current table is streamed
+    #  and only the rows of the patents in the index are kept from each chunk
+    df_cpc = read_table(
+        args.input_list[1], # cpc_current.tsv.zip
+        columns=[
             'patent_id',
             'group_id',
             'subgroup_id'],
-        dtype={
-            'patent_id':int,
-            'group_id':str,
-            'subgroup_id':str}) \
-        .rename(columns={
-            'group_id':'cpc_class'})
-    
-    df_cpc = df_cpc[df_cpc.patent_id.isin(patent_ids)]
-    
-    df_cpc['subgroup_id'] = df_cpc \
-        .subgroup_id \
-        .apply(lambda row: row.split('/')[0])
-    df_cpc.drop_duplicates(inplace=True)
-    
-    df_cpc = df_cpc[
-        (df_cpc.subgroup_id.str.len()<8) & \
-        (~df_cpc.subgroup_id.str.startswith('Y'))]
-        
-    df_cpc = df_cpc \
-        .value_counts([
-            'patent_id',
-            'cpc_class']) \
-        .reset_index(name='cpc_class_count') \
-        .sample(frac=1, random_state=1)
+        dtype=str,
+        chunksize=args.chunksize)
+    if args.chunksize is None:
+        df_cpc = [df_cpc]
+
+    with step('filter cpc_current'):
+        df_cpc = pd.concat(
+            [filter_cpc(df_chunk, patent_index) for df_chunk in df_cpc],
+            ignore_index=True)
+
+    with step('count main groups', rows_in=len(df_cpc)) as s:
+        df_cpc = count_main_groups(df_cpc)
+        s.rows_out = len(df_cpc)
+
+    # The rows are sorted by patent id and CPC subclass, unless a seed is
+    #  provided to shuffle them (always in the same way, given the seed)
+    if args.seed is not None:
+        df_cpc = df_cpc.take(
+            np.random.RandomState(args.seed).permutation(len(df_cpc)))
     
-    dir, file = os.path.split(args.output)
-    if not os.path.exists(dir):
-        os.makedirs(dir)
-
-    df_cpc.to_csv(
-        args.output, 
-        sep='\t', 
-        index=False, 
-        compression={
-            'method':'zip',
-            'archive_name':file.replace('.zip','')})
+    write_table(df_cpc, args.output)
 
 
 if __name__ == '__main__':
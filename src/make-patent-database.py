@@ -11,46 +11,180 @@ Date: 2021-02-05
 """
 
 
+import os
+import numpy as np
 import pandas as pd
 import geopandas as gpd
-import os
-from parse_args import parse_io
+from contextlib import nullcontext
+from delta import keep_affected, merge_rows
+from hashing import file_digest
+from instrument import step, start_script
+from location_cache import \
+    read_location_cache, write_location_cache, split_location_cache
+from parse_args import \
+    parse_io, add_cache_options, add_chunk_options, add_jobs_options, \
+    add_sql_options, add_delta_options, add_table_options, add_raw_options, \
+    add_instrument_options
+from patent_ids import convert_patent_id
+from patent_index import load_patent_index
+from sql_backend import \
+    Database, CHUNKSIZE, database_path, \
+    merge_patent_inventors, used_locations, locate_inventors
+from table_io import read_table, write_table, set_options
 
 
-def main():
-    args = parse_io()
+def geocode_locations(
+        df_location:pd.DataFrame, df_cbsa:gpd.GeoDataFrame) -> pd.DataFrame:
+    """Assign each location to the CBSA it is within 
+      (locations outside any CBSA have no CBSA)
+    """
+    geometry = gpd.points_from_xy(
+        df_location.longitude, df_location.latitude)
+    df_location = gpd.GeoDataFrame(
+        df_location[['location_id','latitude','longitude']], 
+        geometry=geometry, crs='EPSG:4269')
+    df_location = gpd.sjoin(
+        df_location, df_cbsa, 
+        how='left', op='within') \
+        .drop(columns=[
+            'index_right',
+            'geometry']) \
+        .drop_duplicates(subset='location_id')
+    return pd.DataFrame(df_location)
 
-    df_patent = pd.read_table(
-        args.input_list[0], # patent.tsv.zip
-        usecols=[
-            'id'],
-        dtype=str) \
-        .rename(columns={
-            'id':'patent_id'})
-    df_patent = df_patent[df_patent.patent_id.str.isnumeric()]
 
-    df_patent_inventor = pd.read_table(
-        args.input_list[1], # patent_inventor.tsv.zip
-        dtype=str) \
+def convert_patents(df_patent:pd.DataFrame) -> pd.DataFrame:
+    """Keep the utility patents, with their ids as integers
+      (already converted, if read from the raw columns; see raw_columns.py)
+    """
+    if pd.api.types.is_numeric_dtype(df_patent.patent_id):
+        return df_patent.query('patent_id!=0')
+    return df_patent[df_patent.patent_id.str.isnumeric()] \
+        .assign(patent_id=lambda df: convert_patent_id(df.patent_id)) \
+        .query('patent_id!=0')
+
+
+def merge_inventors(df_patent:pd.DataFrame, path:str) -> pd.DataFrame:
+    """Patent-inventor rows of the patents, with the share of the patent
+      of each inventor
+    """
+    df_patent_inventor = read_table(
+        path, # patent_inventor.tsv.zip
+        dtype={
+            'patent_id':str,
+            'inventor_id':'category',
+            'location_id':'category'}) \
         .dropna()
+    df_patent_inventor['patent_id'] = convert_patent_id(
+        df_patent_inventor.patent_id)
+
+    with step('merge inventors', rows_in=len(df_patent_inventor)) as s:
+        df_patent = pd.merge(df_patent, df_patent_inventor)
+        del df_patent_inventor
+
+        # Number of distinct inventors of each patent
+        n_inventors = pd.DataFrame({
+                'patent_id':df_patent.patent_id.values,
+                'inventor_code':df_patent.inventor_id.cat.codes.values}) \
+            .drop_duplicates() \
+            .patent_id \
+            .value_counts()
+        df_patent['inventor_share'] = 1 / df_patent.patent_id \
+            .map(n_inventors) \
+            .values
+        del n_inventors
+        s.rows_out = len(df_patent)
+    return df_patent
+
+
+def load_inventors(
+        db:Database, paths:list, chunksize:int, affected:np.ndarray=None):
+    """Load the patents (only the affected ones, if provided) and their
+      inventors into the database and merge them (see sql_backend.py)
+    """
+    db.load(
+        'patent',
+        (keep_affected(
+            convert_patents(df_chunk.rename(columns={'id':'patent_id'})),
+            affected) \
+            for df_chunk in read_table(
+                paths[0], # patent.tsv.zip
+                columns=[
+                    'id'],
+                dtype=str,
+                chunksize=chunksize)))
+    # The incomplete rows are kept, since pandas makes the categories 
+    #  of the inventors from all of them
+    db.load(
+        'patent_inventor',
+        (df_chunk \
+            .assign(
+                is_complete=df_chunk.notna().all(axis=1),
+                patent_id=convert_patent_id(df_chunk.patent_id)) \
+            [['patent_id','inventor_id','location_id','is_complete']] \
+                for df_chunk in read_table(
+                    paths[1], # patent_inventor.tsv.zip
+                    dtype=str,
+                    chunksize=chunksize)))
+    with step('merge inventors'):
+        merge_patent_inventors(db)
+
+
+def broadcast_locations(
+        df_patent:pd.DataFrame, df_location:pd.DataFrame,
+        location_code:np.ndarray) -> pd.DataFrame:
+    """Broadcast the CBSA of each location to the patent-inventor rows, 
+      joining them through the integer code of the location
+      (-1 for the rows whose location has no CBSA)
+    """
+    is_located = location_code>=0
+    return pd.concat([
+            df_patent[is_located] \
+                .reset_index(drop=True),
+            df_location \
+                .drop(columns='location_id') \
+                .take(location_code[is_located]) \
+                .reset_index(drop=True)],
+        axis=1)
+
 
-    df_patent = pd.merge(df_patent, df_patent_inventor)
-    del df_patent_inventor
+def make_patent(args, db:Database=None):
+    """Make the MSA patent table
+    With the duckdb backend, the heavy joins run in the database provided
+    """
 
-    df_patent = pd.merge(
-        df_patent, 
-        1 / df_patent \
-            .groupby('patent_id') \
-            .agg({
-                'inventor_id':'nunique'}) \
+    # In the incremental mode, only the patents affected by the new release
+    #  of the raw data are recomputed (see delta.py)
+    affected = load_patent_index(args.delta) \
+        if args.delta is not None and os.path.exists(args.output) else None
+
+    # The keys are encoded at load time (the patent ids as integers, 
+    #  the inventor and location ids as categoricals), so that the tables 
+    #  are joined and aggregated on compact integer codes
+    # With the duckdb backend, the tables are joined out of core instead
+    if args.backend=='duckdb':
+        load_inventors(
+            db, args.input_list, args.chunksize or CHUNKSIZE, affected)
+        location_ids = used_locations(db)
+    else:
+        df_patent = read_table(
+            args.input_list[0], # patent.tsv.zip
+            columns=[
+                'id'],
+            dtype=str) \
             .rename(columns={
-                'inventor_id':'inventor_share'}),
-        left_on='patent_id', right_index=True, 
-        how='left')
+                'id':'patent_id'})
+        df_patent = merge_inventors(
+            keep_affected(convert_patents(df_patent), affected), 
+            args.input_list[1]) # patent_inventor.tsv.zip
+        location_code = df_patent.location_id.cat.codes.values
+        location_ids = df_patent.location_id.cat.categories[
+            np.unique(location_code[location_code>=0])]
+        del location_code
 
-    df_location = pd.read_table(
+    df_location = read_table(
         args.input_list[2], # location.tsv.zip
-        usecols=[
+        columns=[
             'id',
             'latitude',
             'longitude'],
@@ -61,48 +195,85 @@ def main():
         .rename(columns={
             'id':'location_id'})
 
-    df_patent = pd.merge(df_patent, df_location)
-    del df_location
+    # Geocode only the (few) distinct locations of the inventors
+    df_location = df_location[df_location.location_id.isin(location_ids)]
+    del location_ids
 
-    geometry = gpd.points_from_xy(
-        df_patent.longitude, df_patent.latitude)
-    df_patent = gpd.GeoDataFrame(
-        df_patent, geometry=geometry, crs='EPSG:4269')
+    # Geocode only the locations that are not already in the cache 
+    #  (if any is provided)
+    shapefile_hash = file_digest(args.input_list[3])
+    df_cache = read_location_cache(args.cache, shapefile_hash)
+    df_location, df_miss = split_location_cache(df_location, df_cache)
 
-    df_patent.drop(
-        columns=[
-            'location_id',
+    if len(df_miss)>0:
+        # M1 = Metropolitan areas
+        df_cbsa = gpd.read_file( # cb_2019_us_cbsa_20m.zip
+            f'zip://{args.input_list[3]}') \
+            .query('LSAD=="M1"') \
+            .drop(columns=['LSAD','ALAND','AWATER']) \
+            .rename(columns={
+                'CSAFP':'csa_id',
+                'CBSAFP':'cbsa_id',
+                'NAME':'cbsa_label'})
+        with step('geocode locations', rows_in=len(df_miss)) as s:
+            df_miss = geocode_locations(df_miss, df_cbsa)
+            s.rows_out = len(df_miss)
+        del df_cbsa
+        df_location = pd.concat([df_location, df_miss], ignore_index=True)
+        if args.cache is not None:
+            write_location_cache(
+                pd.concat([df_cache, df_miss], ignore_index=True), 
+                args.cache, shapefile_hash)
+    del df_cache, df_miss
+
+    df_location = df_location[~df_location.cbsa_id.isna()] \
+        .drop(columns=[
             'latitude',
-            'longitude'], 
-        inplace=True)
-
-    # M1 = Metropolitan areas
-    df_cbsa = gpd.read_file( # cb_2019_us_cbsa_20m.zip
-        f'zip://{args.input_list[3]}') \
-        .query('LSAD=="M1"') \
-        .drop(columns=['LSAD','ALAND','AWATER']) \
-        .rename(columns={
-            'CSAFP':'csa_id',
-            'CBSAFP':'cbsa_id',
-            'NAME':'cbsa_label'})
-
-    df_patent = gpd.sjoin(
-        df_patent, df_cbsa, 
-        op='within') \
-        .drop(columns='index_right')
-    df_patent = pd.DataFrame(df_patent)
-    del df_cbsa
-
-    dir, file = os.path.split(args.output)
-    if not os.path.exists(dir):
-        os.makedirs(dir)
-    df_patent.to_csv(
-        args.output, 
-        sep='\t', 
-        index=False, 
-        compression={
-            'method':'zip',
-            'archive_name':file.replace('.zip','')})
+            'longitude'])
+
+    if args.backend=='duckdb':
+        with step('locate inventors') as s:
+            df_patent = locate_inventors(db, df_location.location_id)
+            s.rows_out = len(df_patent)
+        # Free the disk used by the database as soon as possible
+        db.close()
+        location_code = df_patent.pop('location_code').values
+    else:
+        location_code = pd.Categorical(
+                df_patent.location_id, 
+                categories=df_location.location_id) \
+            .codes
+        df_patent = df_patent.drop(columns='location_id')
+    df_patent = broadcast_locations(df_patent, df_location, location_code)
+    del df_location, location_code
+
+    if affected is not None:
+        df_patent = merge_rows(read_table(args.output), df_patent, affected)
+
+    write_table(df_patent, args.output)
+
+
+def main():
+    args = parse_io(
+        add_cache_options,
+        add_chunk_options,
+        add_jobs_options,
+        add_sql_options,
+        add_delta_options,
+        add_table_options,
+        add_raw_options,
+        add_instrument_options)
+    start_script(args.output, args.metrics, args.profile)
+    set_options(
+        compression_level=args.compression_level, raw_cache=args.raw_cache)
+
+    # The database (if any) is closed, and its files removed, 
+    #  even if the stage fails
+    with Database(
+                database_path(args.output), 
+                memory=args.memory, jobs=args.jobs) \
+            if args.backend=='duckdb' else nullcontext() as db:
+        make_patent(args, db)
 
 
 if __name__ == '__main__':
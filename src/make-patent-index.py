@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+"""
+Make the membership index of the patents of interest
+The index marks the patents (partly) invented in a MSA
+  and the patents that cite them (forward citations)
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import numpy as np
+from parse_args import parse_io, add_instrument_options
+from instrument import start_script
+from patent_index import make_patent_index, save_patent_index
+from table_io import read_table, set_options
+
+
+def main():
+    args = parse_io(add_instrument_options)
+    start_script(args.output, args.metrics, args.profile)
+    set_options()
+
+    msa_patent_ids = read_table(
+        args.input_list[0], # msa_patent.parquet
+        columns=['patent_id'],
+        dtype=np.uint32) \
+        .patent_id.values
+    
+    forward_citation_ids = read_table(
+        args.input_list[1], # msa_citation.parquet
+        columns=['forward_citation_id'],
+        dtype=np.uint32) \
+        .forward_citation_id.values
+
+    index = make_patent_index(
+        np.concatenate([msa_patent_ids, forward_citation_ids]))
+
+    save_patent_index(index, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -21,21 +21,33 @@ Date: 2021-03-06
 """
 
 
+import os
 import numpy as np
 import pandas as pd
-import os
-import requests
-from parse_args import parse_io
-
-
-def convert_patent_id(patent_id):
-    patent_id = pd.to_numeric(
-        patent_id, 
-        errors='coerce', 
-        downcast='unsigned')
-    if pd.isna(patent_id):
-        patent_id = 0
-    return patent_id
+from contextlib import nullcontext
+from functools import partial
+from citation_graph import \
+    is_citation_graph, load_citation_graph, citation_edges, edge_chunks
+from citation_windows import count_citations
+from date_repair import fetch_dates
+from dates import parse_dates, to_datetime
+from delta import extend_index, keep_affected, merge_rows
+from instrument import step, start_script
+from parse_args import \
+    parse_io, add_cache_options, add_chunk_options, add_jobs_options, \
+    add_sql_options, add_delta_options, add_table_options, add_raw_options, \
+    add_instrument_options
+from sql_backend import \
+    Database, CHUNKSIZE, database_path, \
+    merge_applications, patent_uspc_classes
+from sql_backend import count_citations as count_citations_sql
+from table_io import read_table, write_table, set_options
+from patent_ids import convert_patent_id
+from patent_index import load_patent_index, index_patent_ids
+
+
+# Years after the grant date in which the forward citations are counted
+CITATION_WINDOWS = [5, 10]
 
 uspc_classes = [
     '002','004','005','007','008','012','014','015','016','019','023',
@@ -82,113 +94,151 @@ uspc_classes = [
     'D14','D15','D16','D17','D18','D19','D20','D21','D22','D23','D24',
     'D25','D26','D27','D28','D29','D30','D32','D34','D99','PLT']
 
-def convert_uspc_class(uspc_class):
-    if str(uspc_class) in uspc_classes:
-        return uspc_class
-    return 'XXX'
+def convert_uspc_class(uspc_class:pd.Series) -> pd.Series:
+    return uspc_class.where(uspc_class.isin(uspc_classes), 'XXX')
 
-def fix_dates(dataframe:pd.DataFrame, dates_column:str):
+
+def is_censored(
+        grant_dates:pd.Series, grant_date_last, years:int) -> pd.Series:
+    """Patents granted too recently to observe the whole citation window"""
+    return grant_dates > grant_date_last - pd.tseries.offsets.Day(years*365)
+
+
+def fix_dates(
+        dataframe:pd.DataFrame, dates_column:str, 
+        cache:str=None, jobs:int=None):
     """Fix wrong dates in the PatentsView database
     Some (grant and application) dates on PatentsView are wrongly reported 
       and cannot be converted into proper dates. However, if you look on the
       PatentsView website, most (all?) are correct. Therefore, this module
       uses the PatentsView APIs to retrieve the correct dates 
       (or, as a second-best, it tries to fix them with a simple heuristic)
+    The dates retrieved are cached (see date_repair.py)
     """
-    # Use the PatentsView API to fix those application dates 
-    #  that cannot be coerced into proper dates
-    dataframe['date_'] = pd.to_datetime(
-        dataframe[dates_column], errors='coerce')
-    dataframe.sort_values(by=['patent_id','date_'], inplace=True)
-    dataframe.set_index('patent_id', inplace=True)
-    patents_to_fix = ','.join([f'{{"patent_number":"{patent_id}"}}' \
-        for patent_id in dataframe[dataframe.date_.isna()].index])
-    patents_to_fix_n = sum(dataframe.date_.isna())
-    if patents_to_fix_n>0:
-        query = ''.join([
-            'https://api.patentsview.org/patents/query?q={"_or":[',
-            patents_to_fix,
-            ']}&f=["patent_number","patent_date"]&o={"per_page":',
-            str(patents_to_fix_n), '}'])
-        response = requests.get(query)
-        df_fix = pd.DataFrame(response.json()['patents'], dtype=str)
-        df_fix.rename(columns={
-            'patent_number':'patent_id', 
-            'patent_date':dates_column}, inplace=True)
-        df_fix.sort_values(by=['patent_id',dates_column], inplace=True)
-        df_fix.set_index('patent_id', inplace=True)
-        dataframe.update(df_fix)
-    dataframe.drop(columns='date_', inplace=True)
-    dataframe.reset_index(inplace=True)
+    # Use the PatentsView API to fix those dates 
+    #  that cannot be parsed into proper dates
+    _, is_wrong = parse_dates(dataframe[dates_column])
+    if is_wrong.any():
+        fixed_dates = fetch_dates(
+            dataframe.patent_id.values[is_wrong], dates_column, 
+            cache=cache, jobs=jobs)
+        fixed_dates = fixed_dates \
+            .reindex(dataframe.patent_id.values[is_wrong]) \
+            .values
+        is_fixed = ~pd.isna(fixed_dates)
+        dataframe.loc[
+            dataframe.index[is_wrong][is_fixed], 
+            dates_column] = fixed_dates[is_fixed]
     dataframe.sort_values(by=['patent_id',dates_column], inplace=True)
+    dataframe.reset_index(drop=True, inplace=True)
         
     # At this point, all the mistakes should have been fixed
     #  Anyhow, the script will fix dates that are possibly still wrong 
     #  applying some heuristic with the best guesses we can do, 
-    #  given the information provided
-    # Fix any date that has "00" as day, putting "01" inplace
-    subset = dataframe[dates_column].str.endswith('00')
-    if len(subset)>0:
-        dataframe.loc[
-            subset,dates_column] = dataframe.loc[
-                subset,dates_column].str[:-2] + '01'
-        # Fix any date that who's year doesn't start with "19" or "20", 
-        #  putting "19" inplace
-        subset = dataframe[dates_column].str[:2].isin(['19','20'])
-        dataframe.loc[
-            ~subset,dates_column] = '19' + dataframe.loc[
-                ~subset,dates_column].str[2:]
+    #  given the information provided (see dates.py)
+    # The dates that cannot be fixed in any way become NaT
+    dataframe[dates_column] = to_datetime(
+        dataframe[dates_column], repair=True)
     
     return dataframe
 
 
-def main():
-    args = parse_io()
+def convert_grants(df_patent:pd.DataFrame) -> pd.DataFrame:
+    df_patent = df_patent \
+        .rename(columns={
+            'id':'patent_id',
+            'date':'grant_date'})
+    df_patent['patent_id'] = convert_patent_id(df_patent.patent_id)
+    return df_patent
+
+
+def convert_applications(df_application:pd.DataFrame) -> pd.DataFrame:
+    df_application = df_application \
+        .rename(columns={
+            'date':'appln_date'})
+    df_application['patent_id'] = convert_patent_id(
+        df_application.patent_id)
+    return df_application
 
-    df_patent = pd.read_table(
+
+def convert_patex(df_patex:pd.DataFrame) -> pd.DataFrame:
+    df_patex = df_patex \
+        .rename(columns={
+            'patent_number':'patent_id'})
+    df_patex['uspc_class'] = convert_uspc_class(df_patex.uspc_class)
+    df_patex['patent_id'] = convert_patent_id(df_patex.patent_id)
+    return df_patex
+
+
+def convert_citations(df_patent_citation:pd.DataFrame) -> pd.DataFrame:
+    df_patent_citation = df_patent_citation \
+        .rename(columns={
+            'patent_id':'forward_citation_id',
+            'citation_id':'patent_id'})
+    for col in ['patent_id', 'forward_citation_id']:
+        df_patent_citation[col] = convert_patent_id(df_patent_citation[col])
+    return df_patent_citation \
+        .query('patent_id!=0 & forward_citation_id!=0')
+
+
+def load_patents(args, db:Database=None) -> pd.DataFrame:
+    """Grant and application dates (fixed, see fix_dates) and number of 
+      claims of the patents
+    With the duckdb backend, the raw tables are merged in the database provided
+    """
+    chunksize = args.chunksize or CHUNKSIZE
+    read_patent = partial(
+        read_table,
         args.input_list[0], # patent.tsv.zip
-        usecols=[
+        columns=[
             'id',
             'date'],
-        dtype={
-            'date':str},
-        converters={
-            'id':convert_patent_id}) \
-        .rename(columns={
-            'id':'patent_id',
-            'date':'grant_date'}) \
-        .drop_duplicates() \
-        .query('patent_id!=0') \
-        .astype({
-            'patent_id':np.uint32})
-
-    df_application = pd.read_table(
+        dtype=str)
+    read_application = partial(
+        read_table,
         args.input_list[1], # application.tsv.zip
-        usecols=[
+        columns=[
             'patent_id',
             'date',
             'num_claims'],
         dtype={
+            'patent_id':str,
             'date':str,
-            'num_claims':float},
-        converters={
-            'patent_id':convert_patent_id}) \
-        .rename(columns={
-            'date':'appln_date'}) \
-        .drop_duplicates() \
-        .query('patent_id!=0') \
-        .astype({
-            'patent_id':np.uint32})
-
-    df_patent = pd.merge(
-        df_patent, df_application, 
-        how='left')
-    del df_application
+            'num_claims':float})
+
+    # With the duckdb backend, the raw tables are loaded chunk by chunk 
+    #  into a database, and joined and aggregated out of core there
+    if args.backend=='duckdb':
+        db.load(
+            'patent', 
+            (convert_grants(df_chunk) \
+                for df_chunk in read_patent(chunksize=chunksize)))
+        db.load(
+            'application', 
+            (convert_applications(df_chunk) \
+                for df_chunk in read_application(chunksize=chunksize)))
+        with step('merge applications') as s:
+            df_patent = merge_applications(db)
+            s.rows_out = len(df_patent)
+    else:
+        df_patent = convert_grants(read_patent()) \
+            .drop_duplicates() \
+            .query('patent_id!=0')
+
+        df_application = convert_applications(read_application()) \
+            .drop_duplicates() \
+            .query('patent_id!=0')
+
+        df_patent = pd.merge(
+            df_patent, df_application, 
+            how='left')
+        del df_application
 
     for date_column in ['grant_date', 'appln_date']:
-        df_patent = fix_dates(df_patent, date_column)
-        df_patent[date_column] = pd.to_datetime(
-            df_patent[date_column])
+        with step(f'fix {date_column}', rows_in=len(df_patent)):
+            df_patent = fix_dates(
+                df_patent, date_column, 
+                cache=args.cache, jobs=args.jobs)
 
     df_patent = df_patent[
         (~df_patent.grant_date.isna()) & 
@@ -197,106 +247,202 @@ def main():
     df_patent['grant_year'] = df_patent.grant_date.dt.year
     df_patent['appln_year'] = df_patent.appln_date.dt.year
 
-    grant_date_last = df_patent.grant_date.max()
+    return df_patent
 
-    df_patex = pd.read_csv(
+
+def apply_delta(args, df_patent:pd.DataFrame, grant_date_last) -> tuple:
+    """Patents recomputed in the incremental mode, i.e. those affected by 
+      the new release of the raw data (see delta.py) and those whose 
+      citation counts are no longer (or now) censored
+    The table previously built and the index of the affected patents are 
+      returned too (both None, if the whole table is recomputed)
+    """
+    if args.delta is None or not os.path.exists(args.output):
+        return df_patent, None, None
+    df_previous = read_table(args.output)
+    is_changed = np.zeros(len(df_previous), dtype=bool)
+    for years in CITATION_WINDOWS:
+        is_changed |= \
+            df_previous[f'num_citations_{years}y'].isna().values != \
+            is_censored(
+                to_datetime(df_previous.grant_date), 
+                grant_date_last, years).values
+    affected = extend_index(
+        load_patent_index(args.delta),
+        df_previous.patent_id.values[is_changed])
+    return keep_affected(df_patent, affected), df_previous, affected
+
+
+def load_uspc_classes(args, db:Database=None) -> pd.DataFrame:
+    """USPC main class of the patents, according to PatEx"""
+    chunksize = args.chunksize or CHUNKSIZE
+    read_patex = partial(
+        read_table,
         args.input_list[2], # application_data.csv.zip
-        usecols=[
+        columns=[
             'uspc_class', 
             'patent_number'],
-        converters={
-            'uspc_class':convert_uspc_class,
-            'patent_number':convert_patent_id}) \
-        .rename(columns={
-            'patent_number':'patent_id'}) \
-        .drop_duplicates() \
-        .dropna() \
-        .query('patent_id!=0 & uspc_class!="XXX"') \
+        dtype=str)
+    if args.backend=='duckdb':
+        db.load(
+            'patex', 
+            (convert_patex(df_chunk) \
+                for df_chunk in read_patex(chunksize=chunksize)))
+        df_patex = patent_uspc_classes(db)
+    else:
+        df_patex = convert_patex(read_patex()) \
+            .drop_duplicates() \
+            .dropna() \
+            .query('patent_id!=0 & uspc_class!="XXX"')
+    df_patex = df_patex \
         .astype({
             'uspc_class':str,
             'patent_id':np.uint32})
 
     df_patex['uspc_class'] = pd.Categorical(df_patex.uspc_class)
+    return df_patex
 
-    df_patent = pd.merge(
-        df_patent, df_patex, 
-        how='left')
-    del df_patex
 
-    df_patent_citation = pd.read_table(
+def count_patent_citations(
+        args, db:Database, df_patent_grant:pd.DataFrame,
+        affected:np.ndarray=None) -> pd.DataFrame:
+    """Forward citations received by each patent provided (with its grant 
+      date) in the years following its grant date, indexed by patent id
+    Only the citations of the affected patents are read, if provided
+    With the duckdb backend, the citations are counted in the database 
+      provided, which is then closed
+    """
+    chunksize = args.chunksize or CHUNKSIZE
+    read_patent_citation = partial(
+        read_table,
         args.input_list[3], # uspatentcitation.tsv.zip
-        usecols=[
+        columns=[
             'patent_id',
             'citation_id'], 
-        converters={
-            'patent_id':convert_patent_id,
-            'citation_id':convert_patent_id}) \
-        .rename(columns={
-            'patent_id':'forward_citation_id',
-            'citation_id':'patent_id'}) \
-        .query('patent_id!=0 & forward_citation_id!=0') \
-        .astype({
-            'patent_id':np.uint32,
-            'forward_citation_id':np.uint32})
-
-    df_patent_citation = pd.merge(
-        df_patent_citation, df_patent)
-    df_patent_citation = pd.merge(
-        df_patent_citation, df_patent \
-            [['patent_id','grant_date']] \
-            .rename(columns={
-                'patent_id':'forward_citation_id',
-                'grant_date':'forward_citation_grant_date'}))
-    # del df_patent
-
-    df_patent_citation['time_length'] = df_patent_citation \
-        .forward_citation_grant_date \
-        .sub(df_patent_citation.grant_date)
-
-    df_patent_citation = df_patent_citation[df_patent_citation.time_length.dt.days<=10*365]
-
-    df_patent_citation_10y = df_patent_citation \
-        .groupby('patent_id') \
-        .agg({'forward_citation_id':'nunique'}) \
-        .rename(columns={'forward_citation_id':'num_citations_10y'})
-
-    df_patent_citation = df_patent_citation[df_patent_citation.time_length.dt.days<=5*365]
-
-    df_patent_citation_5y = df_patent_citation \
-        .groupby('patent_id') \
-        .agg({'forward_citation_id':'nunique'}) \
-       .rename(columns={'forward_citation_id':'num_citations_5y'})
-
-    df_patent_citation = pd.merge(
-        df_patent_citation_5y, df_patent_citation_10y,
-        left_index=True, right_index=True,
-        how='outer')
-    del df_patent_citation_5y, df_patent_citation_10y
-
-    df_patent_citation = pd.merge(
-        df_patent_citation, df_patent,
-        left_index=True, right_on='patent_id')
-
-    for years in [5,10]:
+        dtype=str)
+
+    # The citations are read from the citation graph, if provided 
+    #  (see citation_graph.py), where the forward citations of the 
+    #  (affected) patents are looked up without reading the whole table
+    graph = load_citation_graph(args.input_list[3]) \
+        if is_citation_graph(args.input_list[3]) else None
+
+    # Count, in a single pass over the citations, the forward citations 
+    #  received by each patent in the years following its grant date
+    if args.backend=='duckdb':
+        if graph is not None:
+            citation_chunks = edge_chunks(graph, chunksize)
+        else:
+            citation_chunks = (
+                convert_citations(df_chunk) \
+                    for df_chunk in read_patent_citation(chunksize=chunksize))
+        db.load(
+            'citation', 
+            (keep_affected(df_chunk, affected) \
+                for df_chunk in citation_chunks))
+        with step('count citations', rows_out=len(df_patent_grant)):
+            citation_counts = count_citations_sql(
+                db,
+                df_patent_grant.patent_id.values,
+                df_patent_grant.grant_date.values,
+                CITATION_WINDOWS)
+        # Free the disk used by the database as soon as possible
+        db.close()
+    else:
+        if graph is not None:
+            cited, citing = citation_edges(
+                graph, 
+                index_patent_ids(affected) if affected is not None else None)
+        else:
+            df_patent_citation = keep_affected(
+                convert_citations(read_patent_citation()), affected)
+            cited = df_patent_citation.patent_id.values
+            citing = df_patent_citation.forward_citation_id.values
+            del df_patent_citation
+        with step('count citations', 
+                rows_in=len(cited), 
+                rows_out=len(df_patent_grant)):
+            citation_counts = count_citations(
+                cited,
+                citing,
+                df_patent_grant.patent_id.values,
+                df_patent_grant.grant_date.values,
+                CITATION_WINDOWS)
+        del cited, citing
+
+    return pd.DataFrame(
+        citation_counts,
+        columns=[f'num_citations_{years}y' for years in CITATION_WINDOWS],
+        index=df_patent_grant.patent_id)
+
+
+def make_patent_info(args, db:Database=None):
+    """Make the patent info table
+    With the duckdb backend, the heavy joins run in the database provided
+    """
+    df_patent = load_patents(args, db)
+
+    grant_date_last = df_patent.grant_date.max()
+
+    # The forward citations are counted among all the patents (the citing 
+    #  patents are not necessarily among those recomputed)
+    df_patent_grant = df_patent[['patent_id','grant_date']] \
+        .drop_duplicates(subset='patent_id')
+
+    df_patent, df_previous, affected = apply_delta(
+        args, df_patent, grant_date_last)
+
+    df_patent = pd.merge(
+        df_patent, load_uspc_classes(args, db), 
+        how='left')
+
+    df_patent_citation = count_patent_citations(
+        args, db, df_patent_grant, affected)
+    del df_patent_grant
+
+    df_patent = pd.merge(
+        df_patent, df_patent_citation,
+        left_on='patent_id', right_index=True,
+        how='left')
+    del df_patent_citation
+
+    # The counts of the patents granted too recently to observe 
+    #  the whole window are censored
+    for years in CITATION_WINDOWS:
         col = f'num_citations_{years}y'
-        threshold = grant_date_last - pd.tseries.offsets.Day(years*365)
-        df_patent_citation[col] = df_patent_citation[col] \
+        df_patent[col] = df_patent[col] \
             .fillna(0)
-        df_patent_citation.loc[
-            df_patent_citation.grant_date > threshold,
+        df_patent.loc[
+            is_censored(df_patent.grant_date, grant_date_last, years),
             col] = np.nan
 
-    dir, file = os.path.split(args.output)
-    if not os.path.exists(dir):
-        os.makedirs(dir)
-
-    df_patent.to_csv(
-        args.output, 
-        sep='\t', 
-        index=False, 
-        compression={
-            'method':'zip',
-            'archive_name':file.replace('.zip','')})
+    if df_previous is not None:
+        df_patent = merge_rows(df_previous, df_patent, affected)
+
+    write_table(df_patent, args.output)
+
+
+def main():
+    args = parse_io(
+        add_cache_options,
+        add_chunk_options,
+        add_jobs_options,
+        add_sql_options,
+        add_delta_options,
+        add_table_options,
+        add_raw_options,
+        add_instrument_options)
+    start_script(args.output, args.metrics, args.profile)
+    set_options(
+        compression_level=args.compression_level, raw_cache=args.raw_cache)
+
+    # The database (if any) is closed, and its files removed, 
+    #  even if the stage fails
+    with Database(
+                database_path(args.output), 
+                memory=args.memory, jobs=args.jobs) \
+            if args.backend=='duckdb' else nullcontext() as db:
+        make_patent_info(args, db)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+"""
+Convert the raw columns used by the project into typed binary arrays
+  (see raw_columns.py), that the stages read memory mapped instead of
+  parsing the raw text table again
+The table is recognized by the name of its file (e.g., patent.tsv.zip)
+
+Usage:
+  python src/make-raw-columns.py -i RAW_TABLE -o TABLE.columns [-c CHUNKSIZE]
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import os
+from parse_args import \
+    parse_io, add_chunk_options, add_raw_options, add_instrument_options
+from instrument import start_script
+from raw_columns import RAW_COLUMNS, RAW_TYPES, ColumnsWriter
+from table_io import read_table, set_options
+
+
+# Rows read at once from the raw table, if no chunk size is provided
+CHUNKSIZE = 1000000
+
+
+def main():
+    args = parse_io(add_chunk_options, add_raw_options, add_instrument_options)
+    start_script(args.output, args.metrics, args.profile)
+    set_options(raw_cache=args.raw_cache)
+
+    name = os.path.basename(args.input).split('.')[0]
+    if name not in RAW_COLUMNS:
+        raise ValueError(f'Unknown raw table: {args.input}')
+    kinds = RAW_COLUMNS[name]
+
+    with ColumnsWriter(args.output, kinds) as writer:
+        for df_chunk in read_table(
+                args.input,
+                columns=list(kinds),
+                dtype={col:RAW_TYPES[kind] for col,kind in kinds.items()},
+                chunksize=args.chunksize or CHUNKSIZE):
+            writer.write(df_chunk)
+
+
+if __name__ == '__main__':
+    main()
@@ -14,11 +14,13 @@ Date: 2021-02-06
 
 import pandas as pd
 import os
-from parse_args import parse_io
+from parse_args import parse_io, add_instrument_options
+from instrument import start_script
 
 
 def main():
-    args = parse_io()
+    args = parse_io(add_instrument_options)
+    start_script(args.output, args.metrics, args.profile)
 
     dir, file = os.path.split(args.output)
     if not os.path.exists(dir):
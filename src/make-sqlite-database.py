@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+"""
+Export the processed tables of the database into a single SQLite file,
+  with primary keys and indexes (see msa_db.py)
+Each table is recognized by the name of its file
+
+Usage:
+  python src/make-sqlite-database.py -I TABLE ... -o DATABASE.sqlite
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import os
+import sqlite3
+from instrument import step, count_rows, start_script
+from msa_db import write_sqlite_table
+from parse_args import parse_io, add_instrument_options
+from table_io import read_table, make_dir, set_options
+
+
+def main():
+    args = parse_io(add_instrument_options)
+    start_script(args.output, args.metrics, args.profile)
+    set_options()
+
+    make_dir(args.output)
+    # Write the database atomically, to never leave a broken one behind
+    tmp_path = f'{args.output}.tmp.{os.getpid()}'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    con = sqlite3.connect(tmp_path)
+    # The database is written from scratch, therefore it needs no journal
+    con.execute('PRAGMA journal_mode=OFF')
+    con.execute('PRAGMA synchronous=OFF')
+    try:
+        for path in args.input_list or [args.input]:
+            name = os.path.basename(path).split('.')[0]
+            df = read_table(path)
+            with step(f'write {name}', rows_in=len(df)):
+                write_sqlite_table(df, name, con)
+            count_rows(rows_out=len(df))
+            del df
+        # Statistics of the indexes, used by the query planner
+        con.execute('ANALYZE')
+        con.close()
+    except BaseException:
+        con.close()
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, args.output)
+
+
+if __name__ == '__main__':
+    main()
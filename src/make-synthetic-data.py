@@ -0,0 +1,413 @@
+#!/usr/bin/env python
+
+"""
+Make synthetic raw data, shaped as the PatentsView, PatEx and
+  Census Bureau files the project is built from, to test and benchmark
+  the scripts without downloading them
+The files produced have the names and the columns of the original ones
+  (see the Makefile) and reproduce their main features
+* grant dates that grow with the patent number (every Tuesday, 1976-2020)
+  and application dates about three years before them
+* utility, design (D) and reissue (RE) patents
+* (optionally) a few dates that cannot be parsed (e.g., with "00" as day)
+* a skewed number of claims, inventors, CPC classes and citations per patent
+* inventors that live in a few large CBSAs (or outside any of them)
+* citations that mostly go to recent patents (but also to patents
+  older than the first one, or to non-utility patents)
+* applications without a patent and patents without a USPC class
+The size of the data is set by the number of patents (the other tables
+  are a multiple of it, e.g., about ten citations per patent) and
+  the tables are written in chunks, so that large sizes can be produced
+  with a limited amount of memory
+
+Usage:
+  python src/make-synthetic-data.py -o DATA_DIR -n PATENTS [--seed SEED]
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import os
+import tempfile
+import zipfile
+from shapely.geometry import box
+from parse_args import \
+    parse_io, add_chunk_options, add_seed_options, add_table_options
+from table_io import TableWriter, set_options
+
+
+FIRST_PATENT_ID = 3930000
+FIRST_GRANT_DATE = np.datetime64('1976-01-06')
+GRANT_WEEKS = 2334 # up to 2020-09-29
+
+SHARE_DESIGN = .03
+SHARE_REISSUE = .005
+# A few dates cannot be parsed, as in the raw data. They are fixed through
+#  the PatentsView API or, if it cannot be reached, heuristically
+SHARE_BAD_DATES = .002
+SHARE_NO_USPC = .05
+SHARE_BAD_USPC = .01
+SHARE_UNGRANTED = .3
+SHARE_LOCATED_IN_CBSA = .75
+
+# Some of the largest USPC main classes (utility, design and plant),
+#  and a few that are not valid
+USPC_CLASSES = [
+    '257','514','424','435','438','370','428','439','709','455','345',
+    '359','348','362','210','156','623','606','600','604','D14','D06',
+    'D12','D07','PLT']
+BAD_USPC_CLASSES = ['999','D00','G9B']
+
+AVG_CLAIMS = 17
+AVG_INVENTORS = 2.4
+AVG_CPC = 2.5
+AVG_CITATIONS = 10
+
+# Bounding box of the contiguous US (longitude, latitude)
+US_BOUNDS = (-124., 26., -68., 48.)
+CBSA_GRID = (12, 5)
+
+
+def zipf_weights(n:int, exponent:float, rng:np.random.RandomState) \
+        -> np.ndarray:
+    """Probabilities of n items, with a power-law distribution
+      over a random ranking of the items
+    """
+    weights = 1 / np.arange(1, n+1)**exponent
+    weights = weights[rng.permutation(n)]
+    return weights / weights.sum()
+
+
+def draw_uspc_classes(
+        size:int, weights:np.ndarray, rng:np.random.RandomState) \
+        -> np.ndarray:
+    """USPC main classes of the patents, a few of which are not valid"""
+    uspc_class = rng.choice(
+        np.array(USPC_CLASSES, dtype=object), size=size, p=weights)
+    is_bad = rng.rand(size)<SHARE_BAD_USPC
+    uspc_class[is_bad] = rng.choice(BAD_USPC_CLASSES, size=is_bad.sum())
+    return uspc_class
+
+
+def format_dates(days:np.ndarray) -> np.ndarray:
+    return np.datetime_as_string(
+        days.astype('datetime64[D]'), unit='D').astype(object)
+
+
+def corrupt_dates(
+        dates:np.ndarray, rng:np.random.RandomState) -> np.ndarray:
+    """Replace a few dates with the kind of mistakes found on PatentsView
+      (a "00" day or a wrong century)
+    """
+    dates = dates.copy()
+    is_bad = np.flatnonzero(rng.rand(len(dates))<SHARE_BAD_DATES)
+    zero_day = rng.rand(len(is_bad))<.5
+    dates[is_bad[zero_day]] = [
+        date[:-2]+'00' for date in dates[is_bad[zero_day]]]
+    dates[is_bad[~zero_day]] = [
+        '0'+date[1:] for date in dates[is_bad[~zero_day]]]
+    return dates
+
+
+def make_cbsa(rng:np.random.RandomState) -> gpd.GeoDataFrame:
+    """A grid of rectangular CBSAs (metropolitan, M1, or micropolitan, M2)
+      over the contiguous US
+    """
+    n_lon, n_lat = CBSA_GRID
+    lon_min, lat_min, lon_max, lat_max = US_BOUNDS
+    width = (lon_max-lon_min)/n_lon
+    height = (lat_max-lat_min)/n_lat
+    records = []
+    for i in range(n_lon):
+        for j in range(n_lat):
+            k = i*n_lat + j
+            x0 = lon_min + (i+rng.uniform(.05,.3))*width
+            y0 = lat_min + (j+rng.uniform(.05,.3))*height
+            cbsa_id = f'{10000+k*20}'
+            records.append({
+                'CSAFP':f'{100+k//3}' if k%4 else None,
+                'CBSAFP':cbsa_id,
+                'AFFGEOID':f'310M500US{cbsa_id}',
+                'GEOID':cbsa_id,
+                'NAME':f'Synthetic City {k}, ST',
+                'LSAD':'M2' if k%3==2 else 'M1',
+                'ALAND':int(rng.randint(1e8, 1e10)),
+                'AWATER':int(rng.randint(1e6, 1e9)),
+                'geometry':box(
+                    x0, y0,
+                    x0+rng.uniform(.3,.6)*width,
+                    y0+rng.uniform(.3,.6)*height)})
+    return gpd.GeoDataFrame(records, crs='EPSG:4269')
+
+
+def write_shapefile(df:gpd.GeoDataFrame, path:str):
+    """Write a zipped shapefile, as distributed by the Census Bureau"""
+    name = os.path.basename(path).replace('.zip','')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        df.to_file(os.path.join(tmp_dir, f'{name}.shp'))
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as f_zip:
+            for file in sorted(os.listdir(tmp_dir)):
+                f_zip.write(os.path.join(tmp_dir, file), file)
+
+
+def make_location(
+        n_locations:int, df_cbsa:gpd.GeoDataFrame,
+        rng:np.random.RandomState) -> pd.DataFrame:
+    """Locations, most of which are within a CBSA (the largest CBSAs
+      have more locations) and the others anywhere in the US
+    """
+    in_cbsa = rng.rand(n_locations)<SHARE_LOCATED_IN_CBSA
+    lon_min, lat_min, lon_max, lat_max = US_BOUNDS
+    longitude = rng.uniform(lon_min, lon_max, n_locations)
+    latitude = rng.uniform(lat_min, lat_max, n_locations)
+    bounds = df_cbsa.bounds.values
+    cbsa = rng.choice(
+        len(df_cbsa), size=in_cbsa.sum(),
+        p=zipf_weights(len(df_cbsa), 1, rng))
+    longitude[in_cbsa] = rng.uniform(bounds[cbsa,0], bounds[cbsa,2])
+    latitude[in_cbsa] = rng.uniform(bounds[cbsa,1], bounds[cbsa,3])
+    return pd.DataFrame({
+        'id':format_ids('loc-', np.arange(n_locations)),
+        'city':'Synthetic City',
+        'state':'ST',
+        'country':'US',
+        'latitude':latitude.round(4),
+        'longitude':longitude.round(4),
+        'county':'Synthetic County',
+        'state_fips':'00',
+        'county_fips':'000'})
+
+
+def format_ids(prefix:str, ids:np.ndarray) -> np.ndarray:
+    return (prefix + pd.Series(ids).astype(str)).values
+
+
+def format_patent_ids(
+        index:np.ndarray, kind:np.ndarray) -> np.ndarray:
+    """Patent ids (as strings) of the patents with the given index
+      and kind (0 = utility, 1 = design, 2 = reissue)
+    """
+    patent_id = pd.Series(index+FIRST_PATENT_ID).astype(str).values
+    patent_id[kind==1] = 'D0' + pd.Series(index[kind==1]+400000) \
+        .astype(str).values
+    patent_id[kind==2] = 'RE0' + pd.Series(index[kind==2]+30000) \
+        .astype(str).values
+    return patent_id
+
+
+def repeat_patents(
+        patent_id:np.ndarray, average:float,
+        rng:np.random.RandomState) -> tuple:
+    """Repeat each patent at least once, as many times as its (random)
+      number of records (e.g., inventors), with the given average
+    """
+    n_records = 1 + rng.poisson(average-1, len(patent_id))
+    return np.repeat(patent_id, n_records), n_records
+
+
+def sequence(n_records:np.ndarray) -> np.ndarray:
+    """Position of each record among the records of its patent"""
+    first = np.cumsum(n_records) - n_records
+    return np.arange(n_records.sum()) - np.repeat(first, n_records)
+
+
+def add_size_options(parser):
+    parser.add_argument(
+        '-n', '--size', 
+        help='number of records to generate', 
+        required=False, 
+        type=int)
+
+
+def main():
+    args = parse_io(
+        add_size_options,
+        add_chunk_options,
+        add_seed_options,
+        add_table_options)
+    set_options(compression_level=args.compression_level)
+
+    n_patents = args.size or 10000
+    chunksize = args.chunksize or 1000000
+    rng = np.random.RandomState(args.seed or 0)
+
+    dir_uspto = os.path.join(args.output, 'raw', 'patentsview')
+    dir_patex = os.path.join(args.output, 'raw', 'patex')
+    dir_shp = os.path.join(args.output, 'raw', 'cartography')
+    for dir in [dir_uspto, dir_patex, dir_shp]:
+        if not os.path.exists(dir):
+            os.makedirs(dir)
+
+    df_cbsa = make_cbsa(rng)
+    write_shapefile(df_cbsa, os.path.join(dir_shp, 'cb_2019_us_cbsa_20m.zip'))
+
+    n_locations = max(n_patents//25, 100)
+    df_location = make_location(n_locations, df_cbsa, rng)
+    # The raw tables come with no types, as those of PatentsView
+    with TableWriter(
+            os.path.join(dir_uspto, 'location.tsv.zip'),
+            save_types=False) as writer:
+        writer.write(df_location)
+    del df_location, df_cbsa
+
+    # Inventors tend to patent from the same (popular) location
+    n_inventors = max(int(n_patents*.8), 100)
+    inventor_location = rng.choice(
+            n_locations, size=n_inventors,
+            p=zipf_weights(n_locations, 1.1, rng)) \
+        .astype(np.int32)
+
+    uspc_weights = zipf_weights(len(USPC_CLASSES), 1.1, rng)
+    cpc_groups = np.array([
+            f'{section}{klass:02d}{letter}' \
+                for section in 'ABCDEFGHY' \
+                for klass in range(1, 100, 3) \
+                for letter in 'BCDFGHJKLMN'],
+        dtype=object)
+    cpc_weights = zipf_weights(len(cpc_groups), 1.1, rng)
+
+    writers = {
+        file:TableWriter(os.path.join(dir_uspto, file), save_types=False) \
+            for file in [
+                'patent.tsv.zip',
+                'application.tsv.zip',
+                'patent_inventor.tsv.zip',
+                'cpc_current.tsv.zip',
+                'uspatentcitation.tsv.zip']}
+    writers['application_data.csv.zip'] = TableWriter(
+        os.path.join(dir_patex, 'application_data.csv.zip'), save_types=False)
+
+    n_cpc, n_citations = 0, 0
+    for start in range(0, n_patents, chunksize):
+        index = np.arange(start, min(start+chunksize, n_patents))
+        n = len(index)
+
+        kind = np.zeros(n, dtype=np.int8)
+        kind[rng.rand(n)<SHARE_DESIGN] = 1
+        kind[rng.rand(n)<SHARE_REISSUE] = 2
+        patent_id = format_patent_ids(index, kind)
+
+        grant_days = FIRST_GRANT_DATE + 7*(index*GRANT_WEEKS//n_patents)
+        appln_days = grant_days - \
+            (180 + rng.gamma(4, 220, n)).astype('timedelta64[D]')
+        grant_date = corrupt_dates(format_dates(grant_days), rng)
+        appln_date = corrupt_dates(format_dates(appln_days), rng)
+        num_claims = 1 + rng.negative_binomial(3, 3/(3+AVG_CLAIMS-1), n)
+
+        writers['patent.tsv.zip'].write(pd.DataFrame({
+            'id':patent_id,
+            'type':np.array(['utility','design','reissue'])[kind],
+            'number':patent_id,
+            'country':'US',
+            'date':grant_date,
+            'kind':np.array(['B1','S1','E'])[kind],
+            'num_claims':num_claims,
+            'withdrawn':0}))
+
+        application_id = pd.Series(index+8000000) \
+            .astype(str).values.astype(object)
+        writers['application.tsv.zip'].write(pd.DataFrame({
+            'id':application_id,
+            'patent_id':patent_id,
+            'series_code':'08',
+            'number':application_id,
+            'country':'US',
+            'date':appln_date,
+            'num_claims':num_claims}))
+
+        # PatEx includes also the applications that were not granted
+        uspc_class = draw_uspc_classes(n, uspc_weights, rng)
+        uspc_class[rng.rand(n)<SHARE_NO_USPC] = None
+        n_ungranted = int(n*SHARE_UNGRANTED)
+        ungranted = rng.choice(n, size=n_ungranted)
+        writers['application_data.csv.zip'].write(pd.DataFrame({
+            'application_number':np.concatenate([
+                application_id,
+                pd.Series(index[ungranted]+20000000) \
+                    .astype(str).values.astype(object)]),
+            'filing_date':np.concatenate([
+                format_dates(appln_days),
+                format_dates(appln_days[ungranted])]),
+            'uspc_class':np.concatenate([
+                uspc_class,
+                draw_uspc_classes(n_ungranted, uspc_weights, rng)]),
+            'uspc_subclass':np.concatenate([
+                pd.Series(rng.randint(1, 999, n)).astype(str).values,
+                pd.Series(rng.randint(1, 999, n_ungranted)) \
+                    .astype(str).values]),
+            'patent_number':np.concatenate([
+                patent_id, np.full(n_ungranted, None, dtype=object)]),
+            'patent_issue_date':np.concatenate([
+                format_dates(grant_days),
+                np.full(n_ungranted, None, dtype=object)])}))
+
+        inventor_patent_id, n_records = repeat_patents(
+            patent_id, AVG_INVENTORS, rng)
+        inventor = rng.randint(0, n_inventors, len(inventor_patent_id))
+        location = inventor_location[inventor]
+        moved = rng.rand(len(location))<.1
+        location[moved] = rng.randint(0, n_locations, moved.sum())
+        writers['patent_inventor.tsv.zip'].write(pd.DataFrame({
+            'patent_id':inventor_patent_id,
+            'inventor_id':format_ids('fl:s_ln:synthetic-', inventor),
+            'location_id':format_ids('loc-', location)}))
+
+        is_utility = kind==0
+        cpc_patent_id, n_records = repeat_patents(
+            patent_id[is_utility], AVG_CPC, rng)
+        group_id = rng.choice(
+            cpc_groups, size=len(cpc_patent_id), p=cpc_weights)
+        main_group = 1 + rng.zipf(1.5, len(group_id)) % 99
+        subgroup = rng.randint(0, 100, len(group_id))
+        writers['cpc_current.tsv.zip'].write(pd.DataFrame({
+            'uuid':format_ids('cpc-', np.arange(len(group_id))+n_cpc),
+            'patent_id':cpc_patent_id,
+            'section_id':pd.Series(group_id).str[0],
+            'subsection_id':pd.Series(group_id).str[:3],
+            'group_id':group_id,
+            'subgroup_id':pd.Series(group_id) + \
+                pd.Series(main_group).astype(str) + '/' + \
+                pd.Series(subgroup).astype(str).str.zfill(2),
+            'category':np.where(
+                rng.rand(len(group_id))<.7, 'inventional', 'additional'),
+            'sequence':sequence(n_records)}))
+        n_cpc += len(group_id)
+
+        # Most citations go to recent patents, but some go to patents
+        #  granted before the first one (i.e., before 1976)
+        citing_index = np.repeat(
+            index, rng.negative_binomial(1, 1/AVG_CITATIONS, n))
+        cited_index = citing_index - 1 - rng.exponential(
+                n_patents*.1, len(citing_index)).astype(np.int64)
+        cited_kind = np.zeros(len(cited_index), dtype=np.int8)
+        cited_kind[rng.rand(len(cited_index))<SHARE_DESIGN] = 1
+        cited_id = format_patent_ids(cited_index, cited_kind)
+        writers['uspatentcitation.tsv.zip'].write(pd.DataFrame({
+            'uuid':format_ids('cit-', np.arange(len(cited_id))+n_citations),
+            'patent_id':format_patent_ids(
+                citing_index, kind[citing_index-start]),
+            'citation_id':cited_id,
+            'date':format_dates(
+                FIRST_GRANT_DATE + 7*(cited_index*GRANT_WEEKS//n_patents)),
+            'name':'NA',
+            'kind':'A',
+            'country':'US',
+            'category':np.where(
+                rng.rand(len(cited_id))<.4,
+                'cited by examiner', 'cited by applicant'),
+            'sequence':0}))
+        n_citations += len(cited_id)
+
+    for writer in writers.values():
+        writer.close()
+
+
+if __name__ == '__main__':
+    main()
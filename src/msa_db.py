@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+"""
+Modules to write the processed tables of the MSA-patent database into a
+  single SQLite file, and to query it
+Each table is stored with its primary key and with indexes on the columns
+  that are commonly looked up (e.g., cbsa_id, patent_id, forward_citation_id
+  and cpc_class), so that the rows of a few patents or of a CBSA are read
+  in milliseconds, without loading the whole table (see make-sqlite-database.py
+  and query-database.py)
+The dates are stored as text (YYYY-MM-DD), as in the zipped TSV files
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import sqlite3
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+
+# Rows inserted at once
+INSERT_CHUNKSIZE = 100000
+
+# Values looked up at once (SQLite limits the parameters of a query)
+LOOKUP_CHUNKSIZE = 900
+
+# primary_key  <- columns of the primary key (none, if the rows of the table
+#                 may be repeated)
+# indexes      <- further columns indexed
+Schema = namedtuple('Schema', ['primary_key', 'indexes'])
+
+SCHEMAS = {
+    'msa_patent':Schema(['patent_id', 'cbsa_id'], ['cbsa_id']),
+    'msa_patent_inventor':Schema(['patent_id', 'inventor_id'], ['inventor_id']),
+    'msa_label':Schema(['cbsa_id'], ['csa_id']),
+    'msa_patent_dates':Schema(['patent_id'], []),
+    'msa_patent_uspc':Schema(['patent_id'], ['uspc_class']),
+    'msa_patent_quality':Schema(['patent_id'], []),
+    'msa_patent_cpc':Schema(['patent_id', 'cpc_class'], ['cpc_class']),
+    # A citation repeated in the raw data is repeated in msa_citation too
+    'msa_citation':Schema([], ['patent_id', 'forward_citation_id'])}
+
+# Lookups provided by query-database.py <- table and column looked up
+LOOKUPS = {
+    'cbsa_patents':('msa_patent', 'cbsa_id'),
+    'patent_cbsas':('msa_patent', 'patent_id'),
+    'patent_inventors':('msa_patent_inventor', 'patent_id'),
+    'inventor_patents':('msa_patent_inventor', 'inventor_id'),
+    'cbsa_label':('msa_label', 'cbsa_id'),
+    'patent_dates':('msa_patent_dates', 'patent_id'),
+    'patent_uspc':('msa_patent_uspc', 'patent_id'),
+    'patent_quality':('msa_patent_quality', 'patent_id'),
+    'patent_cpc':('msa_patent_cpc', 'patent_id'),
+    'cpc_class_patents':('msa_patent_cpc', 'cpc_class'),
+    'forward_citations':('msa_citation', 'patent_id'),
+    'backward_citations':('msa_citation', 'forward_citation_id')}
+
+
+def sql_type(values:pd.Series) -> str:
+    if pd.api.types.is_integer_dtype(values):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(values):
+        return 'REAL'
+    return 'TEXT'
+
+
+def sql_values(df:pd.DataFrame) -> pd.DataFrame:
+    """Columns of a table converted into the types stored by SQLite"""
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_categorical_dtype(df[col]):
+            df[col] = df[col].astype(object)
+        elif pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime('%Y-%m-%d')
+        elif pd.api.types.is_unsigned_integer_dtype(df[col]):
+            # SQLite integers are signed 64-bit integers
+            df[col] = df[col].astype(np.int64)
+    return df
+
+
+def sort_rows(df:pd.DataFrame, name:str) -> pd.DataFrame:
+    """Rows of a table sorted by its primary key or, if its rows may be
+      repeated, by its indexes (the order of the tables released)
+    """
+    schema = SCHEMAS[name]
+    return df \
+        .sort_values(by=schema.primary_key or schema.indexes) \
+        .reset_index(drop=True)
+
+
+def write_sqlite_table(
+        df:pd.DataFrame, name:str, con:sqlite3.Connection):
+    """Write a table (replacing it, if any), with its primary key and indexes
+    The rows are inserted sorted by the primary key
+    """
+    schema = SCHEMAS.get(name, Schema([], []))
+    columns = ', '.join(
+        f'"{col}" {sql_type(df[col])}' for col in df.columns)
+    if schema.primary_key:
+        primary_key = ', '.join(f'"{col}"' for col in schema.primary_key)
+        columns += f', PRIMARY KEY ({primary_key})'
+        df = df.sort_values(by=schema.primary_key)
+    con.execute(f'DROP TABLE IF EXISTS "{name}"')
+    con.execute(f'CREATE TABLE "{name}" ({columns})')
+    placeholders = ', '.join('?'*len(df.columns))
+    for start in range(0, len(df), INSERT_CHUNKSIZE):
+        df_chunk = sql_values(df.iloc[start:start+INSERT_CHUNKSIZE])
+        con.executemany(
+            f'INSERT INTO "{name}" VALUES ({placeholders})',
+            df_chunk.itertuples(index=False, name=None))
+    for col in schema.indexes:
+        con.execute(
+            f'CREATE INDEX "{name}_{col}" ON "{name}" ("{col}")')
+    con.commit()
+
+
+def connect(path:str) -> sqlite3.Connection:
+    """Connection to the database (read only)"""
+    return sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+
+
+def query(con:sqlite3.Connection, sql:str, params:list=None) -> pd.DataFrame:
+    return pd.read_sql_query(sql, con, params=params)
+
+
+def lookup(
+        con:sqlite3.Connection, table:str, column:str,
+        values:list) -> pd.DataFrame:
+    """Rows of a table whose column has any of the values provided
+      (e.g., lookup(con, 'msa_patent', 'cbsa_id', ['31080']))
+    """
+    values = list(values)
+    return pd.concat([
+            query(
+                con,
+                f'SELECT * FROM "{table}" WHERE "{column}" IN '
+                f'({", ".join("?"*len(chunk))})',
+                chunk) \
+                for chunk in [
+                    values[start:start+LOOKUP_CHUNKSIZE] \
+                        for start in range(
+                            0, max(len(values), 1), LOOKUP_CHUNKSIZE)]],
+        ignore_index=True)
+
+
+def run_lookup(con:sqlite3.Connection, name:str, values:list) -> pd.DataFrame:
+    """Run one of the LOOKUPS (e.g., run_lookup(con, 'cbsa_patents', ...))"""
+    if name not in LOOKUPS:
+        raise ValueError(f'Unknown lookup: {name}')
+    table, column = LOOKUPS[name]
+    return lookup(con, table, column, values)
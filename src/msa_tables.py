@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+
+"""
+Modules to make the tables of the MSA-patent database from the interim tables
+Several tables are made from the same interim table (e.g., msa_patent,
+  msa_patent_inventor and msa_label from the interim msa_patent table).
+  Each table is described by the interim tables it is made from (sources),
+  with the columns it needs, and by the other tables it is made from, so that
+  every source can be read only once, with the columns needed by all the
+  tables requested, and the tables can be made from the DataFrames in memory
+  (see make-msa-tables.py)
+The tables produced are
+* msa_patent          <- patent_id, cbsa_id, cbsa_share
+                         (fraction of inventors of the patent resident
+                         in the CBSA)
+* msa_patent_inventor <- patent_id, inventor_id, inventor_share
+                         (1/(# inventors of the patent))
+* msa_label           <- cbsa_id, csa_id, cbsa_label (CBSA name)
+* msa_patent_dates    <- patent_id, grant_date, appln_date
+* msa_patent_uspc     <- patent_id, uspc_class
+* msa_patent_quality  <- patent_id, num_claims, num_citations_5y,
+                         num_citations_10y, and the averages of these metrics
+                         of the patents granted (gy) or applied (ay)
+                         in the same year of the focal patent and belonging
+                         to its same USPC class (or, if it has none,
+                         of all the patents of the same year)
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from dates import to_datetime
+from group_stats import group_means
+from patent_index import isin_patent_index
+
+
+# Types of the columns of the interim tables
+#  (the msa_patent_index is a patent index, not a table)
+SOURCE_TYPES = {
+    'msa_patent':None,
+    'patent_info':{
+        'patent_id':np.uint32,
+        'grant_date':str,
+        'appln_date':str,
+        'uspc_class':'category',
+        'num_claims':float,
+        'num_citations_5y':float,
+        'num_citations_10y':float}}
+
+# make     <- function that makes the table, given the DataFrames of its
+#             sources and of its tables (in this order)
+# sources  <- interim tables the table is made from, with the columns needed
+#             (None for the msa_patent_index)
+# tables   <- other tables the table is made from
+Table = namedtuple('Table', ['make', 'sources', 'tables'])
+
+
+def select_columns(df:pd.DataFrame, columns:list) -> pd.DataFrame:
+    """Columns of a DataFrame, kept in their order
+      (as read_table does, when a table is read with the columns provided)
+    """
+    return df[[col for col in df.columns if col in columns]]
+
+
+def make_msa_patent(df_patent:pd.DataFrame) -> pd.DataFrame:
+    return select_columns(df_patent, [
+            'patent_id',
+            'inventor_id',
+            'inventor_share',
+            'cbsa_id']) \
+        .drop_duplicates() \
+        .drop(columns='inventor_id') \
+        .groupby(['patent_id','cbsa_id'], as_index=False) \
+        .agg({
+            'inventor_share':'sum'}) \
+        .rename(columns={'inventor_share':'cbsa_share'})
+
+
+def make_msa_patent_inventor(df_patent:pd.DataFrame) -> pd.DataFrame:
+    return select_columns(df_patent, [
+            'patent_id',
+            'inventor_id',
+            'inventor_share']) \
+        .drop_duplicates()
+
+
+def make_msa_label(df_patent:pd.DataFrame) -> pd.DataFrame:
+    return select_columns(df_patent, [
+            'cbsa_id',
+            'csa_id',
+            'cbsa_label']) \
+        .drop_duplicates()
+
+
+def make_msa_patent_dates(
+        patent_index:np.ndarray, df_patent:pd.DataFrame) -> pd.DataFrame:
+    df_msa_patent = select_columns(df_patent, [
+            'patent_id',
+            'grant_date',
+            'appln_date']) \
+        .drop_duplicates()
+    return df_msa_patent[
+        isin_patent_index(patent_index, df_msa_patent.patent_id)]
+
+
+def make_msa_patent_uspc(
+        patent_index:np.ndarray, df_patent:pd.DataFrame) -> pd.DataFrame:
+    df_msa_patent = select_columns(df_patent, [
+            'patent_id',
+            'uspc_class']) \
+        .drop_duplicates()
+    return df_msa_patent[
+        isin_patent_index(patent_index, df_msa_patent.patent_id)]
+
+
+def make_msa_patent_quality(
+        df_patent:pd.DataFrame, df_msa_patent_dates:pd.DataFrame,
+        df_msa_patent_uspc:pd.DataFrame) -> pd.DataFrame:
+    df_msa_patent_dates = df_msa_patent_dates.assign(
+        grant_date=to_datetime(df_msa_patent_dates.grant_date),
+        appln_date=to_datetime(df_msa_patent_dates.appln_date))
+
+    df_msa_patent= pd.merge(
+        df_msa_patent_dates, df_msa_patent_uspc,
+        how='outer')
+    del df_msa_patent_dates, df_msa_patent_uspc
+
+    df_msa_patent['grant_year'] = df_msa_patent.grant_date.dt.year
+    df_msa_patent['appln_year'] = df_msa_patent.appln_date.dt.year
+
+    df_patent = select_columns(df_patent, [
+            'patent_id',
+            'grant_date',
+            'appln_date',
+            'uspc_class',
+            'num_claims',
+            'num_citations_5y',
+            'num_citations_10y']) \
+        .drop_duplicates()
+
+    df_patent = df_patent.assign(
+        grant_date=to_datetime(df_patent.grant_date),
+        appln_date=to_datetime(df_patent.appln_date))
+
+    df_patent = df_patent[
+        (~df_patent.grant_date.isna()) &
+        (~df_patent.appln_date.isna())]
+
+    df_patent = df_patent.assign(
+        grant_year=df_patent.grant_date.dt.year,
+        appln_year=df_patent.appln_date.dt.year)
+
+    # The number of claims and the (censored) number of citations
+    #  of each patent are already in patent_info and are looked up by
+    #  patent id
+    metrics = [
+        'num_claims',
+        'num_citations_5y',
+        'num_citations_10y']
+    df_patent_metrics = df_patent[['patent_id']+metrics] \
+        .drop_duplicates(subset='patent_id')
+    position = pd.Index(df_patent_metrics.patent_id) \
+        .get_indexer(df_msa_patent.patent_id)
+    is_found = position>=0
+    for col in metrics:
+        values = np.full(len(df_msa_patent), np.nan)
+        values[is_found] = df_patent_metrics[col].values[position[is_found]]
+        df_msa_patent[col] = values
+    del df_patent_metrics, position, is_found
+
+    # The patents with no USPC class receive the average of the patents
+    #  granted (or applied) in their same year
+    for year, suffix in [('grant_year','gy'), ('appln_year','ay')]:
+        df_avg = group_means(
+            df_patent, df_msa_patent,
+            levels=[
+                [year, 'uspc_class'],
+                [year]],
+            metrics=metrics)
+        df_msa_patent[f'avg_num_claims_{suffix}'] = df_avg.num_claims
+        for years in [5,10]:
+            df_msa_patent[f'avg_num_citations_{years}y_{suffix}'] = \
+                df_avg[f'num_citations_{years}y']
+    del df_avg
+
+    return df_msa_patent[[
+            'patent_id',
+            'num_claims',
+            'num_citations_5y',
+            'num_citations_10y',
+            'avg_num_claims_gy',
+            'avg_num_claims_ay',
+            'avg_num_citations_5y_gy',
+            'avg_num_citations_10y_gy',
+            'avg_num_citations_5y_ay',
+            'avg_num_citations_10y_ay']] \
+        .drop_duplicates()
+
+
+TABLES = {
+    'msa_patent':Table(
+        make_msa_patent,
+        {'msa_patent':[
+            'patent_id', 'inventor_id', 'inventor_share', 'cbsa_id']},
+        []),
+    'msa_patent_inventor':Table(
+        make_msa_patent_inventor,
+        {'msa_patent':['patent_id', 'inventor_id', 'inventor_share']},
+        []),
+    'msa_label':Table(
+        make_msa_label,
+        {'msa_patent':['cbsa_id', 'csa_id', 'cbsa_label']},
+        []),
+    'msa_patent_dates':Table(
+        make_msa_patent_dates,
+        {'msa_patent_index':None,
+            'patent_info':['patent_id', 'grant_date', 'appln_date']},
+        []),
+    'msa_patent_uspc':Table(
+        make_msa_patent_uspc,
+        {'msa_patent_index':None,
+            'patent_info':['patent_id', 'uspc_class']},
+        []),
+    'msa_patent_quality':Table(
+        make_msa_patent_quality,
+        {'patent_info':[
+            'patent_id', 'grant_date', 'appln_date', 'uspc_class',
+            'num_claims', 'num_citations_5y', 'num_citations_10y']},
+        ['msa_patent_dates', 'msa_patent_uspc'])}
+
+
+def needed_tables(names:list) -> list:
+    """Tables needed to make the tables provided (including these),
+      each listed after the tables it is made from
+    """
+    needed = []
+    def visit(name):
+        if name in needed:
+            return
+        for table in TABLES[name].tables:
+            visit(table)
+        needed.append(name)
+    for name in names:
+        visit(name)
+    return needed
+
+
+def needed_columns(names:list) -> dict:
+    """Columns of each source needed to make the tables provided
+      (None for the sources that are not tables)
+    """
+    columns = {}
+    for name in needed_tables(names):
+        for source, source_columns in TABLES[name].sources.items():
+            if source_columns is None:
+                columns[source] = None
+            else:
+                columns[source] = \
+                    columns.get(source, []) + \
+                    [col for col in source_columns \
+                        if col not in columns.get(source, [])]
+    return columns
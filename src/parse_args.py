@@ -2,6 +2,10 @@
 
 """
 Modules to parse the arguments in the Makefile.
+Every script accepts its inputs and outputs, plus only the groups of options
+  it uses (e.g., parse_io(add_chunk_options, add_table_options)). A script
+  adds its own options in the same way, through a function that receives
+  the parser
 
 Author: Carlo Bottai
 Copyright (c) 2020 - Carlo Bottai
@@ -12,9 +16,107 @@ Date: 2021-02-05
 
 
 import argparse
+import os
 
 
-def parse_io():
+def add_chunk_options(parser:argparse.ArgumentParser):
+    parser.add_argument(
+        '-c', '--chunksize', 
+        help='number of rows read at once (stream the input in chunks)', 
+        required=False, 
+        type=int)
+
+
+def add_jobs_options(parser:argparse.ArgumentParser):
+    parser.add_argument(
+        '-j', '--jobs', 
+        help='number of parallel jobs', 
+        required=False, 
+        type=int)
+
+
+def add_cache_options(parser:argparse.ArgumentParser):
+    parser.add_argument(
+        '--cache', 
+        help='cache file (reused and updated across runs)', 
+        required=False)
+
+
+def add_sql_options(parser:argparse.ArgumentParser):
+    group = parser.add_argument_group('out-of-core joins (see sql_backend.py)')
+    group.add_argument(
+        '--backend', 
+        help='backend of the heavy joins (duckdb works out of core)', 
+        required=False, 
+        choices=['pandas', 'duckdb'], 
+        default='pandas')
+    group.add_argument(
+        '--memory', 
+        help='memory budget (GB)', 
+        required=False, 
+        type=float)
+
+
+def add_delta_options(parser:argparse.ArgumentParser):
+    parser.add_argument(
+        '--delta', 
+        help='index of the patents affected by a new release of the raw data '
+            '(only these are recomputed, if the output already exists)', 
+        required=False)
+
+
+def add_format_options(parser:argparse.ArgumentParser):
+    parser.add_argument(
+        '--format', 
+        help='format of the interim and processed tables', 
+        required=False)
+
+
+def add_seed_options(parser:argparse.ArgumentParser):
+    parser.add_argument(
+        '--seed', 
+        help='seed of the random number generator', 
+        required=False, 
+        type=int)
+
+
+def add_table_options(parser:argparse.ArgumentParser):
+    """Options of the tables written (see table_io.set_options)"""
+    parser.add_argument(
+        '--compression_level', 
+        help='compression level of the compressed text tables written '
+            '(the default of their codec, if not provided)', 
+        required=False, 
+        type=int, 
+        default=os.environ.get('MSA_COMPRESSION_LEVEL'))
+
+
+def add_raw_options(parser:argparse.ArgumentParser):
+    """Options of the raw tables read (see table_io.set_options)"""
+    parser.add_argument(
+        '--raw_cache', 
+        help='directory the zipped raw tables are extracted to, '
+            'to be decompressed only once across the stages', 
+        required=False)
+
+
+def add_instrument_options(parser:argparse.ArgumentParser):
+    """Options of the measures of a stage (see instrument.start_script)"""
+    group = parser.add_argument_group('instrumentation (see instrument.py)')
+    group.add_argument(
+        '--metrics', 
+        help='file the resources used are recorded into (JSON lines)', 
+        required=False, 
+        default=os.environ.get('MSA_METRICS'))
+    group.add_argument(
+        '--profile', 
+        help='save a function-level profile next to the output', 
+        required=False, 
+        action='store_true', 
+        default=bool(os.environ.get('MSA_PROFILE')))
+
+
+def parse_io(*add_options):
     parser = argparse.ArgumentParser('Names Fixer')
     parser.add_argument(
         '-i', '--input', 
@@ -29,4 +131,11 @@ def parse_io():
         '-o', '--output', 
         help='output directory', 
         required=False)
+    parser.add_argument(
+        '-O', '--output_list', 
+        help='list of output files', 
+        required=False, 
+        nargs='+')
+    for add in add_options:
+        add(parser)
     return parser.parse_args()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+
+"""
+Modules to normalize the patent ids of the raw tables.
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import numpy as np
+import pandas as pd
+
+
+# Id assigned to anything that is not a utility patent
+PATENT_ID_SENTINEL = 0
+
+
+def convert_patent_id(patent_id:pd.Series) -> pd.Series:
+    """Convert a whole column of patent ids into unsigned integers
+    Utility patents have purely numeric ids on PatentsView and PatEx, while 
+      the other kinds of patents (design, plant, reissue, ...) have a prefix 
+      (D, PP, RE, ...). The latter, as well as missing or out of range ids, 
+      are mapped to PATENT_ID_SENTINEL
+    """
+    if not pd.api.types.is_numeric_dtype(patent_id):
+        patent_id = pd.to_numeric(patent_id, errors='coerce')
+    values = patent_id.to_numpy(dtype=float, na_value=np.nan)
+    is_valid = (values>0) & (values<=np.iinfo(np.uint32).max)
+    return pd.Series(
+        np.where(is_valid, values, PATENT_ID_SENTINEL).astype(np.uint32), 
+        index=patent_id.index, 
+        name=patent_id.name)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+"""
+Modules to build and use a membership index of patent ids.
+Utility patent ids are dense unsigned integers (below about 12M), therefore
+  a set of patents can be stored as a bit array indexed by the patent id,
+  where the n-th bit is set if the patent n belongs to the set
+  (about 1.5MB for the whole universe of US patents)
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import numpy as np
+import os
+
+
+def make_patent_index(patent_ids) -> np.ndarray:
+    patent_ids = np.asarray(patent_ids, dtype=np.uint32)
+    size = int(patent_ids.max())+1 if len(patent_ids)>0 else 0
+    bits = np.zeros(size, dtype=bool)
+    bits[patent_ids] = True
+    return np.packbits(bits)
+
+
+def isin_patent_index(index:np.ndarray, patent_ids) -> np.ndarray:
+    """Vectorized membership test of the patent ids provided
+    Ids beyond the size of the index do not belong to it
+    """
+    patent_ids = np.asarray(patent_ids, dtype=np.uint64)
+    byte = patent_ids >> 3
+    in_range = byte < len(index)
+    is_in = np.zeros(len(patent_ids), dtype=bool)
+    bit = (7 - (patent_ids[in_range] & 7)).astype(np.uint8)
+    is_in[in_range] = (index[byte[in_range]] >> bit) & 1
+    return is_in
+
+
+def index_patent_ids(index:np.ndarray) -> np.ndarray:
+    """Patent ids in the index (sorted)"""
+    return np.flatnonzero(np.unpackbits(index)).astype(np.uint32)
+
+
+def save_patent_index(index:np.ndarray, path:str):
+    dir = os.path.dirname(path)
+    if dir and not os.path.exists(dir):
+        os.makedirs(dir)
+    np.save(path, index)
+
+
+def load_patent_index(path:str) -> np.ndarray:
+    return np.load(path, mmap_mode='r')
@@ -0,0 +1,483 @@
+#!/usr/bin/env python
+
+"""
+Run the stages that build the database (the same as in the Makefile)
+  within a pool of Python processes
+Stages that do not depend on each other run in parallel, as long as the sum
+  of the memory they are expected to need fits into the memory budget.
+  Each worker process imports the heavy libraries (pandas, geopandas, ...)
+  only once, and then runs the stages it receives in-process
+A stage is run only if any of its outputs is missing or older than
+  any of its inputs (as in Make). At the end, the critical path of the build
+  (i.e., the chain of dependent stages that determined its wall time)
+  is reported
+
+Usage:
+  python src/pipeline.py -i DATA_DIR -j JOBS --memory GB [-I STAGE ...]
+    [--format FORMAT] [-c CHUNKSIZE] [--backend BACKEND] [--incremental]
+    [--raw_cache DIR] [--raw_columns]
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import os
+import sys
+import time
+import runpy
+import instrument
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from delta import commit_snapshot
+from msa_db import SCHEMAS
+from parse_args import \
+    parse_io, add_chunk_options, add_jobs_options, add_sql_options, \
+    add_format_options, add_raw_options, add_instrument_options
+from instrument import start_script
+from raw_columns import RAW_COLUMNS
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+USPTO_FILES = [
+    'patent.tsv.zip',
+    'application.tsv.zip',
+    'patent_inventor.tsv.zip',
+    'location.tsv.zip',
+    'cpc_current.tsv.zip',
+    'uspatentcitation.tsv.zip']
+
+# Format of the tables released (the tables built in another format
+#  are exported into it)
+RELEASE_FORMAT = 'tsv.zip'
+
+# Tables exported as zipped TSV files for the release of the database
+RELEASE_TABLES = [
+    'msa_patent',
+    'msa_patent_inventor',
+    'msa_patent_quality',
+    'msa_label',
+    'msa_patent_cpc',
+    'msa_citation']
+
+# Memory (GB) given to DuckDB by the stages that run their joins
+#  on the duckdb backend (see sql_backend.py)
+SQL_MEMORY = 4
+
+# name     <- name of the stage
+# script   <- script run by the stage
+# inputs   <- files read by the stage
+# outputs  <- files written by the stage
+# options  <- further command line arguments of the script
+# memory   <- memory (GB) the stage is expected to need on the full database
+Stage = namedtuple(
+    'Stage', ['name', 'script', 'inputs', 'outputs', 'options', 'memory'])
+
+
+def affected_path(data_dir:str) -> str:
+    """Patents affected by the new release of the raw data
+      (see make-delta.py)
+    """
+    return os.path.join(data_dir, 'interim', 'affected_patents.npy')
+
+
+def snapshot_dir(data_dir:str) -> str:
+    """State directory with the snapshot of the raw data (see delta.py)"""
+    return os.path.join(data_dir, 'cache', 'snapshot')
+
+
+def make_stages(
+        data_dir:str='data', format:str='parquet',
+        chunksize:int=5000000, backend:str='pandas',
+        incremental:bool=False, raw_cache:str=None,
+        raw_columns:bool=False) -> list:
+    raw = {
+        file.split('.')[0]:os.path.join(data_dir, 'raw', 'patentsview', file) \
+            for file in USPTO_FILES}
+    raw['application_data'] = os.path.join(
+        data_dir, 'raw', 'patex', 'application_data.csv.zip')
+    raw['cbsa'] = os.path.join(
+        data_dir, 'raw', 'cartography', 'cb_2019_us_cbsa_20m.zip')
+    intm = lambda name: os.path.join(data_dir, 'interim', name)
+    proc = lambda name: os.path.join(data_dir, 'processed', name)
+    cache = lambda name: os.path.join(data_dir, 'cache', name)
+    # The stages with heavy joins need much less memory if run out of core
+    out_of_core = backend=='duckdb'
+    sql_options = ['--backend', backend, '--memory', str(SQL_MEMORY)] \
+        if out_of_core else []
+    # In the incremental mode, the heavy stages recompute only the patents
+    #  affected by the new release of the raw data (see make-delta.py)
+    delta_inputs = [affected_path(data_dir)] if incremental else []
+    delta_options = ['--delta', affected_path(data_dir)] \
+        if incremental else []
+    # The stages that read the zipped raw tables read their extracted copy
+    #  (see raw_cache.py)
+    raw_options = ['--raw_cache', raw_cache] if raw_cache else []
+    # The stages read the raw columns they use from binary arrays, converted
+    #  once from the raw tables (see raw_columns.py), rather than parsing
+    #  the raw tables every time (the delta stage hashes the raw tables)
+    columns = {
+        table:intm(f'{table}.columns') if raw_columns else raw[table] \
+            for table in RAW_COLUMNS}
+    columns_stages = [
+        Stage(
+            f'{table}_columns', 'make-raw-columns.py',
+            [raw[table]],
+            [intm(f'{table}.columns')],
+            ['-c', str(chunksize)] + raw_options,
+            2) \
+                for table in RAW_COLUMNS] if raw_columns else []
+    delta_stages = [
+        Stage(
+            'delta', 'make-delta.py',
+            [raw['patent'], raw['application'], raw['application_data'],
+                raw['patent_inventor'], raw['location'],
+                raw['uspatentcitation'], raw['cbsa']],
+            [affected_path(data_dir)],
+            ['--cache', snapshot_dir(data_dir), '-c', str(chunksize)] + \
+                raw_options,
+            2)] if incremental else []
+
+    stages = delta_stages + columns_stages + [
+        Stage(
+            'patent_database', 'make-patent-database.py',
+            [columns['patent'], columns['patent_inventor'],
+                columns['location'], raw['cbsa']] + delta_inputs,
+            [intm(f'msa_patent.{format}')],
+            ['--cache', cache(f'location_cbsa.{format}')] + sql_options + \
+                delta_options + raw_options,
+            8 if out_of_core else 16),
+        Stage(
+            'citation_graph', 'make-citation-graph.py',
+            [columns['uspatentcitation']],
+            [intm('citation_graph.csr')],
+            ['-c', str(chunksize)] + raw_options,
+            4),
+        Stage(
+            'patent_info', 'make-patent-info-database.py',
+            [columns['patent'], raw['application'],
+                raw['application_data'], intm('citation_graph.csr')] + \
+                delta_inputs,
+            [intm(f'patent_info.{format}')],
+            ['--cache', cache(f'patent_dates.{format}')] + sql_options + \
+                delta_options + raw_options,
+            10 if out_of_core else 24),
+        Stage(
+            'msa_patent_tables', 'make-msa-tables.py',
+            [intm(f'msa_patent.{format}')],
+            [proc(f'msa_patent.{format}'),
+                proc(f'msa_patent_inventor.{format}'),
+                proc(f'msa_label.{format}')],
+            [],
+            3),
+        Stage(
+            'msa_citation', 'make-citation-database.py',
+            [proc(f'msa_patent.{format}'), intm('citation_graph.csr')],
+            [proc(f'msa_citation.{format}')],
+            [],
+            1),
+        Stage(
+            'msa_patent_index', 'make-patent-index.py',
+            [proc(f'msa_patent.{format}'), proc(f'msa_citation.{format}')],
+            [intm('msa_patent_index.npy')],
+            [],
+            1),
+        Stage(
+            'patent_info_tables', 'make-msa-tables.py',
+            [intm('msa_patent_index.npy'), intm(f'patent_info.{format}')],
+            [proc(f'msa_patent_dates.{format}'),
+                proc(f'msa_patent_uspc.{format}'),
+                proc(f'msa_patent_quality.{format}')],
+            [],
+            6),
+        Stage(
+            'msa_patent_cpc', 'make-patent-cpc-database.py',
+            [intm('msa_patent_index.npy'), raw['cpc_current']],
+            [proc(f'msa_patent_cpc.{format}')],
+            ['-c', str(chunksize)] + raw_options,
+            2)]
+
+    # The tables built in the release format need no export
+    if format!=RELEASE_FORMAT:
+        stages += [
+            Stage(
+                f'export_{table}', 'export-table.py',
+                [proc(f'{table}.{format}')],
+                [proc(f'{table}.{RELEASE_FORMAT}')],
+                [],
+                2) \
+                    for table in RELEASE_TABLES]
+    stages += [
+        Stage(
+            'export_sqlite', 'make-sqlite-database.py',
+            [proc(f'{table}.{format}') for table in SCHEMAS],
+            [proc('msa_database.sqlite')],
+            [],
+            4)]
+
+    return stages
+
+
+def stage_command(stage:Stage) -> list:
+    script = os.path.join(SCRIPT_DIR, stage.script)
+    inputs = ['-i'] + stage.inputs if len(stage.inputs)==1 \
+        else ['-I'] + stage.inputs
+    outputs = ['-o'] + stage.outputs if len(stage.outputs)==1 \
+        else ['-O'] + stage.outputs
+    return [script] + inputs + outputs + stage.options
+
+
+def is_up_to_date(stage:Stage) -> bool:
+    if not all([os.path.exists(output) for output in stage.outputs]):
+        return False
+    dependencies = stage.inputs + [os.path.join(SCRIPT_DIR, stage.script)]
+    return min([os.path.getmtime(output) for output in stage.outputs]) >= \
+        max([os.path.getmtime(dep) for dep in dependencies])
+
+
+def run_stage(argv:list) -> float:
+    """Run a script within the current (worker) process
+      as if it were called from the command line
+    """
+    instrument.discard_stage()
+    start = time.perf_counter()
+    sys.argv = argv
+    if SCRIPT_DIR not in sys.path:
+        sys.path.insert(0, SCRIPT_DIR)
+    try:
+        runpy.run_path(argv[0], run_name='__main__')
+    except SystemExit as e:
+        if e.code not in [None, 0]:
+            raise RuntimeError(f'{argv[0]} exited with code {e.code}')
+    finally:
+        # The worker does not exit at the end of the stage
+        instrument.end_stage()
+    return time.perf_counter() - start
+
+
+def check_stages(stages:list):
+    """Raise an error if the stages depend on each other in a cycle
+      (e.g., a stage whose input is also its output), since they could
+      never be run
+    """
+    producer = {
+        output:stage.name for stage in stages for output in stage.outputs}
+    parents = {
+        stage.name:{
+            producer[input] for input in stage.inputs if input in producer} \
+                for stage in stages}
+    # Remove, one after the other, the stages whose parents are all removed
+    while parents:
+        ready = [name for name, names in parents.items() if not names]
+        if not ready:
+            raise ValueError(
+                'Stages in (or depending on) a dependency cycle: '
+                f'{sorted(parents)}')
+        for name in ready:
+            del parents[name]
+        for names in parents.values():
+            names.difference_update(ready)
+
+
+def select_stages(stages:list, targets:list) -> list:
+    """Stages needed to build the targets (including their dependencies)"""
+    check_stages(stages)
+    producer = {
+        output:stage for stage in stages for output in stage.outputs}
+    by_name = {stage.name:stage for stage in stages}
+    unknown = [target for target in targets if target not in by_name]
+    if unknown:
+        raise ValueError(f'Unknown stages: {unknown}')
+    needed, to_visit = {}, [by_name[target] for target in targets]
+    while to_visit:
+        stage = to_visit.pop()
+        if stage.name in needed:
+            continue
+        needed[stage.name] = stage
+        to_visit += [
+            producer[input] for input in stage.inputs if input in producer]
+    return [stage for stage in stages if stage.name in needed]
+
+
+def critical_path(stages:list, durations:dict) -> tuple:
+    """Longest chain of dependent stages, given the duration of each stage"""
+    producer = {
+        output:stage for stage in stages for output in stage.outputs}
+    finish, previous = {}, {}
+    # The stages are listed in a topological order
+    for stage in stages:
+        parents = [
+            producer[input] for input in stage.inputs if input in producer]
+        parent = max(
+            parents, key=lambda parent: finish[parent.name], default=None)
+        start = finish[parent.name] if parent is not None else 0
+        finish[stage.name] = start + durations.get(stage.name, 0)
+        previous[stage.name] = parent.name if parent is not None else None
+    if not finish:
+        return [], 0
+    last = max(finish, key=finish.get)
+    path = [last]
+    while previous[path[-1]] is not None:
+        path.append(previous[path[-1]])
+    return path[::-1], finish[last]
+
+
+def run_pipeline(
+        stages:list, jobs:int, memory:float, log=sys.stderr) -> dict:
+    """Run the stages, in parallel when possible, and return their durations
+    A stage is started only when all the stages that produce its inputs
+      are completed and the memory it needs fits into the memory budget
+      (the stage is started anyway if nothing else is running)
+    An error is raised if some stages can never be started
+      (e.g., the producer of one of their inputs is not among the stages)
+    """
+    producer = {
+        output:stage.name for stage in stages for output in stage.outputs}
+    # Give priority to the stages with the longest chain of dependents
+    dependents = {stage.name:0 for stage in stages}
+    for stage in reversed(stages):
+        for input in stage.inputs:
+            if input in producer:
+                dependents[producer[input]] = max(
+                    dependents[producer[input]], dependents[stage.name]+1)
+
+    pending = sorted(stages, key=lambda stage: -dependents[stage.name])
+    completed, running, durations = set(), {}, {}
+    memory_used = 0
+    start = time.perf_counter()
+    elapsed = lambda: f'[{time.perf_counter()-start:8.1f}s]'
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            is_progressing = False
+            for stage in list(pending):
+                if any([
+                        producer[input] not in completed \
+                            for input in stage.inputs if input in producer]):
+                    continue
+                if is_up_to_date(stage):
+                    pending.remove(stage)
+                    completed.add(stage.name)
+                    durations[stage.name] = 0
+                    is_progressing = True
+                    print(f'{elapsed()} {stage.name} is up to date',
+                        file=log, flush=True)
+                    continue
+                missing = [
+                    input for input in stage.inputs \
+                        if input not in producer and not os.path.exists(input)]
+                if missing:
+                    raise FileNotFoundError(
+                        f'Missing inputs of {stage.name}: {missing}')
+                if len(running)>=jobs or \
+                        (running and memory_used+stage.memory>memory):
+                    continue
+                pending.remove(stage)
+                memory_used += stage.memory
+                future = executor.submit(run_stage, stage_command(stage))
+                running[future] = stage
+                print(f'{elapsed()} {stage.name} started',
+                    file=log, flush=True)
+            if not running:
+                if not is_progressing:
+                    raise RuntimeError(
+                        'These stages cannot be started: '
+                        f'{[stage.name for stage in pending]}')
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                memory_used -= stage.memory
+                if future.exception() is not None:
+                    print(f'{elapsed()} {stage.name} failed',
+                        file=log, flush=True)
+                    # Wait for the running stages, but do not start new ones
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    raise future.exception()
+                durations[stage.name] = future.result()
+                completed.add(stage.name)
+                print(
+                    f'{elapsed()} {stage.name} completed',
+                    f'in {durations[stage.name]:.1f}s',
+                    file=log, flush=True)
+    return durations
+
+
+def add_build_options(parser):
+    add_format_options(parser)
+    parser.add_argument(
+        '--incremental', 
+        help='build the database incrementally (see make-delta.py)', 
+        required=False, 
+        action='store_true')
+    parser.add_argument(
+        '--raw_columns', 
+        help='convert the raw columns used into binary arrays once, '
+            'and read these instead of the raw tables (see raw_columns.py)', 
+        required=False, 
+        action='store_true')
+
+
+def main():
+    args = parse_io(
+        add_build_options,
+        add_chunk_options,
+        add_jobs_options,
+        add_sql_options,
+        add_raw_options,
+        add_instrument_options)
+    start_script(metrics=args.metrics, profile=args.profile)
+
+    data_dir = args.input or 'data'
+    all_stages = make_stages(
+        data_dir=data_dir,
+        format=args.format or 'parquet',
+        chunksize=args.chunksize or 5000000,
+        backend=args.backend,
+        incremental=args.incremental,
+        raw_cache=args.raw_cache,
+        raw_columns=args.raw_columns)
+    # The SQLite database depends on all the processed tables, so they
+    #  are built even if they need no export
+    targets = args.input_list or [
+        stage.name for stage in all_stages \
+            if stage.name.startswith('export_')]
+    stages = select_stages(all_stages, targets)
+
+    # The stages inherit the instrumentation options
+    if args.metrics is not None:
+        os.environ['MSA_METRICS'] = args.metrics
+    if args.profile:
+        os.environ['MSA_PROFILE'] = '1'
+
+    jobs = args.jobs or os.cpu_count()
+    memory = args.memory or \
+        os.sysconf('SC_PAGE_SIZE')*os.sysconf('SC_PHYS_PAGES')/1024**3
+
+    start = time.perf_counter()
+    durations = run_pipeline(stages, jobs, memory)
+    wall_time = time.perf_counter() - start
+
+    # The snapshot of the new raw data replaces that of the previous build
+    #  only once all the stages that recompute the affected patents
+    #  succeeded, otherwise their changes would be lost (see delta.py)
+    if args.incremental and all([
+            stage.name in durations for stage in all_stages \
+                if affected_path(data_dir) in stage.inputs]):
+        commit_snapshot(snapshot_dir(data_dir))
+
+    path, path_time = critical_path(stages, durations)
+    print(
+        f'\nWall time: {wall_time:.1f}s',
+        f'(serial time: {sum(durations.values()):.1f}s)',
+        file=sys.stderr)
+    print(f'Critical path ({path_time:.1f}s):', file=sys.stderr)
+    for name in path:
+        print(f'  {name:<30} {durations[name]:8.1f}s', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+"""
+List the forward citations of some patents (e.g., who cites an MSA patent)
+  looking them up in the citation graph (see citation_graph.py)
+The citations are printed as a TSV table (patent_id is the cited patent and
+  forward_citation_id the citing one), or written to the output, if provided
+
+Usage:
+  python src/query-citations.py -i citation_graph.csr --patent_ids ID ...
+    [-o OUTPUT]
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import sys
+import pandas as pd
+from citation_graph import load_citation_graph, citation_edges
+from parse_args import parse_io, add_table_options, add_instrument_options
+from instrument import start_script
+from table_io import write_table, set_options
+
+
+def add_query_options(parser):
+    parser.add_argument(
+        '--patent_ids', 
+        help='ids of the patents queried', 
+        required=False, 
+        type=int, 
+        nargs='+')
+
+
+def main():
+    args = parse_io(
+        add_query_options,
+        add_table_options,
+        add_instrument_options)
+    start_script(args.output, args.metrics, args.profile)
+    set_options(compression_level=args.compression_level)
+
+    cited, citing = citation_edges(
+        load_citation_graph(args.input), # citation_graph.csr
+        args.patent_ids or [])
+    df_patent_citation = pd.DataFrame({
+        'patent_id':cited,
+        'forward_citation_id':citing})
+
+    if args.output is not None:
+        write_table(df_patent_citation, args.output)
+    else:
+        df_patent_citation.to_csv(sys.stdout, sep='\t', index=False)
+
+
+if __name__ == '__main__':
+    main()
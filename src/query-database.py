@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+"""
+Look up the rows of the SQLite database (see msa_db.py) with any of the keys
+  provided, e.g. the patents of a CBSA or the citations of some patents
+* cbsa_patents        <- rows of msa_patent with the cbsa_id provided
+* patent_cbsas        <- rows of msa_patent with the patent_id provided
+* patent_inventors    <- rows of msa_patent_inventor with the patent_id
+* inventor_patents    <- rows of msa_patent_inventor with the inventor_id
+* cbsa_label          <- rows of msa_label with the cbsa_id
+* patent_dates        <- rows of msa_patent_dates with the patent_id
+* patent_uspc         <- rows of msa_patent_uspc with the patent_id
+* patent_quality      <- rows of msa_patent_quality with the patent_id
+* patent_cpc          <- rows of msa_patent_cpc with the patent_id
+* cpc_class_patents   <- rows of msa_patent_cpc with the cpc_class
+* forward_citations   <- rows of msa_citation with the (cited) patent_id
+* backward_citations  <- rows of msa_citation with the forward_citation_id
+The rows are printed as a TSV table, or written to the output, if provided
+
+Usage:
+  python src/query-database.py -i DATABASE.sqlite --query LOOKUP --keys KEY ...
+    [-o OUTPUT]
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import sys
+from msa_db import connect, run_lookup
+from parse_args import parse_io, add_table_options, add_instrument_options
+from instrument import start_script
+from table_io import write_table, set_options
+
+
+def add_query_options(parser):
+    parser.add_argument(
+        '--query', 
+        help='lookup run on the SQLite database (see msa_db.py)', 
+        required=False)
+    parser.add_argument(
+        '--keys', 
+        help='keys looked up (e.g., patent or CBSA ids)', 
+        required=False, 
+        nargs='+')
+
+
+def main():
+    args = parse_io(
+        add_query_options,
+        add_table_options,
+        add_instrument_options)
+    start_script(args.output, args.metrics, args.profile)
+    set_options(compression_level=args.compression_level)
+
+    con = connect(args.input) # msa_database.sqlite
+    df = run_lookup(con, args.query, args.keys or [])
+    con.close()
+
+    if args.output is not None:
+        write_table(df, args.output)
+    else:
+        df.to_csv(sys.stdout, sep='\t', index=False)
+
+
+if __name__ == '__main__':
+    main()
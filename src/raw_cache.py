@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+"""
+Modules to cache the raw tables decompressed
+Several stages read the same zipped raw tables (e.g., patent.tsv.zip and
+  uspatentcitation.tsv.zip), and each read would decompress the whole table
+  again. Instead, the member of each zip file is extracted once into the
+  cache directory, and read from there (memory mapped) by every stage
+The extracted table is stored with the size, the modification time and the
+  digest of the zip file it comes from, and it is extracted again only if
+  the zip file has changed. If only its modification time has changed
+  (e.g., the file was downloaded again), the digest is compared
+Stages that run in parallel wait for each other to extract the same table
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import fcntl
+import json
+import os
+import shutil
+import zipfile
+from hashing import file_digest
+from instrument import step
+
+
+def extracted_path(path:str, cache_dir:str) -> str:
+    """File the member of a zip file is extracted to"""
+    return os.path.join(cache_dir, os.path.basename(path)[:-len('.zip')])
+
+
+def _zip_stat(path:str) -> dict:
+    stat = os.stat(path)
+    return {'size':stat.st_size, 'mtime':stat.st_mtime}
+
+
+def _read_sidecar(path:str) -> dict:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f_in:
+        return json.load(f_in)
+
+
+def _write_sidecar(sidecar:dict, path:str):
+    tmp_path = f'{path}.tmp.{os.getpid()}'
+    with open(tmp_path, 'w') as f_out:
+        json.dump(sidecar, f_out, indent=2)
+    os.replace(tmp_path, path)
+
+
+def is_extracted(path:str, cache_dir:str) -> bool:
+    """Whether the table extracted from a zip file is up to date"""
+    target = extracted_path(path, cache_dir)
+    sidecar = _read_sidecar(f'{target}.json')
+    if sidecar is None or not os.path.exists(target):
+        return False
+    stat = _zip_stat(path)
+    if stat['size']!=sidecar['size']:
+        return False
+    if stat['mtime']!=sidecar['mtime']:
+        if file_digest(path)!=sidecar['digest']:
+            return False
+        # The zip file was touched, but it has not changed
+        _write_sidecar({**sidecar, **stat}, f'{target}.json')
+    return True
+
+
+def extract(path:str, cache_dir:str) -> str:
+    """Path of the table of a zip file (with a single member),
+      extracted into the cache directory if not done yet
+    """
+    target = extracted_path(path, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(f'{target}.lock', 'w') as f_lock:
+        fcntl.flock(f_lock, fcntl.LOCK_EX)
+        if is_extracted(path, cache_dir):
+            return target
+        with step(f'extract {os.path.basename(path)}'):
+            stat = _zip_stat(path)
+            with zipfile.ZipFile(path) as f_zip:
+                members = f_zip.namelist()
+                if len(members)!=1:
+                    raise ValueError(
+                        f'Expected a single file in {path}, found {members}')
+                # Extract the table atomically, to never leave a broken one
+                tmp_path = f'{target}.tmp.{os.getpid()}'
+                with f_zip.open(members[0]) as f_in, \
+                        open(tmp_path, 'wb') as f_out:
+                    shutil.copyfileobj(f_in, f_out, 1<<24)
+            os.replace(tmp_path, target)
+            _write_sidecar(
+                {**stat, 'digest':file_digest(path)}, f'{target}.json')
+    return target
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+
+"""
+Modules to store the raw columns used by the project as typed binary arrays
+Of the (large) raw tables of PatentsView, the stages use only a few columns,
+  and each stage would parse them again from text. Instead, these columns
+  are converted once (see make-raw-columns.py) into a directory of binary
+  arrays (one file per column, e.g. patent.columns/id.bin), which the stages
+  read memory mapped, sharing the page cache when they run in parallel
+The columns are stored as
+* patent_id  <- uint32 (converted as patent_ids.py does, non-utility patents
+                have the PATENT_ID_SENTINEL id)
+* float      <- float64
+* string     <- int32 codes (-1 if missing) of a dictionary of the distinct
+                values, sorted as pandas sorts the categories of a column
+                read as categorical (e.g., the inventor and location ids,
+                and the dates, that are repaired from their raw strings)
+The string columns are read as categoricals, if requested, or as strings
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from instrument import count_rows
+from patent_ids import convert_patent_id
+
+
+# Raw columns stored, by table, with their kind
+RAW_COLUMNS = {
+    'patent':{
+        'id':'patent_id',
+        'date':'string'},
+    'patent_inventor':{
+        'patent_id':'patent_id',
+        'inventor_id':'string',
+        'location_id':'string'},
+    'location':{
+        'id':'string',
+        'latitude':'float',
+        'longitude':'float'},
+    'uspatentcitation':{
+        'patent_id':'patent_id',
+        'citation_id':'patent_id'}}
+
+# Type of the values stored for each kind of column
+KIND_TYPES = {
+    'patent_id':np.uint32,
+    'float':np.float64,
+    'string':np.int32}
+
+# Type each kind of column is read from the raw text table
+RAW_TYPES = {
+    'patent_id':str,
+    'float':float,
+    'string':str}
+
+SCHEMA_FILE = 'schema.json'
+
+# Rows of the codes of a string column remapped at once
+REMAP_CHUNKSIZE = 1<<24
+
+
+def _column_path(path:str, col:str) -> str:
+    return os.path.join(path, f'{col}.bin')
+
+
+def _dictionary_path(path:str, col:str) -> str:
+    return os.path.join(path, f'{col}.dictionary.parquet')
+
+
+def read_schema(path:str) -> dict:
+    with open(os.path.join(path, SCHEMA_FILE)) as f_in:
+        return json.load(f_in)
+
+
+class ColumnsWriter:
+    """Write the raw columns of a table chunk by chunk
+    The directory is written atomically, when the writer is closed
+    """
+
+    def __init__(self, path:str, kinds:dict):
+        self.path = path
+        self.kinds = kinds
+        self.rows = 0
+        self._tmp_path = f'{path}.tmp.{os.getpid()}'
+        shutil.rmtree(self._tmp_path, ignore_errors=True)
+        os.makedirs(self._tmp_path)
+        self._files = {
+            col:open(_column_path(self._tmp_path, col), 'wb') \
+                for col in kinds}
+        # Code of each distinct value of the string columns,
+        #  in the order they are found
+        self._codes = {
+            col:{} for col,kind in kinds.items() if kind=='string'}
+
+    def _encode(self, values:pd.Series, codes:dict) -> np.ndarray:
+        chunk_codes, uniques = pd.factorize(values)
+        uniques = np.array(
+            [codes.setdefault(value, len(codes)) for value in uniques] + [-1],
+            dtype=np.int32)
+        # The missing values have code -1 (the last one)
+        return uniques[chunk_codes]
+
+    def write(self, df:pd.DataFrame):
+        for col, kind in self.kinds.items():
+            if kind=='patent_id':
+                values = convert_patent_id(df[col]).values
+            elif kind=='string':
+                values = self._encode(df[col], self._codes[col])
+            else:
+                values = df[col].values
+            np.asarray(values, dtype=KIND_TYPES[kind]) \
+                .tofile(self._files[col])
+        self.rows += len(df)
+        count_rows(rows_out=len(df))
+
+    def _write_dictionary(self, col:str):
+        """Sort the dictionary of a string column and remap its codes"""
+        values = np.array(list(self._codes[col]), dtype=object)
+        order = np.argsort(values, kind='stable')
+        rank = np.empty(len(order)+1, dtype=np.int32)
+        rank[order] = np.arange(len(order), dtype=np.int32)
+        rank[-1] = -1
+        if self.rows>0:
+            codes = np.memmap(
+                _column_path(self._tmp_path, col),
+                dtype=np.int32, mode='r+', shape=(self.rows,))
+            for start in range(0, self.rows, REMAP_CHUNKSIZE):
+                # The code -1 takes the last rank, that is -1 itself
+                codes[start:start+REMAP_CHUNKSIZE] = \
+                    rank[codes[start:start+REMAP_CHUNKSIZE]]
+            codes.flush()
+            del codes
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pq.write_table(
+            pa.table({col:pa.array(values[order], type=pa.string())}),
+            _dictionary_path(self._tmp_path, col))
+
+    def close(self):
+        for f_out in self._files.values():
+            f_out.close()
+        for col in self._codes:
+            self._write_dictionary(col)
+        with open(os.path.join(self._tmp_path, SCHEMA_FILE), 'w') as f_out:
+            json.dump({
+                    'rows':self.rows,
+                    'columns':self.kinds},
+                f_out, indent=2)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        for f_out in self._files.values():
+            f_out.close()
+        shutil.rmtree(self._tmp_path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def _read_dictionary(path:str, col:str) -> np.ndarray:
+    import pyarrow.parquet as pq
+    return pq.read_table(_dictionary_path(path, col)) \
+        .column(0) \
+        .to_numpy(zero_copy_only=False)
+
+
+def _is_category(dtype, col:str) -> bool:
+    if isinstance(dtype, dict):
+        return dtype.get(col)=='category'
+    return dtype=='category'
+
+
+def read_columns(
+        path:str, columns:list=None, dtype=None, chunksize:int=None):
+    """Read the raw columns of a table (all, if no column is provided),
+      memory mapped
+    The string columns are read as categoricals, if this type is requested,
+      or as strings otherwise
+    If chunksize is provided, an iterator over chunks of the table is returned
+    """
+    schema = read_schema(path)
+    rows = schema['rows']
+    kinds = {
+        col:kind for col,kind in schema['columns'].items() \
+            if columns is None or col in columns}
+
+    arrays = {}
+    for col, kind in kinds.items():
+        # An empty file cannot be mapped into memory
+        arrays[col] = np.memmap(
+                _column_path(path, col),
+                dtype=KIND_TYPES[kind], mode='r', shape=(rows,)) \
+            if rows>0 else np.array([], dtype=KIND_TYPES[kind])
+
+    decoders = {}
+    for col, kind in kinds.items():
+        if kind!='string':
+            continue
+        dictionary = _read_dictionary(path, col)
+        if _is_category(dtype, col):
+            categories = pd.CategoricalDtype(pd.Index(dictionary))
+            decoders[col] = lambda codes, categories=categories: \
+                pd.Categorical.from_codes(codes, dtype=categories)
+        else:
+            # The code -1 of the missing values takes the last value
+            values = np.append(dictionary, np.nan)
+            decoders[col] = lambda codes, values=values: values[codes]
+
+    def frame(start:int, stop:int) -> pd.DataFrame:
+        return pd.DataFrame({
+            col:decoders[col](np.asarray(array[start:stop])) \
+                if col in decoders else np.asarray(array[start:stop]) \
+                    for col, array in arrays.items()})
+
+    if chunksize is None:
+        return frame(0, rows)
+    return (
+        frame(start, start+chunksize) \
+            for start in range(0, rows, chunksize))
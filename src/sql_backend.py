@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+
+"""
+Modules to run the heavy joins of the project on an embedded database
+The raw tables are loaded, chunk by chunk, into a DuckDB database file and
+  joined, filtered and aggregated there. DuckDB spills to disk what does not
+  fit in its memory limit, therefore the memory needed does not depend on
+  the size of the raw tables, but only on that of the tables produced
+The keys are converted (e.g., the patent ids into integers) by the same
+  functions of the pandas scripts while each chunk is loaded, and the results
+  are returned in the same order in which the pandas scripts produce them,
+  so that the tables written are identical whatever the backend
+DuckDB is needed only if this backend is used (--backend duckdb)
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from instrument import step
+from table_io import make_dir
+
+
+CHUNKSIZE = 1000000
+
+# Column that keeps the order of the rows of the raw tables
+ROW_ID = 'row_id'
+
+SQL_TYPES = {
+    'object':'VARCHAR',
+    'bool':'BOOLEAN',
+    'uint32':'UINTEGER',
+    'int64':'BIGINT',
+    'float64':'DOUBLE'}
+
+
+class Database:
+    """DuckDB database file (and its spill directory),
+      removed when the database is closed
+    """
+
+    def __init__(self, path:str, memory:float=None, jobs:int=None):
+        import duckdb
+        self.path = path
+        self.temp_dir = f'{path}.tmp'
+        self._remove()
+        make_dir(path)
+        self.con = duckdb.connect(path)
+        self.con.execute(f"SET temp_directory='{self.temp_dir}'")
+        if memory is not None:
+            self.con.execute(f"SET memory_limit='{int(memory*1024)}MB'")
+        if jobs is not None:
+            self.con.execute(f'SET threads={jobs}')
+
+    def load(self, name:str, chunks):
+        """Load the chunks of a table (pandas DataFrames) into a new table,
+          adding the position of each row among the rows loaded (ROW_ID)
+        """
+        n_rows = 0
+        with step(f'load {name}') as s:
+            for df_chunk in chunks:
+                df_chunk = df_chunk.reset_index(drop=True)
+                df_chunk.insert(
+                    0, ROW_ID, np.arange(n_rows, n_rows+len(df_chunk)))
+                if n_rows==0:
+                    # The types are set explicitly, since a column
+                    #  of strings can be empty in a chunk
+                    columns = ', '.join(
+                        f'{col} {SQL_TYPES[str(col_type)]}' \
+                            for col,col_type in df_chunk.dtypes.items())
+                    self.con.execute(f'CREATE TABLE {name} ({columns})')
+                self.con.register('df_chunk', df_chunk)
+                self.con.execute(f'INSERT INTO {name} SELECT * FROM df_chunk')
+                self.con.unregister('df_chunk')
+                n_rows += len(df_chunk)
+            s.rows_out = n_rows
+
+    def query(self, sql:str, **tables) -> pd.DataFrame:
+        """Result of a query as a DataFrame
+        The DataFrames passed as keyword arguments can be queried as tables
+        Missing strings are returned as NaN (as read by pandas)
+        """
+        for name, df in tables.items():
+            self.con.register(name, df)
+        df = self.con.execute(sql).df()
+        for name in tables:
+            self.con.unregister(name)
+        for col in df.columns[df.dtypes==object]:
+            df[col] = df[col].where(df[col].notna(), np.nan)
+        return df
+
+    def _remove(self):
+        for path in [self.path, f'{self.path}.wal']:
+            if os.path.exists(path):
+                os.remove(path)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def close(self):
+        """Close the database and remove its files (if not done already)"""
+        if self.con is None:
+            return
+        self.con.close()
+        self.con = None
+        self._remove()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def database_path(output:str) -> str:
+    """Database file of the stage that produces the output provided"""
+    return f'{output}.duckdb'
+
+
+def categories(db:Database, table:str, column:str) -> pd.Index:
+    """Categories of a column, as pandas makes them reading the whole column
+    """
+    return pd.Index(db.query(f'''
+        SELECT DISTINCT {column} FROM {table}
+        WHERE {column} IS NOT NULL
+        ORDER BY {column}''')[column].values)
+
+
+def drop_duplicates(db:Database, table:str, columns:list, where:str='TRUE'):
+    """Keep the first occurrence of each row (as drop_duplicates in pandas)
+      among the rows of the table that satisfy the condition
+    """
+    db.con.execute(f'''
+        CREATE TABLE {table}_unique AS
+        SELECT * FROM {table}
+        WHERE {where}
+        QUALIFY row_number() OVER (
+            PARTITION BY {', '.join(columns)} ORDER BY {ROW_ID})=1''')
+    db.con.execute(f'DROP TABLE {table}')
+    db.con.execute(f'ALTER TABLE {table}_unique RENAME TO {table}')
+
+
+def merge_patent_inventors(db:Database):
+    """Merge the patents with their inventors and count the inventors
+      of each patent, as in make-patent-database.py
+    The patent and patent_inventor tables must be loaded
+      (the latter with an is_complete column, false for the rows
+      that pandas drops as incomplete)
+    """
+    # pandas keeps the order of the first occurrence of each key
+    #  of the left table in an inner merge
+    db.con.execute(f'''
+        CREATE TABLE patent_inventor_merged AS
+        WITH patent_first AS (
+            SELECT
+                patent_id,
+                {ROW_ID},
+                min({ROW_ID}) OVER (PARTITION BY patent_id) AS first_id
+            FROM patent)
+        SELECT
+            p.first_id,
+            p.{ROW_ID} AS patent_row,
+            i.{ROW_ID} AS inventor_row,
+            p.patent_id,
+            i.inventor_id,
+            i.location_id
+        FROM patent_first AS p
+        JOIN patent_inventor AS i
+        ON p.patent_id=i.patent_id
+        WHERE i.is_complete''')
+    db.con.execute('''
+        CREATE TABLE patent_n_inventors AS
+        SELECT patent_id, count(DISTINCT inventor_id) AS n_inventors
+        FROM patent_inventor_merged
+        GROUP BY patent_id''')
+
+
+def used_locations(db:Database) -> np.ndarray:
+    """Locations of the inventors of the patents"""
+    return db.query('''
+        SELECT DISTINCT location_id FROM patent_inventor_merged''') \
+        .location_id.values
+
+
+def locate_inventors(
+        db:Database, location_ids:pd.Series) -> pd.DataFrame:
+    """Patent-inventor rows at the locations provided, with the position
+      of their location among those provided (location_code),
+      in the order of make-patent-database.py
+    """
+    df_location = pd.DataFrame({
+        'location_id':location_ids.values,
+        'location_code':np.arange(len(location_ids))})
+    df_patent = db.query(f'''
+        SELECT
+            m.patent_id,
+            m.inventor_id,
+            1 / CAST(n.n_inventors AS DOUBLE) AS inventor_share,
+            l.location_code
+        FROM patent_inventor_merged AS m
+        JOIN patent_n_inventors AS n
+        ON m.patent_id=n.patent_id
+        JOIN df_location AS l
+        ON m.location_id=l.location_id
+        ORDER BY m.first_id, m.patent_row, m.inventor_row''',
+        df_location=df_location)
+    df_patent['inventor_id'] = pd.Categorical(
+        df_patent.inventor_id,
+        categories=categories(db, 'patent_inventor', 'inventor_id'))
+    return df_patent
+
+
+def merge_applications(db:Database) -> pd.DataFrame:
+    """Grant and application dates (and claims) of the patents,
+      as in make-patent-info-database.py
+    The patent and application tables must be loaded
+    """
+    drop_duplicates(
+        db, 'patent', ['patent_id', 'grant_date'], where='patent_id!=0')
+    drop_duplicates(
+        db, 'application', ['patent_id', 'appln_date', 'num_claims'],
+        where='patent_id!=0')
+    # pandas keeps the order of the left table in a left merge
+    return db.query(f'''
+        SELECT
+            p.* EXCLUDE ({ROW_ID}),
+            a.* EXCLUDE ({ROW_ID}, patent_id)
+        FROM patent AS p
+        LEFT JOIN application AS a
+        ON p.patent_id=a.patent_id
+        ORDER BY p.{ROW_ID}, a.{ROW_ID}''')
+
+
+def patent_uspc_classes(db:Database) -> pd.DataFrame:
+    """USPC classes of the patents, as in make-patent-info-database.py
+    The patex table must be loaded
+    """
+    drop_duplicates(
+        db, 'patex', ['uspc_class', 'patent_id'],
+        where='''
+            patent_id!=0 AND
+            uspc_class IS NOT NULL AND
+            uspc_class!='XXX' ''')
+    return db.query(f'''
+        SELECT * EXCLUDE ({ROW_ID}) FROM patex ORDER BY {ROW_ID}''')
+
+
+def count_citations(
+        db:Database, patent_ids:np.ndarray, grant_dates:np.ndarray,
+        windows:list) -> np.ndarray:
+    """Count the forward citations received by each patent within each window
+      (see citation_windows.count_citations)
+    The citation table must be loaded (patent_id is the cited patent and
+      forward_citation_id the citing one)
+    """
+    df_grant = pd.DataFrame({
+        'patent_id':np.asarray(patent_ids, dtype=np.uint32),
+        'grant_day':np.asarray(grant_dates, dtype='datetime64[D]') \
+            .astype(np.int64),
+        'position':np.arange(len(patent_ids))})
+    counts_sql = ', '.join(
+        f'count(*) FILTER (WHERE citing.grant_day-cited.grant_day<={years*365})'
+        f' AS num_citations_{years}y' \
+            for years in windows)
+    df_counts = db.query(f'''
+        WITH edge AS (
+            SELECT DISTINCT patent_id, forward_citation_id FROM citation)
+        SELECT cited.position, {counts_sql}
+        FROM edge
+        JOIN df_grant AS cited
+        ON edge.patent_id=cited.patent_id
+        JOIN df_grant AS citing
+        ON edge.forward_citation_id=citing.patent_id
+        GROUP BY cited.position''',
+        df_grant=df_grant)
+    counts = np.zeros((len(patent_ids), len(windows)), dtype=np.int64)
+    counts[df_counts.position.values] = df_counts \
+        .drop(columns='position') \
+        .values
+    return counts
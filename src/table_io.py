@@ -0,0 +1,573 @@
+#!/usr/bin/env python
+
+"""
+Modules to read and write the tables of the project.
+The format of a table is inferred from the extension of its file name
+* .parquet, .feather  <- typed columnar formats, used for the interim and
+                         processed tables (the columns are stored with their
+                         own types and can be read selectively)
+* .tsv.zip, .csv.zip  <- zipped text formats, used for the raw data and
+                         for the published database
+* .columns            <- directories of the raw columns used by the project,
+                         stored as binary arrays (read only; see
+                         raw_columns.py)
+Text tables can be compressed also with gzip (.gz), zstd (.zst) or lz4 (.lz4),
+  which are much faster than zip (e.g., for the interim tables of a build).
+  They are written by formatting a chunk of rows while the previous one is
+  compressed on another thread, and the numbers and the dates are formatted
+  column by column (as to_csv does, but faster)
+The types of the columns of a text table written by the project are saved
+  next to it (e.g., msa_patent.tsv.zst.types.json), and the table is read
+  back with them (and with the floats parsed exactly), so that its values
+  are the same as if it were stored in a columnar format. Zipped tables are
+  left as single files, as they are released (their types are inferred)
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import json
+import numpy as np
+import pandas as pd
+import os
+import queue
+import threading
+import zipfile
+from dates import to_datetime
+from instrument import step, count_rows
+
+
+COLUMNAR_FORMATS = ['parquet', 'feather']
+TEXT_FORMATS = ['tsv', 'csv']
+RAW_COLUMNS_FORMAT = 'columns'
+
+# Codecs of the text tables (by the extension of their file name),
+#  with their default compression level
+CODECS = {
+    'zip':6,
+    'gz':6,
+    'zst':3,
+    'lz4':0}
+
+# Rows of a text table formatted (and compressed) at once
+FORMAT_CHUNKSIZE = 100000
+
+# Suffix of the file with the types of the columns of a text table
+TYPES_SUFFIX = '.types.json'
+
+# Compression level of the tables written by the current stage
+#  (the default of each codec, if None; see set_options)
+_compression_level = None
+
+
+# Directory the zipped text tables read by the current stage are extracted to
+#  (not extracted, if None; see raw_cache.py and set_options)
+_raw_cache = None
+
+
+def set_options(compression_level:int=None, raw_cache:str=None):
+    """Set the options of the tables read and written by the current stage
+      (those not provided are reset, as a previous stage may have set them
+      in the same process; see pipeline.py)
+    """
+    global _compression_level, _raw_cache
+    _compression_level = compression_level
+    _raw_cache = raw_cache
+
+
+def table_codec(path:str) -> str:
+    """Codec of a text table (None, if it is not compressed)"""
+    codec = path.split('.')[-1]
+    return codec if codec in CODECS else None
+
+
+def table_format(path:str) -> str:
+    file = os.path.basename(path)
+    codec = table_codec(file)
+    if codec is not None:
+        file = file[:-len(codec)-1]
+    format = file.split('.')[-1]
+    if format not in COLUMNAR_FORMATS+TEXT_FORMATS+[RAW_COLUMNS_FORMAT]:
+        raise ValueError(f'Unknown table format: {path}')
+    return format
+
+
+def table_extension(path:str) -> str:
+    """Extension of the file name of a table (e.g., tsv.zip)"""
+    codec = table_codec(path)
+    format = table_format(path)
+    return format if codec is None else f'{format}.{codec}'
+
+
+def types_path(path:str) -> str:
+    return f'{path}{TYPES_SUFFIX}'
+
+
+def _read_types(path:str) -> dict:
+    """Types of the columns of a text table, as written
+      (None, if they were not saved, e.g. for the raw data)
+    """
+    if not os.path.exists(types_path(path)):
+        return None
+    with open(types_path(path)) as f_in:
+        return json.load(f_in)
+
+
+def _write_types(path:str, df:pd.DataFrame):
+    """Save the types of the columns of a text table
+    The categoricals are read back as such only if their categories are
+      strings (the others are left to pandas)
+    """
+    types = {}
+    for col, col_type in df.dtypes.items():
+        if pd.api.types.is_categorical_dtype(col_type):
+            if col_type.categories.dtype!=object:
+                continue
+        types[str(col)] = str(col_type)
+    with open(types_path(path), 'w') as f_out:
+        json.dump(types, f_out, indent=2)
+
+
+def replace_table(src:str, dst:str):
+    """Rename a table (e.g., written to a temporary path), 
+      together with the types of its columns (if any)
+    """
+    os.replace(src, dst)
+    if os.path.exists(types_path(src)):
+        os.replace(types_path(src), types_path(dst))
+    elif os.path.exists(types_path(dst)):
+        os.remove(types_path(dst))
+
+
+def make_dir(path:str):
+    dir = os.path.dirname(path)
+    if dir and not os.path.exists(dir):
+        os.makedirs(dir)
+
+
+def table_columns(path:str) -> list:
+    format = table_format(path)
+    if format=='parquet':
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    if format=='feather':
+        import pyarrow.feather as pf
+        return pf.read_table(path, memory_map=True).column_names
+    if format==RAW_COLUMNS_FORMAT:
+        from raw_columns import read_schema
+        return list(read_schema(path)['columns'])
+    source = _text_source(path)
+    try:
+        return pd.read_csv(
+                source,
+                sep='\t' if format=='tsv' else ',',
+                nrows=0) \
+            .columns.tolist()
+    finally:
+        if not isinstance(source, str):
+            source.close()
+
+
+def _text_source(path:str):
+    """Source pandas reads a text table from: its path, if pandas can
+      decompress it, or a decompressed stream
+    Zipped tables are read from their extracted copy, if the raw cache is used
+    """
+    codec = table_codec(path)
+    if codec=='zip' and _raw_cache is not None:
+        from raw_cache import extract
+        return extract(path, _raw_cache)
+    if codec=='zst':
+        import zstandard
+        return zstandard.open(path, 'rb')
+    if codec=='lz4':
+        import lz4.frame
+        return lz4.frame.open(path, 'rb')
+    return path
+
+
+def read_table(
+        path:str, columns:list=None, dtype=None, parse_dates:list=None,
+        chunksize:int=None, **kwargs):
+    """Read a table, whatever its format
+    The dtype and parse_dates arguments are needed to type the columns of
+      the text formats. The columns of a columnar table are already typed,
+      therefore only the non-string types requested are enforced
+    If chunksize is provided, an iterator over chunks of the table is returned
+    The rows read are counted among the inputs of the current stage
+    """
+    if chunksize is not None:
+        return _count_chunks(_read_table(
+            path, columns, dtype, parse_dates, chunksize, **kwargs))
+    with step(f'read {os.path.basename(path)}') as s:
+        df = _read_table(path, columns, dtype, parse_dates, None, **kwargs)
+        s.rows_out = len(df)
+    count_rows(rows_in=len(df))
+    return df
+
+
+def _saved_types(
+        types:dict, columns:list, dtype, parse_dates:list) -> tuple:
+    """Types (and dates) a text table is read with, given the types of
+      its columns as written
+    As for the columnar tables, the string types requested do not override
+      the types of the columns
+    """
+    if isinstance(dtype, dict):
+        requested = {
+            col:col_type for col,col_type in dtype.items() \
+                if col_type not in [str, object]}
+    elif dtype is None or dtype in [str, object]:
+        requested = {}
+    else:
+        # A single type is requested for all the columns
+        return dtype, parse_dates
+    types = {
+        col:col_type for col,col_type in types.items() \
+            if (columns is None or col in columns) and col not in requested}
+    parse_dates = list(parse_dates or []) + [
+        col for col,col_type in types.items() \
+            if col_type.startswith('datetime64') and \
+                col not in (parse_dates or [])]
+    dtype = {
+        **{col:str if col_type=='object' else col_type \
+            for col,col_type in types.items() \
+                if not col_type.startswith('datetime64')},
+        **requested}
+    return dtype, parse_dates
+
+
+def _count_chunks(chunks):
+    for df in chunks:
+        count_rows(rows_in=len(df))
+        yield df
+
+
+def _read_table(
+        path:str, columns:list, dtype, parse_dates:list,
+        chunksize:int, **kwargs):
+    format = table_format(path)
+
+    def parse_date_columns(df):
+        for col in parse_dates or []:
+            df[col] = to_datetime(df[col])
+        return df
+
+    if format in TEXT_FORMATS:
+        # The columns of a table written by the project are read with
+        #  their own types (unless other types are requested), and its
+        #  floats are parsed exactly, as they were formatted
+        types = _read_types(path)
+        if types is not None:
+            dtype, parse_dates = _saved_types(
+                types, columns, dtype, parse_dates)
+            kwargs = {'float_precision':'round_trip', **kwargs}
+        # The dates are read as strings and parsed by dates.to_datetime
+        #  (dates that are not valid become NaT)
+        if parse_dates and (dtype is None or isinstance(dtype, dict)):
+            dtype = {
+                **(dtype or {}), **{col:str for col in parse_dates}}
+        source = _text_source(path)
+        df = pd.read_csv(
+            source,
+            sep='\t' if format=='tsv' else ',',
+            usecols=columns,
+            dtype=dtype,
+            chunksize=chunksize,
+            # An uncompressed table is mapped into memory
+            #  rather than read into a buffer
+            memory_map=isinstance(source, str) and \
+                table_codec(source) is None,
+            **kwargs)
+        if chunksize is not None:
+            return _read_text_chunks(source, df, parse_date_columns)
+        if not isinstance(source, str):
+            source.close()
+        return parse_date_columns(df)
+
+    def set_types(df):
+        if isinstance(dtype, dict):
+            types = {
+                col:col_type for col,col_type in dtype.items() \
+                    if col in df.columns and col_type not in [str, object]}
+        elif dtype is not None and dtype not in [str, object]:
+            types = dtype
+        else:
+            types = {}
+        if types:
+            df = df.astype(types)
+        return parse_date_columns(df)
+
+    if format==RAW_COLUMNS_FORMAT:
+        from raw_columns import read_columns
+        df = read_columns(path, columns, dtype, chunksize)
+        if chunksize is not None:
+            return (set_types(chunk) for chunk in df)
+        return set_types(df)
+
+    if columns is not None:
+        # As for the text formats, the columns are kept in the file order
+        columns = [col for col in table_columns(path) if col in columns]
+    if chunksize is not None:
+        if format!='parquet':
+            raise ValueError(f'Chunked reading is not supported for {path}')
+        import pyarrow.parquet as pq
+        return (
+            set_types(batch.to_pandas()) \
+                for batch in pq.ParquetFile(path).iter_batches(
+                    batch_size=chunksize, columns=columns))
+    if format=='parquet':
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        df = pd.read_feather(path, columns=columns)
+    return set_types(df)
+
+
+def _read_text_chunks(source, chunks, parse_date_columns):
+    try:
+        for chunk in chunks:
+            yield parse_date_columns(chunk)
+    finally:
+        if not isinstance(source, str):
+            source.close()
+
+
+def format_values(values:pd.Series):
+    """Values of a column formatted as to_csv formats them
+      (missing values are empty strings)
+    The numbers are formatted as numpy does (as to_csv) but, since many values
+      repeat, each distinct float is formatted only once
+    None is returned for the types that must be left to to_csv
+    """
+    if pd.api.types.is_categorical_dtype(values):
+        categories = format_values(pd.Series(values.cat.categories))
+        if categories is None:
+            return None
+        categories = np.append(np.asarray(categories, dtype=object), '')
+        return categories[values.cat.codes.values]
+    values = values.values
+    if not isinstance(values, np.ndarray):
+        return None
+    if values.dtype.kind in 'iub':
+        return list(map(str, values.tolist()))
+    if values.dtype.kind=='f':
+        if ((values==0) & np.signbit(values)).any():
+            # -0.0 is a distinct value for numpy, but not for a hash table
+            strings = values.astype(str).astype(object)
+            strings[np.isnan(values)] = ''
+            return strings
+        codes, uniques = pd.factorize(values)
+        strings = np.append(uniques.astype(str).astype(object), '')
+        return strings[codes]
+    if values.dtype.kind=='M':
+        days = values.astype('datetime64[D]')
+        is_missing = np.isnat(values)
+        if (values[~is_missing]!=days[~is_missing]).any():
+            # to_csv formats also the times
+            return None
+        strings = np.datetime_as_string(days).astype(object)
+        strings[is_missing] = ''
+        return strings
+    if values.dtype.kind=='O':
+        strings = np.array(list(map(str, values)), dtype=object)
+        strings[pd.isna(values)] = ''
+        return strings
+    return None
+
+
+def format_csv(df:pd.DataFrame, sep:str, header:bool) -> str:
+    """Rows of a DataFrame as to_csv formats them (without the index)
+    The rows are joined column by column, unless any field must be quoted
+      (or has a type left to to_csv)
+    """
+    columns = [format_values(df[col]) for col in df.columns]
+    header_fields = [str(col) for col in df.columns]
+    special = [sep, '"', '\n', '\r']
+    needs_to_csv = len(columns)<2 or any([
+        values is None for values in columns]) or any([
+            char in ''.join(fields) \
+                for fields in [header_fields] + [
+                    values for values,col in zip(columns, df.columns) \
+                        if values is not None and \
+                            not pd.api.types.is_numeric_dtype(df[col])] \
+                for char in special])
+    if needs_to_csv:
+        return df.to_csv(sep=sep, index=False, header=header)
+    lines = []
+    if header:
+        lines.append(sep.join(header_fields))
+    if len(df)>0:
+        lines.append(os.linesep.join(map(sep.join, zip(*columns))))
+    return ''.join([line+os.linesep for line in lines])
+
+
+class _BackgroundWriter:
+    """Write the data received into a file on another thread, so that
+      a chunk is compressed (the compressors release the GIL) while the next
+      one is formatted
+    """
+
+    def __init__(self, f_out, max_chunks:int=2):
+        self._f_out = f_out
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            data = self._queue.get()
+            if data is None:
+                return
+            # After an error, the data are discarded (not to block the queue)
+            if self._error is None:
+                try:
+                    self._f_out.write(data)
+                except BaseException as e:
+                    self._error = e
+
+    def _raise(self):
+        if self._error is not None:
+            raise self._error
+
+    def write(self, data:bytes):
+        self._raise()
+        self._queue.put(data)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._raise()
+
+
+def _open_compressed(path:str, level:int=None) -> list:
+    """Files to write a table into, compressed with the codec of its
+      file name (if any). The data are written into the last one, and
+      the files are closed in the reverse order
+    """
+    codec = table_codec(path)
+    if codec is not None and level is None:
+        level = _compression_level if _compression_level is not None \
+            else CODECS[codec]
+    if codec=='zip':
+        f_zip = zipfile.ZipFile(
+            path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=level)
+        f_bin = f_zip.open(
+            os.path.basename(path)[:-len('.zip')], 'w', force_zip64=True)
+        return [f_zip, f_bin]
+    if codec=='gz':
+        import gzip
+        return [gzip.open(path, 'wb', compresslevel=level)]
+    if codec=='zst':
+        import zstandard
+        f_bin = open(path, 'wb')
+        return [f_bin, zstandard.ZstdCompressor(level=level) \
+            .stream_writer(f_bin, closefd=False)]
+    if codec=='lz4':
+        import lz4.frame
+        return [lz4.frame.open(path, 'wb', compression_level=level)]
+    return [open(path, 'wb')]
+
+
+class TableWriter:
+    """Write a table chunk by chunk, whatever its format
+    Text tables are compressed (if needed, with the level provided)
+      while they are written, while parquet tables are written
+      as a sequence of row groups
+    The types of the columns of a text table are saved next to it,
+      unless it is zipped (i.e., in the release format) or save_types is
+      False (e.g., for tables that mimic the raw data)
+    """
+
+    def __init__(self, path:str, level:int=None, save_types:bool=True):
+        self.path = path
+        self.format = table_format(path)
+        self._header = True
+        self._chunks = []
+        self._writer = None
+        self._handles = []
+        self._background = None
+        self._save_types = save_types and table_codec(path)!='zip'
+        self._has_types = False
+        make_dir(path)
+        if self.format in TEXT_FORMATS:
+            self._handles = _open_compressed(path, level)
+            self._background = _BackgroundWriter(self._handles[-1])
+
+    def write(self, df:pd.DataFrame):
+        count_rows(rows_out=len(df))
+        self._write(df)
+
+    def _write(self, df:pd.DataFrame):
+        if self.format in TEXT_FORMATS:
+            if self._save_types and not self._has_types:
+                _write_types(self.path, df)
+                self._has_types = True
+            sep = '\t' if self.format=='tsv' else ','
+            for start in range(0, max(len(df), 1), FORMAT_CHUNKSIZE):
+                self._background.write(format_csv(
+                        df.iloc[start:start+FORMAT_CHUNKSIZE],
+                        sep, self._header) \
+                    .encode('utf-8'))
+                self._header = False
+        elif self.format=='parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            # Feather files cannot be appended to
+            self._chunks.append(df)
+
+    def close(self):
+        if self.format in TEXT_FORMATS and not self._has_types and \
+                os.path.exists(types_path(self.path)):
+            # The types of a table written before are no longer valid
+            os.remove(types_path(self.path))
+        if self._writer is not None:
+            self._writer.close()
+        if self._chunks:
+            _write_table(
+                pd.concat(self._chunks, ignore_index=True), self.path)
+        try:
+            if self._background is not None:
+                self._background.close()
+        finally:
+            for handle in reversed(self._handles):
+                handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def write_table(df:pd.DataFrame, path:str):
+    """Write a table, whatever its format
+    The rows written are counted among the outputs of the current stage
+    """
+    with step(f'write {os.path.basename(path)}', rows_in=len(df)):
+        _write_table(df, path)
+    count_rows(rows_out=len(df))
+
+
+def _write_table(df:pd.DataFrame, path:str):
+    format = table_format(path)
+    if format==RAW_COLUMNS_FORMAT:
+        raise ValueError(
+            f'Raw columns are written by make-raw-columns.py: {path}')
+    make_dir(path)
+    if format=='parquet':
+        df.to_parquet(path, index=False)
+    elif format=='feather':
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        with TableWriter(path) as writer:
+            writer._write(df)
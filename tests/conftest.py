@@ -0,0 +1,44 @@
+"""
+Shared fixtures of the tests
+The modules of the project are imported from the src directory, as the
+  scripts do, and the servers the scripts talk to (e.g., the file servers
+  of the raw data or the PatentsView API) are replaced by local HTTP servers
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import os
+import sys
+import threading
+import pytest
+from http.server import ThreadingHTTPServer
+
+
+SRC_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src')
+sys.path.insert(0, os.path.abspath(SRC_DIR))
+
+
+@pytest.fixture
+def serve():
+    """Function that starts a local HTTP server with the request handler
+      provided and returns its URL (the servers are shut down at the end
+      of the test)
+    """
+    servers = []
+
+    def start(handler_class) -> str:
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler_class)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_port}'
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
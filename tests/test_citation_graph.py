@@ -0,0 +1,101 @@
+"""
+Tests of citation_graph.py against the pandas expressions it replaces
+  (the citation table, filtered with isin and grouped by cited patent)
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import numpy as np
+import pandas as pd
+import pytest
+import citation_graph
+from citation_graph import \
+    build_citation_graph, save_citation_graph, load_citation_graph, \
+    citation_edges, edge_chunks
+
+
+def random_citations(rng:np.random.RandomState, n:int) -> pd.DataFrame:
+    """Citations (patent_id is the cited patent and forward_citation_id
+      the citing one), some of which are repeated or have an end that
+      is not a utility patent (i.e., 0)
+    """
+    df = pd.DataFrame({
+        'patent_id':rng.randint(0, 3000, n),
+        'forward_citation_id':rng.randint(0, 3000, n)}) \
+        .astype(np.uint32)
+    return pd.concat([df, df.sample(frac=.05, random_state=1)])
+
+
+def sorted_citations(df:pd.DataFrame) -> pd.DataFrame:
+    return df \
+        .query('patent_id!=0 & forward_citation_id!=0') \
+        .sort_values(['patent_id', 'forward_citation_id']) \
+        .reset_index(drop=True)
+
+
+def test_offsets(tmp_path):
+    df = random_citations(np.random.RandomState(0), 10000)
+    path = str(tmp_path / 'citation_graph.csr')
+    save_citation_graph(
+        build_citation_graph(df.patent_id, df.forward_citation_id), path)
+
+    graph = load_citation_graph(path)
+
+    expected = sorted_citations(df)
+    degrees = expected.groupby('patent_id').size()
+    assert graph.offsets.dtype==np.uint32 and graph.targets.dtype==np.uint32
+    assert len(graph.offsets)==degrees.index.max()+2
+    assert (np.diff(graph.offsets)==degrees.reindex(
+        np.arange(len(graph.offsets)-1), fill_value=0).values).all()
+    assert (graph.targets==expected.forward_citation_id.values).all()
+
+
+def test_citation_edges():
+    df = random_citations(np.random.RandomState(0), 10000)
+    graph = build_citation_graph(df.patent_id, df.forward_citation_id)
+    # Patents with and without citations, beyond the graph and repeated
+    patent_ids = np.array([2999, 5, 17, 0, 5, 4000, 1234], dtype=np.uint32)
+
+    cited, citing = citation_edges(graph, patent_ids)
+
+    expected = pd.concat([
+        sorted_citations(df).query(f'patent_id=={patent_id}') \
+            for patent_id in patent_ids])
+    assert cited.tolist()==expected.patent_id.tolist()
+    assert citing.tolist()==expected.forward_citation_id.tolist()
+
+    cited, citing = citation_edges(graph)
+
+    expected = sorted_citations(df)
+    assert cited.tolist()==expected.patent_id.tolist()
+    assert citing.tolist()==expected.forward_citation_id.tolist()
+
+
+def test_edge_chunks():
+    df = random_citations(np.random.RandomState(0), 1000)
+    graph = build_citation_graph(df.patent_id, df.forward_citation_id)
+
+    chunks = list(edge_chunks(graph, 300))
+
+    assert [len(chunk) for chunk in chunks[:-1]]==[300]*(len(chunks)-1)
+    assert pd.concat(chunks, ignore_index=True).equals(sorted_citations(df))
+
+
+def test_empty_graph():
+    graph = build_citation_graph([0, 5], [7, 0])
+
+    assert len(graph.targets)==0
+    assert [len(edges) for edges in citation_edges(graph, [5])]==[0, 0]
+
+
+def test_overflow(monkeypatch):
+    monkeypatch.setattr(citation_graph, 'MAX_CITATIONS', 3)
+
+    build_citation_graph([1, 2, 3], [4, 5, 6])
+    with pytest.raises(ValueError, match='Too many citations'):
+        build_citation_graph([1, 2, 3, 4], [4, 5, 6, 7])
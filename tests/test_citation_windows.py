@@ -0,0 +1,130 @@
+"""
+Tests of citation_windows.py against the pandas expression it replaces
+  (a merge with the grant dates of both ends of each citation, and the
+  number of distinct citing patents within each window)
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import importlib
+import numpy as np
+import pandas as pd
+from citation_windows import count_citations
+
+
+def count_citations_pandas(
+        df_citation:pd.DataFrame, df_patent:pd.DataFrame,
+        windows:list) -> pd.DataFrame:
+    """Forward citations received by each patent within each window,
+      as make-patent-info-database.py used to count them
+    """
+    df_citation = pd.merge(df_citation, df_patent)
+    df_citation = pd.merge(
+        df_citation, df_patent.rename(columns={
+            'patent_id':'forward_citation_id',
+            'grant_date':'forward_citation_grant_date'}))
+    df_citation['time_length'] = df_citation \
+        .forward_citation_grant_date \
+        .sub(df_citation.grant_date)
+    df_counts = df_patent[['patent_id']].set_index('patent_id')
+    for years in windows:
+        df_counts[f'num_citations_{years}y'] = df_citation[
+                df_citation.time_length.dt.days<=years*365] \
+            .groupby('patent_id') \
+            .forward_citation_id \
+            .nunique()
+    return df_counts.fillna(0).astype(np.int64)
+
+
+def random_citations(rng:np.random.RandomState, n_patents:int):
+    df_patent = pd.DataFrame({
+        'patent_id':rng.choice(
+            np.arange(1, n_patents*3), size=n_patents, replace=False) \
+            .astype(np.uint32),
+        'grant_date':np.datetime64('1990-01-01') + \
+            rng.randint(0, 365*20, n_patents).astype('timedelta64[D]')})
+    # Some citations are repeated, and some are from or to unknown patents
+    n_citations = n_patents*10
+    df_citation = pd.DataFrame({
+        'patent_id':rng.choice(
+            np.append(df_patent.patent_id.values, [0, n_patents*5]),
+            size=n_citations),
+        'forward_citation_id':rng.choice(
+            np.append(df_patent.patent_id.values, [n_patents*4]),
+            size=n_citations)}) \
+        .astype(np.uint32)
+    return df_citation, df_patent
+
+
+def test_matches_pandas():
+    rng = np.random.RandomState(0)
+    df_citation, df_patent = random_citations(rng, 500)
+
+    counts = count_citations(
+        df_citation.patent_id.values,
+        df_citation.forward_citation_id.values,
+        df_patent.patent_id.values,
+        df_patent.grant_date.values,
+        [5, 10])
+
+    expected = count_citations_pandas(df_citation, df_patent, [5, 10])
+    assert counts.dtype==np.int64
+    assert (counts==expected.values).all()
+
+
+def test_window_edges():
+    df_patent = pd.DataFrame({
+        'patent_id':np.array([1, 2, 3, 4, 5, 6], dtype=np.uint32),
+        'grant_date':pd.to_datetime([
+            '2000-01-01', '2004-12-30', '2004-12-31', '2005-01-01',
+            '2009-12-29', '1999-01-01'])})
+    # Patent 1 is cited after exactly 5*365 days (2004-12-30), one day
+    #  later, and after exactly 10*365 days, as well as by a patent
+    #  granted before it (the lag is negative)
+    df_citation = pd.DataFrame({
+        'patent_id':[1, 1, 1, 1, 1],
+        'forward_citation_id':[2, 3, 4, 5, 6]}) \
+        .astype(np.uint32)
+
+    # The windows are returned in the order requested
+    counts = count_citations(
+        df_citation.patent_id.values,
+        df_citation.forward_citation_id.values,
+        df_patent.patent_id.values,
+        df_patent.grant_date.values,
+        [10, 5])
+
+    expected = count_citations_pandas(df_citation, df_patent, [10, 5])
+    assert counts[0].tolist()==[5, 2]
+    assert (counts==expected.values).all()
+
+
+def test_no_patents():
+    counts = count_citations(
+        np.array([1], dtype=np.uint32), np.array([2], dtype=np.uint32),
+        np.array([], dtype=np.uint32), np.array([], dtype='datetime64[D]'),
+        [5, 10])
+
+    assert counts.shape==(0, 2)
+
+
+def test_censoring():
+    is_censored = importlib.import_module('make-patent-info-database') \
+        .is_censored
+    grant_date_last = pd.Timestamp('2020-12-31')
+    grant_dates = pd.Series(pd.to_datetime([
+        '2010-01-01', '2016-01-02', '2016-01-03', '2020-12-31']))
+
+    # The counts of the patents granted within the window before the last
+    #  grant date are censored, as in the original script
+    for years in [5, 10]:
+        threshold = grant_date_last - pd.tseries.offsets.Day(years*365)
+        assert is_censored(grant_dates, grant_date_last, years).tolist()==\
+            (grant_dates > threshold).tolist()
+    assert is_censored(grant_dates, grant_date_last, 5).tolist()==[
+        False, False, True, True]
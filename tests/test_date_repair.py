@@ -0,0 +1,169 @@
+"""
+Tests of date_repair.py against a local stand-in of the PatentsView API
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import json
+import socket
+import pandas as pd
+import pytest
+import date_repair
+import download
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from date_repair import fetch_dates
+
+
+def api_handler(dates:dict, failing:set=frozenset(), records:dict=None):
+    """Request handler that answers as the PatentsView API does, with the
+      grant dates provided (by patent id), and the list of the batches of
+      patent ids it receives
+    The batches with any of the failing patent ids get a server error,
+      while the records provided (by patent id) are sent as they are,
+      instead of those with the grant dates
+    """
+    records = records or {
+        patent_id:{'patent_number':str(patent_id), 'patent_date':date} \
+            for patent_id, date in dates.items()}
+    batches = []
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            params = parse_qs(urlparse(self.path).query)
+            patent_ids = [
+                int(condition['patent_number']) \
+                    for condition in json.loads(params['q'][0])['_or']]
+            batches.append(patent_ids)
+            if failing & set(patent_ids):
+                self.send_error(500)
+                return
+            body = json.dumps({
+                'patents':[
+                    records[patent_id] \
+                        for patent_id in patent_ids if patent_id in records]}) \
+                .encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler, batches
+
+
+DATES = {
+    patent_id:f'2001-01-{patent_id:02d}' for patent_id in range(1, 10)}
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    monkeypatch.setattr(date_repair, 'BATCH_SIZE', 2)
+    # A failed request is retried once, without waiting
+    monkeypatch.setattr(download, 'MAX_ATTEMPTS', 1)
+
+
+def closed_port_url() -> str:
+    """URL of a local port that nobody listens to"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f'http://127.0.0.1:{port}/'
+
+
+def test_batches(serve):
+    handler, batches = api_handler(DATES)
+    url = serve(handler)
+
+    dates = fetch_dates([5, 1, 2, 3, 1, 4], 'grant_date', jobs=2, url=url)
+
+    assert dates.to_dict()=={
+        patent_id:DATES[patent_id] for patent_id in [5, 1, 2, 3, 4]}
+    # Each patent is sent once, in batches of at most BATCH_SIZE patents
+    assert len(batches)==3
+    assert all([len(batch)<=2 for batch in batches])
+    assert sorted(sum(batches, []))==[1, 2, 3, 4, 5]
+
+
+def test_cache_reuse(serve, tmp_path):
+    handler, batches = api_handler(DATES)
+    url = serve(handler)
+    cache = str(tmp_path / 'patent_dates.parquet')
+
+    # The API does not know the patent 20, that is cached as well
+    fetch_dates([1, 2, 20], 'grant_date', cache=cache, url=url)
+    batches.clear()
+    dates = fetch_dates([1, 2, 3, 20], 'grant_date', cache=cache, url=url)
+
+    assert batches==[[3]]
+    assert dates.loc[[1, 2, 3]].tolist()==[DATES[1], DATES[2], DATES[3]]
+    assert pd.isna(dates.loc[20])
+    # Nothing is sent once all the patents are cached
+    batches.clear()
+    fetch_dates([1, 3, 20], 'grant_date', cache=cache, url=url)
+    assert batches==[]
+
+
+def test_offline(serve, tmp_path):
+    handler, _ = api_handler(DATES)
+    cache = str(tmp_path / 'patent_dates.parquet')
+    fetch_dates([1, 2], 'grant_date', cache=cache, url=serve(handler))
+
+    dates = fetch_dates(
+        [1, 2, 3, 4, 5, 6], 'grant_date', cache=cache, jobs=1,
+        url=closed_port_url())
+
+    # The cached dates are used, while the other patents are left as
+    #  they are (and not cached, to query them on the next run)
+    assert dates.loc[[1, 2]].tolist()==[DATES[1], DATES[2]]
+    assert dates.loc[[3, 4, 5, 6]].isna().all()
+    assert sorted(date_repair.read_date_cache(cache, 'grant_date').index)==[
+        1, 2]
+
+
+def test_failed_batch(serve, tmp_path):
+    handler, batches = api_handler(DATES, failing={3})
+    url = serve(handler)
+    cache = str(tmp_path / 'patent_dates.parquet')
+
+    dates = fetch_dates(
+        [1, 2, 3, 4, 5, 6], 'grant_date', cache=cache, jobs=1, url=url)
+
+    # The batch that failed is retried, and the other batches are still sent
+    assert batches==[[1, 2], [3, 4], [3, 4], [5, 6]]
+    assert dates.loc[[1, 2, 5, 6]].tolist()==[
+        DATES[1], DATES[2], DATES[5], DATES[6]]
+    assert dates.loc[[3, 4]].isna().all()
+    assert sorted(date_repair.read_date_cache(cache, 'grant_date').index)==[
+        1, 2, 5, 6]
+
+
+def test_malformed_records(serve, tmp_path):
+    records = {
+        1:{'patent_number':'1', 'applications':[{'app_date':'2000-12-01'}]},
+        2:{'patent_number':'2'},
+        3:{'patent_number':'3', 'applications':[]},
+        4:{'patent_number':'4', 'applications':None},
+        5:{'applications':[{'app_date':'2000-12-05'}]},
+        6:{'patent_number':'6', 'applications':[{'app_date':'2000-12-06'}]}}
+    handler, batches = api_handler({}, records=records)
+    url = serve(handler)
+    cache = str(tmp_path / 'patent_dates.parquet')
+
+    dates = fetch_dates(
+        [1, 2, 3, 4, 5, 6], 'appln_date', cache=cache, jobs=1, url=url)
+
+    # The records without any application (or patent number) are skipped,
+    #  without failing the rest of their batch
+    assert batches==[[1, 2], [3, 4], [5, 6]]
+    assert dates.loc[[1, 6]].tolist()==['2000-12-01', '2000-12-06']
+    assert dates.loc[[2, 3, 4, 5]].isna().all()
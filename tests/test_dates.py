@@ -0,0 +1,98 @@
+"""
+Tests of dates.py against the pandas expressions it replaces
+  (pd.to_datetime, after the string repairs of the original fix_dates)
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import numpy as np
+import pandas as pd
+from dates import parse_dates, to_datetime
+
+
+def to_datetime_pandas(dates:pd.Series, repair:bool=False) -> pd.Series:
+    """Dates as make-patent-info-database.py used to parse
+      (and repair) them
+    """
+    dates = dates.copy()
+    if repair:
+        subset = dates.str.endswith('00').fillna(False)
+        dates[subset] = dates[subset].str[:-2] + '01'
+        subset = dates.str[:2].isin(['19','20'])
+        dates[~subset & dates.notna()] = \
+            '19' + dates[~subset & dates.notna()].str[2:]
+    return pd.to_datetime(dates, format='%Y-%m-%d', errors='coerce')
+
+
+def random_dates(rng:np.random.RandomState, n:int) -> pd.Series:
+    """Dates with the layout of PatentsView, many of which are not valid
+      (e.g., a "00" or "31" day, a "13" month or a "0199" year)
+    """
+    return pd.Series([
+        f'{year:04d}-{month:02d}-{day:02d}' \
+            for year, month, day in zip(
+                rng.choice([199, 1899, 1900, 1976, 1999, 2000, 2020, 9999], n),
+                rng.randint(0, 14, n),
+                rng.randint(0, 33, n))])
+
+
+def test_matches_pandas():
+    dates = random_dates(np.random.RandomState(0), 5000)
+
+    for repair in [False, True]:
+        days, is_wrong = parse_dates(dates, repair=repair)
+
+        expected = to_datetime_pandas(dates, repair=repair)
+        assert (is_wrong==expected.isna().values).all()
+        assert (days[~is_wrong]==expected.dropna().values).all()
+        assert to_datetime(dates, repair=repair).equals(expected)
+
+
+def test_malformed():
+    dates = pd.Series([
+        '2001-02-28', '2000-02-29', '1900-02-29', '2001-04-31',
+        '2001-13-01', '2001-00-10', '2001-01-00', '2001-1-01', '2001/01/01',
+        '20010101', '', None, '2001-01-0a', '0199-01-01', '1677-09-21',
+        '1677-09-22', '2262-04-11', '2262-04-12', '2001-01-01 00:00:00'],
+        index=np.arange(19)*2, name='grant_date')
+
+    parsed = to_datetime(dates)
+
+    # Anything after the day is ignored, while the dates with another
+    #  layout (unlike a lenient pd.to_datetime) or out of the range of
+    #  the pandas dates are not valid
+    assert parsed.index.equals(dates.index)
+    assert parsed.name=='grant_date'
+    assert parsed.dropna().dt.strftime('%Y-%m-%d').tolist()==[
+        '2001-02-28', '2000-02-29', '1677-09-22', '2262-04-11', '2001-01-01']
+    assert parsed.notna().tolist()==[
+        True, True] + [False]*13 + [True, True, False, True]
+
+
+def test_repair():
+    dates = pd.Series([
+        '2001-03-00', '0199-05-17', '1899-05-17', '0000-00-00',
+        '2001-02-29', None])
+
+    days, is_wrong = parse_dates(dates, repair=True)
+
+    # A "00" day becomes "01", and a year out of the 1900s and 2000s is
+    #  moved into the 1900s, while the dates that are still not valid
+    #  become NaT
+    assert pd.Series(days[~is_wrong]).dt.strftime('%Y-%m-%d').tolist()==[
+        '2001-03-01', '1999-05-17', '1999-05-17']
+    assert is_wrong.tolist()==[False, False, False, True, True, True]
+
+
+def test_datetimes():
+    dates = pd.Series(pd.to_datetime(['2001-01-01', None]))
+
+    days, is_wrong = parse_dates(dates)
+
+    assert days.dtype==np.dtype('datetime64[D]')
+    assert is_wrong.tolist()==[False, True]
@@ -0,0 +1,111 @@
+"""
+Tests of delta.py against the pandas expressions it replaces
+  (isin, concat and set operations on the patent ids)
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import numpy as np
+import pandas as pd
+from delta import \
+    KeyHasher, changed_keys, extend_index, keep_affected, merge_rows
+from patent_index import \
+    make_patent_index, index_patent_ids, save_patent_index, load_patent_index
+
+
+def test_extend_index(tmp_path):
+    rng = np.random.RandomState(0)
+    patent_ids = rng.randint(0, 1000, 100)
+    path = str(tmp_path / 'affected.npy')
+    save_patent_index(make_patent_index(patent_ids), path)
+
+    # The index read from disk is not changed, whether the patents added
+    #  are beyond its size or not
+    for other in [rng.randint(0, 500, 50), rng.randint(0, 5000, 50), []]:
+        index = load_patent_index(path)
+        extended = extend_index(index, other)
+
+        assert index_patent_ids(extended).tolist()==sorted(
+            set(patent_ids) | set(other))
+        assert index_patent_ids(index).tolist()==sorted(set(patent_ids))
+
+
+def test_keep_affected():
+    df = pd.DataFrame({
+        'patent_id':np.array([5, 1, 7, 5, 12], dtype=np.uint32),
+        'value':list('abcde')})
+    affected = make_patent_index([5, 12, 40])
+
+    assert keep_affected(df, affected) \
+        .equals(df[df.patent_id.isin([5, 12, 40])])
+    assert keep_affected(df, None) is df
+
+
+def test_merge_rows():
+    df_old = pd.DataFrame({
+        'patent_id':np.array([1, 2, 2, 3, 4], dtype=np.uint32),
+        'uspc_class':pd.Categorical(['002', '257', '257', '514', '002']),
+        'num_claims':[1., 2., 2., 3., 4.]})
+    # The patent 2 changed (and has one row less), the patent 3 is gone
+    #  and the patent 5 is new
+    df_new = pd.DataFrame({
+        'patent_id':np.array([2, 5], dtype=np.uint32),
+        'uspc_class':pd.Categorical(['D14', '002']),
+        'num_claims':[20., 5.]})
+    affected = make_patent_index([2, 3, 5])
+
+    df = merge_rows(df_old, df_new, affected)
+
+    expected = pd.concat([
+            df_old[~df_old.patent_id.isin([2, 3, 5])], df_new],
+        ignore_index=True)
+    assert df.astype({'uspc_class':object}) \
+        .equals(expected.astype({'uspc_class':object}))
+    # The categories of both the tables are kept
+    assert df.uspc_class.cat.categories.tolist()==['002', '257', '514', 'D14']
+
+
+def test_incremental_matches_full():
+    rng = np.random.RandomState(0)
+    df_old = pd.DataFrame({
+        'patent_id':rng.randint(1, 2000, 5000).astype(np.uint32),
+        'value':rng.randint(0, 10, 5000)})
+    # A new release changes, removes and adds some rows
+    df_new = df_old.sample(frac=.95, random_state=1).copy()
+    df_new.loc[df_new.sample(frac=.02, random_state=2).index, 'value'] = -1
+    df_new = pd.concat([df_new, pd.DataFrame({
+        'patent_id':rng.randint(1500, 2500, 200).astype(np.uint32),
+        'value':rng.randint(0, 10, 200)})])
+
+    def count_values(df):
+        return df.groupby('patent_id', as_index=False).value.sum()
+
+    hashes = []
+    for df in [df_old, df_new]:
+        hasher = KeyHasher()
+        # The rows are hashed chunk by chunk, in any order
+        for df_chunk in np.array_split(df.sample(frac=1, random_state=3), 7):
+            hasher.update(df_chunk.patent_id.values, df_chunk)
+        hashes.append(hasher.hashes())
+    changed = changed_keys(*hashes)
+    affected = make_patent_index(changed)
+
+    df = merge_rows(
+            count_values(df_old),
+            count_values(keep_affected(df_new, affected)),
+            affected) \
+        .sort_values('patent_id') \
+        .reset_index(drop=True)
+
+    is_changed = pd.merge(
+            count_values(df_old), count_values(df_new),
+            on='patent_id', how='outer', indicator=True) \
+        .query('_merge!="both" | value_x!=value_y') \
+        .patent_id
+    assert set(changed) >= set(is_changed)
+    assert df.equals(count_values(df_new))
@@ -0,0 +1,167 @@
+"""
+Tests of download.py against a local file server
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import hashlib
+import io
+import os
+import zipfile
+from http.server import BaseHTTPRequestHandler
+from download import download_url, download_manifest, read_manifest
+
+
+def file_handler(files:dict, cut_first:bool=False, ignore_range:bool=False):
+    """Request handler that serves the files provided (by URL path) and
+      the list of the requests it receives (path and Range header)
+    If cut_first, the first transfer is cut off halfway, while,
+      if ignore_range, the Range header is ignored (the whole file is sent)
+    """
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            range_header = self.headers.get('Range')
+            received.append((self.path, range_header))
+            data = files.get(self.path)
+            if data is None:
+                self.send_error(404)
+                return
+            start = 0
+            if range_header is not None and not ignore_range:
+                start = int(range_header[len('bytes='):].split('-')[0])
+                if start>=len(data):
+                    self.send_response(416)
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header(
+                    'Content-Range',
+                    f'bytes {start}-{len(data)-1}/{len(data)}')
+            else:
+                self.send_response(200)
+            body = data[start:]
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if cut_first and len(received)==1:
+                self.wfile.write(body[:len(body)//2])
+                self.close_connection = True
+                return
+            self.wfile.write(body)
+
+    return Handler, received
+
+
+def sha256(data:bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def zip_bytes(name:str, data:bytes) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as f_zip:
+        f_zip.writestr(name, data)
+    return buffer.getvalue()
+
+
+def read_bytes(path:str) -> bytes:
+    with open(path, 'rb') as f_in:
+        return f_in.read()
+
+
+DATA = bytes(range(256))*4096 # 1 MB
+
+
+def test_resume_after_cut_off(serve, tmp_path):
+    # Large enough for some blocks to be written before the cut off
+    data = DATA*8
+    handler, received = file_handler({'/data.bin':data}, cut_first=True)
+    url = serve(handler)
+
+    target = download_url(
+        f'{url}/data.bin', str(tmp_path), 'data.bin', sha256=sha256(data))
+
+    assert read_bytes(target)==data
+    assert not os.path.exists(f'{target}.part')
+    # The second request resumes the transfer from the blocks written
+    assert len(received)==2
+    assert received[0][1] is None
+    start = int(received[1][1][len('bytes='):-len('-')])
+    assert 0<start<=len(data)//2
+
+
+def test_restart_if_range_ignored(serve, tmp_path):
+    handler, received = file_handler({'/data.bin':DATA}, ignore_range=True)
+    url = serve(handler)
+    # A partial file left by a previous run, whose content does not matter
+    #  since the server sends the whole file again
+    with open(tmp_path / 'data.bin.part', 'wb') as f_out:
+        f_out.write(b'x'*1000)
+
+    target = download_url(
+        f'{url}/data.bin', str(tmp_path), 'data.bin', sha256=sha256(DATA))
+
+    assert target is not None
+    assert read_bytes(target)==DATA
+    assert received==[('/data.bin', 'bytes=1000-')]
+
+
+def test_checksum_mismatch(serve, tmp_path):
+    handler, _ = file_handler({'/data.bin':DATA})
+    url = serve(handler)
+
+    target = download_url(
+        f'{url}/data.bin', str(tmp_path), 'data.bin', sha256='0'*64)
+
+    assert target is None
+    assert not os.path.exists(tmp_path / 'data.bin.part')
+    assert not os.path.exists(tmp_path / 'data.bin')
+
+
+def test_corrupted_zip(serve, tmp_path):
+    content = b'patent_id\tdate\n'*1000
+    data = bytearray(zip_bytes('patent.tsv', content))
+    # Corrupt the content, leaving the structure of the zip file valid
+    data[data.find(content)+10] ^= 0xFF
+    handler, _ = file_handler({'/patent.tsv.zip':bytes(data)})
+    url = serve(handler)
+
+    target = download_url(
+        f'{url}/patent.tsv.zip', str(tmp_path), 'patent.tsv.zip')
+
+    assert target is None
+    assert not os.path.exists(tmp_path / 'patent.tsv.zip.part')
+    assert not os.path.exists(tmp_path / 'patent.tsv.zip')
+
+
+def test_manifest(serve, tmp_path):
+    files = {
+        f'/table{n}.tsv.zip':zip_bytes(f'table{n}.tsv', DATA*(n+1)) \
+            for n in range(5)}
+    handler, received = file_handler(files)
+    url = serve(handler)
+    # The files already downloaded are skipped
+    with open(tmp_path / 'table0.tsv.zip', 'wb') as f_out:
+        f_out.write(files['/table0.tsv.zip'])
+    manifest_path = tmp_path / 'manifest.tsv'
+    with open(manifest_path, 'w') as f_out:
+        f_out.write('# URL\tOUTPUT\tSHA256\n')
+        for path, data in files.items():
+            f_out.write(
+                f'{url}{path}\t{tmp_path}{path}\t{sha256(data)}\n')
+
+    targets = download_manifest(read_manifest(manifest_path), jobs=3)
+
+    assert len(targets)==4
+    for path, data in files.items():
+        assert read_bytes(f'{tmp_path}{path}')==data
+    assert sorted([path for path, _ in received])==sorted(files)[1:]
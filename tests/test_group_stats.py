@@ -0,0 +1,103 @@
+"""
+Tests of group_stats.py against the pandas expressions it replaces
+  (a groupby and a merge for each level, and a concat of the records that
+  fall back to the less detailed level)
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import numpy as np
+import pandas as pd
+import pytest
+from group_stats import group_means
+
+
+def group_means_pandas(
+        df_source:pd.DataFrame, df_target:pd.DataFrame,
+        year:str, metrics:list) -> pd.DataFrame:
+    """Means of the metrics by year and USPC class, falling back to the
+      year only for the records without a class, as
+      make-patent-quality-database.py used to compute them
+    """
+    df_target = pd.merge(
+        df_target, df_source \
+            .groupby([year, 'uspc_class']) \
+            .agg({metric:'mean' for metric in metrics}),
+        left_on=[year, 'uspc_class'], right_index=True,
+        how='left')
+    subset = df_target.uspc_class.isna()
+    df_target = pd.concat([
+        df_target[~subset],
+        pd.merge(
+            df_target[subset].drop(columns=metrics),
+            df_source \
+                .groupby([year]) \
+                .agg({metric:'mean' for metric in metrics}),
+            left_on=[year], right_index=True,
+            how='left')],
+        sort=True)
+    return df_target.sort_index()[metrics]
+
+
+def random_patents(rng:np.random.RandomState, n:int, classes:list):
+    df = pd.DataFrame({
+        'grant_year':rng.randint(1990, 2000, n),
+        'appln_year':rng.randint(1988, 2000, n),
+        'uspc_class':rng.choice(classes, n),
+        'num_claims':rng.randint(1, 40, n).astype(float),
+        'num_citations_5y':rng.randint(0, 20, n).astype(float)})
+    df.loc[rng.rand(n)<.1, 'uspc_class'] = None
+    df.loc[rng.rand(n)<.1, 'num_claims'] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('categorical', [False, True])
+def test_matches_pandas(categorical):
+    rng = np.random.RandomState(0)
+    df_source = random_patents(rng, 2000, ['002', '257', '514', 'D14'])
+    # Some target records have a class, or a year, with no source record
+    df_target = random_patents(
+            rng, 500, ['002', '257', '514', 'D14', 'PLT']) \
+        .drop(columns=['num_claims', 'num_citations_5y'])
+    df_target.loc[df_target.index[:5], 'grant_year'] = 2010
+    if categorical:
+        df_source['uspc_class'] = pd.Categorical(df_source.uspc_class)
+        df_target['uspc_class'] = pd.Categorical(df_target.uspc_class)
+    metrics = ['num_claims', 'num_citations_5y']
+
+    for year in ['grant_year', 'appln_year']:
+        means = group_means(
+            df_source, df_target, [[year, 'uspc_class'], [year]], metrics)
+
+        expected = group_means_pandas(df_source, df_target, year, metrics)
+        assert means.index.equals(df_target.index)
+        for metric in metrics:
+            assert np.allclose(
+                means[metric].values, expected[metric].values,
+                rtol=1e-12, equal_nan=True)
+
+
+def test_fallback():
+    df_source = pd.DataFrame({
+        'grant_year':[2000, 2000, 2000, 2001],
+        'uspc_class':['002', '002', '257', '002'],
+        'num_claims':[10, 20, 60, np.nan]})
+    df_target = pd.DataFrame({
+        'grant_year':[2000, 2000, 2000, 2001, 2002],
+        'uspc_class':['002', None, 'PLT', None, None]})
+
+    means = group_means(
+        df_source, df_target,
+        [['grant_year', 'uspc_class'], ['grant_year']], ['num_claims'])
+
+    # A record falls back to its year only if it has no class (a class
+    #  with no source record is not a missing key), and groups whose
+    #  metric is always missing have no mean
+    assert means.num_claims.tolist()[:2]==[15, 30]
+    assert means.num_claims.isna().tolist()==[
+        False, False, True, True, True]
@@ -0,0 +1,53 @@
+"""
+Tests of patent_index.py against the pandas membership test it replaces
+  (Series.isin on the patent ids)
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import numpy as np
+import pandas as pd
+from patent_index import \
+    make_patent_index, isin_patent_index, index_patent_ids, \
+    save_patent_index, load_patent_index
+
+
+def test_matches_isin():
+    rng = np.random.RandomState(0)
+    patent_ids = rng.randint(0, 100000, 5000).astype(np.uint32)
+    index = make_patent_index(patent_ids)
+    # Ids within the index, at its boundaries and beyond it
+    queried = np.concatenate([
+        rng.randint(0, 110000, 20000),
+        [0, patent_ids.max(), patent_ids.max()+1, len(index)*8,
+            2**32-1]]) \
+        .astype(np.uint32)
+
+    is_in = isin_patent_index(index, queried)
+
+    assert is_in.dtype==bool
+    assert (is_in==pd.Series(queried).isin(patent_ids).values).all()
+
+
+def test_index_patent_ids(tmp_path):
+    patent_ids = np.array([7, 3, 3, 8, 123456, 0], dtype=np.uint32)
+    path = str(tmp_path / 'patent_index.npy')
+    save_patent_index(make_patent_index(patent_ids), path)
+
+    index = load_patent_index(path)
+
+    assert index_patent_ids(index).tolist()==sorted(set(patent_ids.tolist()))
+    assert isin_patent_index(index, [3, 4, 8, 9]).tolist()==[
+        True, False, True, False]
+
+
+def test_empty_index():
+    index = make_patent_index([])
+
+    assert len(index_patent_ids(index))==0
+    assert not isin_patent_index(index, [0, 1, 2**32-1]).any()
@@ -0,0 +1,73 @@
+"""
+Tests of the tables released against the reference tables
+  (see reference/README.md), built from the same synthetic data
+
+Author: Carlo Bottai
+Copyright (c) 2021 - Carlo Bottai
+License: See the LICENSE file.
+Date: 2026-10-17
+
+"""
+
+
+import os
+import subprocess
+import sys
+import pandas as pd
+import pytest
+from benchmark import OFFLINE_API_URL, compare_tables
+from conftest import SRC_DIR
+from pipeline import RELEASE_FORMAT, RELEASE_TABLES
+from table_io import write_table
+
+
+REFERENCE_DIR = os.path.join(os.path.dirname(__file__), 'reference')
+REFERENCE_SIZE = 2000
+REFERENCE_SEED = 1
+
+
+def run_script(script:str, *args:str):
+    subprocess.run(
+        [sys.executable, os.path.join(SRC_DIR, script), *args],
+        env={**os.environ, 'PATENTSVIEW_API_URL':OFFLINE_API_URL},
+        check=True, capture_output=True)
+
+
+@pytest.mark.parametrize('backend', ['pandas', 'duckdb'])
+def test_matches_reference(tmp_path, backend):
+    if backend=='duckdb':
+        pytest.importorskip('duckdb')
+    data_dir = str(tmp_path)
+    run_script(
+        'make-synthetic-data.py', '-o', data_dir,
+        '-n', str(REFERENCE_SIZE), '--seed', str(REFERENCE_SEED))
+
+    run_script(
+        'pipeline.py', '-i', data_dir, '-c', '1000', '--backend', backend)
+
+    for table in RELEASE_TABLES:
+        path = os.path.join('processed', f'{table}.{RELEASE_FORMAT}')
+        assert compare_tables(
+            os.path.join(data_dir, path), os.path.join(REFERENCE_DIR, path),
+            strict=True)=='', table
+
+
+def test_strict_comparison(tmp_path):
+    df = pd.DataFrame({
+        'patent_id':[1, 2, 3],
+        'csa_id':[119., None, 105.],
+        'cbsa_share':[1/6, .5, 1.]})
+    golden_path = str(tmp_path / 'golden.tsv.zip')
+    write_table(df, golden_path)
+
+    def compare(df_other):
+        path = str(tmp_path / 'table.tsv.zip')
+        write_table(df_other, path)
+        return compare_tables(path, golden_path, strict=True)
+
+    # Only the rounding of the floating-point numbers is allowed
+    assert compare(df.assign(cbsa_share=df.cbsa_share*(1+1e-15)))==''
+    assert compare(df.iloc[[1, 0, 2]])!=''
+    assert compare(df[['csa_id', 'patent_id', 'cbsa_share']])!=''
+    assert compare(df.assign(patent_id=df.patent_id.astype(float)))!=''
+    assert compare(df.assign(cbsa_share=df.cbsa_share*(1+1e-9)))!=''